@@ -7,23 +7,25 @@ from pages.work_request import WorkRequestForm
 from pages.submission import SubmissionForm
 from pages.admin import AdminPage
 from ui.map_manager import MapManager
+from ui.cluster_index import get_cluster_index
 from ui.components import UIManager
-from database import DatabaseManager
+from database import get_database_manager
+from spatial_index import SpatialIndex
 import streamlit as st
+import pandas as pd
+import numpy as np
 from streamlit_folium import st_folium
+import hashlib
+from typing import Optional
 import json
 import re
 import time
 import sys
 import os
-import math
 
 # パッケージパスの設定
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# 起動時にキャッシュをクリア
-st.cache_data.clear()
-
 
 def hide_streamlit_style():
     """Streamlitの標準ヘッダーを非表示"""
@@ -46,7 +48,7 @@ class FortunetellerMapApp:
     def __init__(self):
         """初期化"""
         try:
-            self.db = DatabaseManager()
+            self.db = get_database_manager()
             self.admin_page = AdminPage(self.db)
             self.submission_form = SubmissionForm(self.db)
             self.work_request_form = WorkRequestForm(self.db)
@@ -74,6 +76,7 @@ class FortunetellerMapApp:
             'permanent_delete_confirm': None,
             'selected_for_permanent_delete': set(),
             'checkbox_changes': {},
+            'map_viewport': None,  # 表示範囲連動モードの取得済み範囲とデータ
             # ★★★ デバイスタイプを強制的にデスクトップに固定 ★★★
             'device_type': 'desktop',  # 常にデスクトップ
             'is_mobile_view': False    # 常にfalse
@@ -131,29 +134,38 @@ class FortunetellerMapApp:
         """列の比率を取得（デスクトップ固定）"""
         return [3, 7]  # 常にデスクトップ用比率
 
-    def find_closest_fortuneteller(self, clicked_lat: float, clicked_lng: float, fortunetellers_df) -> int:
-        """クリック座標に最も近い占い師を特定 - 改良版"""
+    def find_closest_fortuneteller(self, clicked_lat: float, clicked_lng: float, fortunetellers_df,
+                                   revision: Optional[int] = None) -> int:
+        """クリック座標に最も近い占い師を特定（空間インデックスで検索）
+
+        revision には fortunetellers_df を取得したときのデータのリビジョンを渡す（省略時は現在の値）。
+        """
         if fortunetellers_df.empty:
             return None
 
-        min_distance = float('inf')
-        closest_id = None
-
-        for idx, row in fortunetellers_df.iterrows():
-            # 距離計算
-            lat_diff = clicked_lat - row['latitude']
-            lng_diff = clicked_lng - row['longitude']
-            distance = math.sqrt(lat_diff**2 + lng_diff**2)
-
-            if distance < min_distance:
-                min_distance = distance
-                closest_id = row['id']
-
-        # 距離の閾値を緩める（0.1度 = 約10km以内）
-        if min_distance < 0.1:
-            return closest_id
-        else:
-            return None
+        nearest = self._get_spatial_index(fortunetellers_df, revision).nearest(
+            clicked_lat, clicked_lng, k=1, max_distance_km=config.MAP_CLICK_RADIUS_KM)
+        return nearest[0][0] if nearest else None
+
+    def _get_spatial_index(self, fortunetellers_df, revision: Optional[int] = None) -> SpatialIndex:
+        """表示中の占い師の空間インデックスを取得（データか表示対象が変わったときだけ作り直す）
+
+        キーは取得時のデータのリビジョン、並べ替えたIDの一覧そのもののハッシュと最終更新日時
+        （件数やIDの合計では、表示範囲を動かして別の占い師に入れ替わっても同じ値になり得るため）。
+        """
+        ids = np.sort(fortunetellers_df['id'].to_numpy(dtype=np.int64))
+        updated_at = fortunetellers_df['updated_at'].max() if 'updated_at' in fortunetellers_df else None
+        key = (
+            self.db.get_revision() if revision is None else revision,
+            len(ids),
+            hashlib.blake2b(ids.tobytes(), digest_size=16).hexdigest(),
+            None if pd.isna(updated_at) else str(updated_at),
+        )
+        cached = st.session_state.get('spatial_index')
+        if cached is None or cached[0] != key:
+            cached = (key, SpatialIndex.from_dataframe(fortunetellers_df))
+            st.session_state.spatial_index = cached
+        return cached[1]
 
     def force_update_detail_panel(self, selected_id: int):
         """詳細パネルの強制更新"""
@@ -168,9 +180,6 @@ class FortunetellerMapApp:
             if key in st.session_state:
                 del st.session_state[key]
 
-        # キャッシュクリア
-        st.cache_data.clear()
-
         # 状態を確実に更新
         st.session_state.selected_fortuneteller = selected_id
         st.session_state.highlight_id = selected_id
@@ -192,17 +201,16 @@ class FortunetellerMapApp:
             st.markdown("### 🆕 新着情報")
             st.caption("クリックで詳細パネル表示")
 
-            recent_df = self.db.get_fortunetellers("approved")
-            if not recent_df.empty:
-                recent_df = recent_df.head(5)  # デスクトップ用件数
+            recent_rows = self.db.get_fortuneteller_records("approved", limit=5)  # デスクトップ用件数
+            if recent_rows:
 
-                for idx, row in recent_df.iterrows():
+                for idx, row in enumerate(recent_rows):
                     current_selected = st.session_state.get(
                         'selected_fortuneteller')
-                    is_selected = (current_selected == row['id'])
+                    is_selected = (current_selected == row.id)
 
-                    button_key = f"info_{row['id']}_{idx}_desktop"
-                    button_text = f"{'✅' if is_selected else '🔮'} {row['name']} - {row.get('category', '未設定')}"
+                    button_key = f"info_{row.id}_{idx}_desktop"
+                    button_text = f"{'✅' if is_selected else '🔮'} {row.name} - {row.category or '未設定'}"
 
                     if st.button(
                         button_text,
@@ -210,7 +218,7 @@ class FortunetellerMapApp:
                         use_container_width=True,
                         type="primary" if is_selected else "secondary"
                     ):
-                        self.force_update_detail_panel(row['id'])
+                        self.force_update_detail_panel(row.id)
 
             # お知らせ
             st.markdown("### 📰 お知らせ")
@@ -285,8 +293,8 @@ class FortunetellerMapApp:
             # カテゴリ統計
             st.markdown("### 🎴 占術カテゴリ")
             if not stats['categories'].empty:
-                for idx, row in stats['categories'].iterrows():
-                    st.markdown(f"• {row['category']}: {row['count']}件")
+                for category, count in zip(stats['categories']['category'], stats['categories']['count']):
+                    st.markdown(f"• {category}: {count}件")
 
         except Exception as e:
             st.error(f"情報パネル表示エラー: {str(e)}")
@@ -547,6 +555,7 @@ class FortunetellerMapApp:
 
             # 画面遷移処理
             if st.session_state.show_admin:
+                # 管理画面での承認・削除はデータのリビジョンで検知して地図に反映する
                 self.admin_page.show()
                 if st.button("🗺️ 地図に戻る"):
                     st.session_state.show_admin = False
@@ -574,6 +583,10 @@ class FortunetellerMapApp:
             # 情報パネル（デスクトップ版）
             self.show_info_panel()
             st.markdown("---")
+            self.show_search_panel()
+            st.markdown("---")
+            self.show_nearby_panel()
+            st.markdown("---")
             if st.button("👨‍💼 管理者ログイン", key="admin_login_desktop"):
                 st.session_state.show_admin = True
                 st.rerun()
@@ -582,33 +595,288 @@ class FortunetellerMapApp:
             st.markdown("### 🗺️ 占い師マップ")
 
             # 地図表示（デスクトップサイズ固定）
-            fortunetellers_df = self.db.get_fortunetellers()
-            map_obj = MapManager.create_map(
-                fortunetellers_df,
-                highlight_id=st.session_state.highlight_id,
-                selected_id=st.session_state.selected_fortuneteller
-            )
+            # 全セッション共通のベース地図に、選択・ハイライトのマーカーだけを重ねる
+            fortunetellers_df, viewport, revision = self._get_map_fortunetellers()
+            if viewport:
+                base_map = MapManager.get_base_map(
+                    viewport['revision'], viewport['loaded_bounds'], viewport['df'],
+                    center=viewport['center'], zoom=viewport['zoom'],
+                    clusters=viewport['clusters'])
+            else:
+                base_map = MapManager.get_base_map(revision, "all", fortunetellers_df)
+            highlight_id = st.session_state.highlight_id
+            selected_id = st.session_state.selected_fortuneteller
+            selection_layer = MapManager.create_selection_layer(
+                fortunetellers_df, selected_id, highlight_id)
+            selection_view = MapManager.get_selection_view(
+                fortunetellers_df, selected_id, highlight_id)
 
             map_key = f"map_{st.session_state.selected_fortuneteller}_desktop"
 
+            returned_objects = ["last_object_clicked", "last_clicked"]
+            if viewport:
+                returned_objects += ["bounds", "zoom", "center"]
+
             # 地図表示（デスクトップ固定高さ）
-            map_data = st_folium(
-                map_obj,
-                width=None,
-                height=500,  # デスクトップ固定
-                returned_objects=["last_object_clicked", "last_clicked"],
-                key=map_key
-            )
+            # ベース地図は作成時に描画済み、選択中の占い師へは中心・ズームの指定で移動
+            with MapManager.rendering(base_map) as map_obj:
+                map_data = st_folium(
+                    map_obj,
+                    width=None,
+                    height=config.MAP_HEIGHT_PX,  # デスクトップ固定
+                    returned_objects=returned_objects,
+                    feature_group_to_add=selection_layer,
+                    center=selection_view[0] if selection_view else None,
+                    zoom=selection_view[1] if selection_view else None,
+                    render=False,
+                    key=map_key
+                )
+
+            # 表示範囲が取得済みの範囲からはみ出したら取り直して再描画
+            if viewport and (self._handle_cluster_click(map_data, viewport)
+                             or self._update_viewport(map_data, viewport)):
+                st.rerun()
+
+            # 近くの占い師検索の中心（次の再実行で使用）
+            self._remember_map_position(map_data)
 
             # 地図クリック処理
-            self._handle_map_interaction(map_data, fortunetellers_df)
+            self._handle_map_interaction(map_data, fortunetellers_df, revision)
 
             # 詳細パネル表示
             if st.session_state.get('selected_fortuneteller'):
                 self.show_detail_panel(st.session_state.selected_fortuneteller)
 
-    def _handle_map_interaction(self, map_data, fortunetellers_df):
-        """地図クリック処理（共通）"""
+    def _get_map_fortunetellers(self):
+        """地図に載せる占い師を取得（表示範囲連動モードでは表示範囲＋余白のみ）
+
+        戻り値は (占い師, 表示範囲の取得結果, 取得時のデータのリビジョン)。
+        """
+        revision = self.db.get_revision()
+        if not config.MAP_VIEWPORT_MODE:
+            return self.db.get_fortunetellers(), None, revision
+
+        viewport = st.session_state.get('map_viewport')
+        if viewport is None:
+            # 初回は既定の中心・ズームから表示範囲を見積もる
+            center = (config.DEFAULT_CENTER_LAT, config.DEFAULT_CENTER_LON)
+            zoom = config.DEFAULT_ZOOM_LEVEL
+            viewport = self._load_viewport(
+                MapManager.estimate_bounds(center[0], center[1], zoom), center, zoom)
+        elif viewport.get('revision') != revision:
+            # 承認・削除などでデータが変わったら同じ表示範囲で取り直す
+            viewport = self._load_viewport(
+                viewport['bounds'], viewport['center'], viewport['zoom'])
+
+        fortunetellers_df = viewport['df']
+
+        # 選択中の占い師が範囲外でも、詳細表示用のマーカーは必ず載せる
+        selected_id = st.session_state.get('selected_fortuneteller')
+        if selected_id and (fortunetellers_df.empty or selected_id not in fortunetellers_df['id'].values):
+            selected_data = self.db.get_fortuneteller_by_id(selected_id)
+            if selected_data:
+                fortunetellers_df = pd.concat(
+                    [fortunetellers_df, pd.DataFrame([selected_data])], ignore_index=True)
+
+        return fortunetellers_df, viewport, revision
+
+    def _load_viewport(self, bounds, center, zoom) -> dict:
+        """表示範囲＋余白の占い師を取得してセッションに保存"""
+        revision = self.db.get_revision()
+        loaded_bounds = MapManager.expand_bounds(bounds)
+
+        # 低ズームでは集計済みクラスターを使い、個別表示する占い師だけを取得
+        clusters = None
+        if config.MAP_CLUSTER_MODE:
+            clusters = get_cluster_index(self.db).get_clusters(loaded_bounds, zoom)
+
+        if clusters is not None:
+            single_ids = [cluster['id'] for cluster in clusters if cluster['count'] == 1]
+            df = self.db.get_fortunetellers_by_ids(single_ids)
+            truncated = False
+        else:
+            df = self.db.get_fortunetellers_in_bbox(
+                *loaded_bounds, limit=config.MAP_VIEWPORT_MAX_MARKERS)
+            # 上限で打ち切った場合はズームインでも取り直す
+            truncated = len(df) >= config.MAP_VIEWPORT_MAX_MARKERS
+
+        viewport = {
+            'bounds': bounds,
+            'loaded_bounds': loaded_bounds,
+            'revision': revision,
+            'center': center,
+            'zoom': zoom,
+            'df': df,
+            'clusters': clusters,
+            'truncated': truncated,
+        }
+        st.session_state.map_viewport = viewport
+        return viewport
+
+    def _update_viewport(self, map_data, viewport) -> bool:
+        """現在の表示範囲を確認し、取り直した場合はTrueを返す
+
+        余白の内側でのパンだけなら前回の取得結果をそのまま使う。
+        地図の中心・ズームも据え置くことで、同じHTMLが返り地図が再マウントされない。
+        """
+        bounds = MapManager.bounds_from_map_data(map_data)
+        if bounds is None:
+            return False
+
+        zoom = map_data.get('zoom')
+        if not isinstance(zoom, (int, float)):
+            zoom = viewport['zoom']
+        zoomed_in = zoom > viewport['zoom']
+        # クラスターはズームレベルごとに集計が異なる
+        cluster_level_changed = (config.MAP_CLUSTER_MODE and int(zoom) != viewport['zoom']
+                                 and min(int(zoom), viewport['zoom']) < config.MAP_CLUSTER_MAX_ZOOM)
+
+        if MapManager.bounds_contains(viewport['loaded_bounds'], bounds) and not (
+                viewport['truncated'] and zoomed_in) and not cluster_level_changed:
+            return False
+
+        center = map_data.get('center')
+        if isinstance(center, dict) and 'lat' in center and 'lng' in center:
+            center = (center['lat'], center['lng'])
+        else:
+            center = ((bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2)
+
+        self._load_viewport(bounds, center, int(zoom))
+        return True
+
+    def _remember_map_position(self, map_data):
+        """地図の中心とクリック位置をセッションに保存"""
+        if not map_data:
+            return
+        center = map_data.get('center')
+        if isinstance(center, dict) and 'lat' in center and 'lng' in center:
+            st.session_state.map_center = (center['lat'], center['lng'])
+        clicked = map_data.get('last_clicked')
+        if isinstance(clicked, dict) and clicked.get('lat') is not None and clicked.get('lng') is not None:
+            st.session_state.map_last_clicked = (clicked['lat'], clicked['lng'])
+
+    def show_search_panel(self):
+        """占い師検索パネル（名前・住所・説明の全文検索）"""
+        try:
+            st.markdown("### 🔍 占い師を探す")
+            search_term = st.text_input(
+                "キーワード", key="public_search", placeholder="例: 新宿 タロット",
+                label_visibility="collapsed")
+            if not search_term.strip():
+                return
+
+            results = self.db.search_fortuneteller_records(
+                search_term, "approved", limit=config.SEARCH_RESULT_LIMIT)
+            if not results:
+                st.info("該当する占い師が見つかりません")
+                return
+
+            current_selected = st.session_state.get('selected_fortuneteller')
+            for row in results:
+                is_selected = (current_selected == row.id)
+                button_text = f"{'✅' if is_selected else '🔮'} {row.name} - {row.category}"
+                if st.button(
+                    button_text,
+                    key=f"search_{row.id}_desktop",
+                    use_container_width=True,
+                    type="primary" if is_selected else "secondary"
+                ):
+                    self.force_update_detail_panel(row.id)
+
+        except Exception as e:
+            st.error(f"⚠ 検索エラー: {str(e)}")
+
+    def show_nearby_panel(self):
+        """近くの占い師パネル（地図の中心・クリック位置から距離順に表示）"""
+        try:
+            st.markdown("### 📍 近くの占い師")
+            st.caption("地図左上の📍ボタンで現在地へ移動できます")
+
+            origins = {"地図の中心": st.session_state.get('map_center') or (
+                config.DEFAULT_CENTER_LAT, config.DEFAULT_CENTER_LON)}
+            if st.session_state.get('map_last_clicked'):
+                origins["クリックした位置"] = st.session_state.map_last_clicked
+            origin_label = st.radio("検索の中心", list(origins), horizontal=True, key="nearby_origin")
+            origin = origins.get(origin_label, origins["地図の中心"])
+
+            col1, col2 = st.columns(2)
+            with col1:
+                radius_km = st.selectbox(
+                    "半径", config.NEARBY_RADIUS_OPTIONS_KM,
+                    index=config.NEARBY_RADIUS_OPTIONS_KM.index(config.NEARBY_DEFAULT_RADIUS_KM),
+                    format_func=lambda r: f"{r}km", key="nearby_radius")
+            with col2:
+                category = st.selectbox(
+                    "占術", ["すべて"] + config.FORTUNE_CATEGORIES, key="nearby_category")
+
+            # 条件が変わったら1ページ目に戻す
+            conditions = (origin, radius_km, category)
+            if st.session_state.get('nearby_conditions') != conditions:
+                st.session_state.nearby_conditions = conditions
+                st.session_state.nearby_page = 0
+            page = st.session_state.get('nearby_page', 0)
+            page_size = config.NEARBY_PAGE_SIZE
+
+            # 1件多く取得して次ページの有無を判定
+            results = self.db.search_nearby(
+                origin[0], origin[1], radius_km,
+                category=None if category == "すべて" else category,
+                limit=page_size + 1, offset=page * page_size)
+            has_next = len(results) > page_size
+
+            if results.empty:
+                st.info(f"半径{radius_km}km以内に占い師が見つかりません")
+                return
+
+            current_selected = st.session_state.get('selected_fortuneteller')
+            for row in results.head(page_size).itertuples(index=False):
+                is_selected = (current_selected == row.id)
+                button_text = f"{'✅' if is_selected else '🔮'} {row.name} - {row.category}（{row.distance_km:.1f}km）"
+                if st.button(
+                    button_text,
+                    key=f"nearby_{row.id}_desktop",
+                    use_container_width=True,
+                    type="primary" if is_selected else "secondary"
+                ):
+                    self.force_update_detail_panel(row.id)
+
+            prev_col, page_col, next_col = st.columns([1, 1, 1])
+            with prev_col:
+                if page > 0 and st.button("◀ 前へ", key="nearby_prev"):
+                    st.session_state.nearby_page = page - 1
+                    st.rerun()
+            with page_col:
+                st.caption(f"{page + 1}ページ目")
+            with next_col:
+                if has_next and st.button("次へ ▶", key="nearby_next"):
+                    st.session_state.nearby_page = page + 1
+                    st.rerun()
+
+        except Exception as e:
+            st.error(f"⚠ 近くの占い師の検索エラー: {str(e)}")
+
+    def _handle_cluster_click(self, map_data, viewport) -> bool:
+        """クラスターがクリックされたらその位置へズームインして取り直す"""
+        if not map_data or not viewport['clusters']:
+            return False
+
+        obj_clicked = map_data.get('last_object_clicked')
+        if not isinstance(obj_clicked, dict) or 'lat' not in obj_clicked or 'lng' not in obj_clicked:
+            return False
+
+        for cluster in viewport['clusters']:
+            if cluster['count'] > 1 \
+                    and abs(cluster['latitude'] - obj_clicked['lat']) < 1e-6 \
+                    and abs(cluster['longitude'] - obj_clicked['lng']) < 1e-6:
+                zoom = min(viewport['zoom'] + 2, config.MAP_CLUSTER_MAX_ZOOM)
+                center = (cluster['latitude'], cluster['longitude'])
+                self._load_viewport(
+                    MapManager.estimate_bounds(center[0], center[1], zoom), center, zoom)
+                return True
+        return False
+
+    def _handle_map_interaction(self, map_data, fortunetellers_df, revision: Optional[int] = None):
+        """地図クリック処理（共通、revision は fortunetellers_df を取得したときのリビジョン）"""
         clicked_fortuneteller_id = None
 
         if map_data:
@@ -619,7 +887,7 @@ class FortunetellerMapApp:
                     clicked_lat = obj_clicked['lat']
                     clicked_lng = obj_clicked['lng']
                     clicked_fortuneteller_id = self.find_closest_fortuneteller(
-                        clicked_lat, clicked_lng, fortunetellers_df
+                        clicked_lat, clicked_lng, fortunetellers_df, revision
                     )
 
                 elif isinstance(obj_clicked, dict) and 'popup' in obj_clicked:
@@ -635,13 +903,17 @@ class FortunetellerMapApp:
                     clicked_lng = clicked_coords.get('lng')
                     if clicked_lat and clicked_lng:
                         clicked_fortuneteller_id = self.find_closest_fortuneteller(
-                            clicked_lat, clicked_lng, fortunetellers_df
+                            clicked_lat, clicked_lng, fortunetellers_df, revision
                         )
 
         # 詳細パネル表示処理
         if clicked_fortuneteller_id:
             current_selected = st.session_state.get('selected_fortuneteller')
             if current_selected != clicked_fortuneteller_id:
+                # ポップアップはクリックされた占い師の分だけここで生成（選択マーカーで使用）
+                clicked_data = self.db.get_fortuneteller_by_id(clicked_fortuneteller_id)
+                if clicked_data:
+                    MapManager.get_marker_content(clicked_data)
                 self.force_update_detail_panel(clicked_fortuneteller_id)
 
         # ハイライトクリア
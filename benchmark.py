@@ -0,0 +1,1239 @@
+"""
+パフォーマンス計測スクリプト
+fortuneteller.db のコピー（一時ディレクトリ）に対して計測するため、本番データは変更しない
+
+使い方:
+    python benchmark.py stress --readers 8 --writers 2 --duration 10
+    python benchmark.py bootstrap --reruns 200
+    python benchmark.py indexes --sizes 10000 100000 1000000
+    python benchmark.py bbox --sizes 10000 100000 1000000
+    python benchmark.py viewport --sizes 1000 10000 50000 --zoom 10
+    python benchmark.py markers --sizes 1000 10000 50000
+    python benchmark.py basemap --sizes 300 2000 20000 --reruns 10
+    python benchmark.py rows --sizes 10000 100000
+    python benchmark.py nearest --size 100000 --queries 200
+    python benchmark.py nearby --sizes 10000 100000 1000000 --radius 10
+    python benchmark.py search --sizes 100000 1000000
+    python benchmark.py pages --sizes 10000 100000 1000000 --pages 100
+    python benchmark.py purge --size 100000 --ids 10000
+    python benchmark.py moderate --size 100000 --ids 5000
+    python benchmark.py import --sizes 100000 1000000
+    python benchmark.py export --sizes 100000 1000000
+    python benchmark.py stats --sizes 100000 1000000 --operations 500
+    python benchmark.py revision --size 10000
+    python benchmark.py cache --size 100000 --visitors 500
+    python benchmark.py stampede --size 100000 --visitors 50 --markers 2000
+    python benchmark.py records --size 100000 --calls 300
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import config
+
+# パッケージパスの設定
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentiles(samples: list, points=(50, 90, 99)) -> dict:
+    """サンプルのパーセンタイル（ミリ秒）を計算"""
+    if not samples:
+        return {p: 0.0 for p in points}
+    ordered = sorted(samples)
+    result = {}
+    for p in points:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        result[p] = ordered[index] * 1000
+    return result
+
+
+def _format_percentiles(samples: list) -> str:
+    """パーセンタイルを表示用文字列に整形"""
+    values = _percentiles(samples)
+    return " / ".join(f"p{p}={v:.2f}ms" for p, v in values.items())
+
+
+def _use_temp_database(copy_from: str = config.DATABASE_PATH) -> str:
+    """一時ディレクトリにDBをコピーし、config.DATABASE_PATHを差し替える"""
+    temp_dir = tempfile.mkdtemp(prefix="fortuneteller_bench_")
+    db_path = os.path.join(temp_dir, "fortuneteller.db")
+    if copy_from and os.path.exists(copy_from):
+        shutil.copyfile(copy_from, db_path)
+    config.DATABASE_PATH = db_path
+    return db_path
+
+
+def _generate_fortunetellers(count: int, seed: int = 0):
+    """日本全国に散らばった占い師データを生成（承認80%・論理削除5%）"""
+    rng = random.Random(seed)
+    statuses = ["approved"] * 16 + ["pending"] * 3 + ["rejected"]
+    for i in range(count):
+        created = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} " \
+                  f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+        deleted = created if rng.random() < 0.05 else None
+        yield (
+            f"占い師{i}", rng.uniform(24.0, 45.5), rng.uniform(123.0, 146.0),
+            f"{rng.choice(config.FORTUNE_CATEGORIES)}の鑑定を行っています。" * 3,
+            f"03-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+            rng.choice(config.FORTUNE_CATEGORIES), rng.choice(statuses),
+            created, created, f"{rng.randint(1000000, 9999999)}",
+            f"東京都千代田区{rng.randint(1, 9)}丁目", deleted,
+            "管理者" if deleted else None
+        )
+
+
+def _generate_fortunetellers_df(count: int, seed: int = 0):
+    """合成データをDataFrameで生成（DBを介さない地図描画の計測用）"""
+    import pandas as pd
+
+    columns = ["name", "latitude", "longitude", "description", "contact", "category",
+               "status", "created_at", "updated_at", "zipcode", "address",
+               "deleted_at", "deleted_by"]
+    df = pd.DataFrame(list(_generate_fortunetellers(count, seed)), columns=columns)
+    df.insert(0, "id", range(1, count + 1))
+    return df
+
+
+def _create_synthetic_database(count: int, max_version: int = None) -> str:
+    """合成データ入りの一時DBを作成（max_versionまでのマイグレーションを適用）"""
+    import sqlite3
+    import migrations
+
+    db_path = _use_temp_database(copy_from=None)
+    conn = sqlite3.connect(db_path)
+    # 空のうちにマイグレーションを適用（履歴とuser_versionも記録し、データ移行は空で完了させる）
+    # 索引はトリガーで行の追加と同時に作られるため、DatabaseManagerを開いても再実行は起きない
+    migrations.migrate(conn, max_version=max_version)
+    conn.executemany("""
+        INSERT INTO fortunetellers
+        (name, latitude, longitude, description, contact, category, status,
+         created_at, updated_at, zipcode, address, deleted_at, deleted_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, _generate_fortunetellers(count))
+    conn.executemany("""
+        INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, deleted_at)
+        VALUES ('fortunetellers', ?, '{}', '管理者', ?)
+    """, ((i, f"2024-01-01 00:00:{i % 60:02d}") for i in range(count // 10)))
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _time_query(conn, sql: str, params=(), repeat: int = 5) -> float:
+    """クエリを実行して全行取得するまでの中央値（秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2]
+
+
+# DatabaseManagerの一覧・統計メソッドと同じ形のクエリ
+INDEX_BENCH_QUERIES = {
+    "承認済み一覧（先頭50件）": (
+        "SELECT * FROM fortunetellers WHERE status = ? AND deleted_at IS NULL "
+        "ORDER BY created_at DESC LIMIT 50", ("approved",)),
+    "承認待ち一覧（全件）": (
+        "SELECT * FROM fortunetellers WHERE status = ? AND deleted_at IS NULL "
+        "ORDER BY created_at DESC", ("pending",)),
+    "削除済み一覧（先頭50件）": (
+        "SELECT * FROM fortunetellers WHERE deleted_at IS NOT NULL "
+        "ORDER BY deleted_at DESC LIMIT 50", ()),
+    "ステータス別件数": (
+        "SELECT status, COUNT(*) FROM fortunetellers WHERE deleted_at IS NULL "
+        "GROUP BY status", ()),
+    "カテゴリ別件数": (
+        "SELECT category, COUNT(*) as count FROM fortunetellers "
+        "WHERE status = 'approved' AND deleted_at IS NULL "
+        "GROUP BY category ORDER BY count DESC", ()),
+    "削除ログ（先頭50件）": (
+        "SELECT * FROM deletion_logs ORDER BY deleted_at DESC LIMIT ?", (50,)),
+}
+
+
+def run_indexes(sizes: list):
+    """インデックス追加前後のクエリ時間とEXPLAIN QUERY PLANを表示"""
+    import sqlite3
+    import migrations
+
+    for size in sizes:
+        db_path = _create_synthetic_database(size, max_version=2)
+        conn = sqlite3.connect(db_path)
+        before = {name: _time_query(conn, sql, params)
+                  for name, (sql, params) in INDEX_BENCH_QUERIES.items()}
+
+        started = time.perf_counter()
+        migrations.migrate(conn)
+        conn.execute("ANALYZE")
+        build_time = time.perf_counter() - started
+        after = {name: _time_query(conn, sql, params)
+                 for name, (sql, params) in INDEX_BENCH_QUERIES.items()}
+
+        print(f"\n📊 {size:,}件（インデックス作成 {build_time:.2f}秒）")
+        for name in INDEX_BENCH_QUERIES:
+            print(f"  {name}: {before[name] * 1000:.2f}ms → {after[name] * 1000:.2f}ms")
+        conn.close()
+
+    print("\n🔍 EXPLAIN QUERY PLAN")
+    conn = sqlite3.connect(config.DATABASE_PATH)
+    for name, (sql, params) in INDEX_BENCH_QUERIES.items():
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        print(f"  {name}: " + " / ".join(row[3] for row in plan))
+    conn.close()
+
+
+def run_bbox(sizes: list):
+    """表示範囲検索のR*Treeと座標の範囲スキャンを比較"""
+    import database
+    import migrations
+
+    # 東京都心あたりの表示範囲（ズーム12程度）
+    viewport = (35.60, 139.60, 35.75, 139.85)
+    for size in sizes:
+        db_path = _create_synthetic_database(size)
+        with database.get_connection_pool(db_path).connection() as conn:
+            migrations.run_pending_backfills(conn)
+        db = database.get_database_manager()
+
+        samples = []
+        for _ in range(20):
+            started = time.perf_counter()
+            rtree_df = db.get_fortunetellers_in_bbox(*viewport)
+            samples.append(time.perf_counter() - started)
+
+        south, west, north, east = viewport
+        scan_sql = ("SELECT * FROM fortunetellers WHERE latitude BETWEEN ? AND ? "
+                    "AND longitude BETWEEN ? AND ? AND status = 'approved' "
+                    "AND deleted_at IS NULL ORDER BY created_at DESC")
+        with db._connection() as conn:
+            scan = _time_query(conn, scan_sql, (south, north, west, east))
+
+        print(f"📍 {size:,}件: R*Tree {_format_percentiles(samples)} "
+              f"（{len(rtree_df)}件） / 範囲スキャン {scan * 1000:.2f}ms")
+
+
+def run_viewport(sizes: list, zoom: int = 10):
+    """全件描画・表示範囲連動描画・サーバー側クラスターの地図HTMLサイズと生成時間を比較"""
+    import database
+    import migrations
+    from ui.cluster_index import get_cluster_index
+    from ui.map_manager import MapManager
+
+    # 東京を中心に開いた状態
+    center = (config.DEFAULT_CENTER_LAT, config.DEFAULT_CENTER_LON)
+    bounds = MapManager.expand_bounds(MapManager.estimate_bounds(center[0], center[1], zoom))
+    for size in sizes:
+        db_path = _create_synthetic_database(size)
+        with database.get_connection_pool(db_path).connection() as conn:
+            migrations.run_pending_backfills(conn)
+        db = database.get_database_manager()
+
+        started = time.perf_counter()
+        index = get_cluster_index(db)
+        build = time.perf_counter() - started
+
+        def load_clusters():
+            clusters = index.get_clusters(bounds, zoom)
+            df = db.get_fortunetellers_by_ids(
+                [cluster['id'] for cluster in clusters if cluster['count'] == 1])
+            return df, clusters
+
+        results = {}
+        for label, load in (
+                ("全件", lambda: (db.get_fortunetellers(), None)),
+                ("表示範囲", lambda: (db.get_fortunetellers_in_bbox(
+                    *bounds, limit=config.MAP_VIEWPORT_MAX_MARKERS), None)),
+                ("クラスター", load_clusters)):
+            if label == "全件" and size > 10000:
+                continue  # 全件描画は数分かかるため小さい件数のみ
+            started = time.perf_counter()
+            df, clusters = load()
+            html = MapManager.create_map(
+                df, center=center, zoom=zoom, clusters=clusters).get_root().render()
+            count = len(df) + sum(1 for c in clusters or [] if c['count'] > 1)
+            results[label] = (count, len(html.encode("utf-8")), time.perf_counter() - started)
+
+        print(f"🗺️ {size:,}件 ズーム{zoom}（クラスター構築 {build * 1000:,.0f}ms）: " + " / ".join(
+            f"{label} {count:,}マーカー {html_bytes / 1024:,.0f}KB {elapsed * 1000:,.0f}ms"
+            for label, (count, html_bytes, elapsed) in results.items()))
+
+
+def run_markers(sizes: list):
+    """通常マーカーと軽量表示（配列＋共通テンプレート）の地図HTMLサイズ・生成時間を比較"""
+    from ui.map_manager import MapManager
+
+    for size in sizes:
+        df = _generate_fortunetellers_df(size)
+        results = {}
+        for label, compact in (("通常", False), ("軽量", True)):
+            started = time.perf_counter()
+            html = MapManager.create_map(df, compact=compact).get_root().render()
+            results[label] = (len(html.encode("utf-8")), time.perf_counter() - started)
+
+        print(f"📦 {size:,}マーカー: " + " / ".join(
+            f"{label} {html_bytes / 1024:,.0f}KB（{html_bytes / size:,.0f}B/件） "
+            f"生成 {elapsed * 1000:,.0f}ms"
+            for label, (html_bytes, elapsed) in results.items()))
+
+
+def run_basemap(sizes: list, reruns: int):
+    """選択を変えながら再実行：毎回の地図作成と、共有のベース地図＋選択レイヤーを比較"""
+    from streamlit_folium import st_folium
+    from ui.map_manager import MapManager
+
+    for size in sizes:
+        df = _generate_fortunetellers_df(size)
+        selected_ids = df['id'].sample(reruns, random_state=0).tolist()
+
+        rebuild_samples = []
+        for selected_id in selected_ids:
+            started = time.perf_counter()
+            st_folium(MapManager.create_map(df, selected_id=selected_id), key="bench")
+            rebuild_samples.append(time.perf_counter() - started)
+
+        cached_samples = []
+        for selected_id in selected_ids:
+            started = time.perf_counter()
+            base_map = MapManager.get_base_map(size, "bench", df)
+            with MapManager.rendering(base_map) as map_obj:
+                st_folium(map_obj, key="bench", render=False,
+                          feature_group_to_add=MapManager.create_selection_layer(df, selected_id))
+            cached_samples.append(time.perf_counter() - started)
+
+        print(f"🗺️ {size:,}マーカー / 選択を変えて{reruns}回")
+        print(f"   毎回作成:       {_format_percentiles(rebuild_samples)}")
+        print(f"   ベース地図共有: {_format_percentiles(cached_samples)}（初回の作成を含む）")
+    print(f"   {MapManager.get_base_map_cache_stats()}")
+
+
+def _normal_markers_iterrows(fortunetellers_df) -> list:
+    """従来の通常マーカー作成（iterrowsで1行ずつSeriesを作り、カテゴリを毎回引く）"""
+    import folium
+    from ui.map_manager import MapManager
+
+    markers = []
+    for idx, row in fortunetellers_df.iterrows():
+        icon_symbol = MapManager._get_icon_for_category(row.get('category', 'その他'))
+        category_emoji = MapManager.CATEGORY_EMOJIS.get(row.get('category'), "🔮")
+        markers.append(folium.Marker(
+            [row['latitude'], row['longitude']],
+            tooltip=folium.Tooltip(f"{category_emoji} {row['name']}", permanent=False, sticky=True),
+            icon=folium.Icon(color='purple', icon=icon_symbol, prefix='fa'),
+            fortuneteller_id=int(row['id'])
+        ))
+    return markers
+
+
+def run_rows(sizes: list):
+    """通常マーカー作成：iterrowsと列単位の取り出しを比較（行の取り出しのみ・マーカー作成まで）"""
+    from ui.map_manager import MapManager
+
+    for size in sizes:
+        df = _generate_fortunetellers_df(size)
+
+        started = time.perf_counter()
+        for idx, row in df.iterrows():
+            (int(row['id']), row['latitude'], row['longitude'], row['name'],
+             MapManager._get_icon_for_category(row.get('category', 'その他')),
+             MapManager.CATEGORY_EMOJIS.get(row.get('category'), "🔮"))
+        iterrows_scan = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for values in MapManager._iter_marker_values(df):
+            pass
+        columnar_scan = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _normal_markers_iterrows(df)
+        iterrows_build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        [MapManager._create_normal_marker(*values) for values in MapManager._iter_marker_values(df)]
+        columnar_build = time.perf_counter() - started
+
+        print(f"🧮 {size:,}件")
+        print(f"   行の取り出し:   iterrows {iterrows_scan * 1000:.1f}ms → 列単位 {columnar_scan * 1000:.1f}ms"
+              f"（{iterrows_scan / columnar_scan:.0f}倍）")
+        print(f"   マーカー作成:   iterrows {iterrows_build:.2f}秒 → 列単位 {columnar_build:.2f}秒"
+              f"（{iterrows_build / columnar_build:.1f}倍）")
+
+
+def _find_closest_loop(clicked_lat: float, clicked_lng: float, fortunetellers_df):
+    """従来のクリック判定（iterrowsで平面距離を計算）"""
+    import math
+
+    min_distance = float('inf')
+    closest_id = None
+    for idx, row in fortunetellers_df.iterrows():
+        lat_diff = clicked_lat - row['latitude']
+        lng_diff = clicked_lng - row['longitude']
+        distance = math.sqrt(lat_diff**2 + lng_diff**2)
+        if distance < min_distance:
+            min_distance = distance
+            closest_id = row['id']
+    return closest_id if min_distance < 0.1 else None
+
+
+def run_nearest(size: int, queries: int):
+    """クリック判定の最近傍探索：従来のループと空間インデックスを比較"""
+    from spatial_index import SpatialIndex
+
+    df = _generate_fortunetellers_df(size)
+    rng = random.Random(1)
+    points = [(rng.uniform(24.0, 45.5), rng.uniform(123.0, 146.0)) for _ in range(queries)]
+
+    started = time.perf_counter()
+    index = SpatialIndex.from_dataframe(df)
+    build = time.perf_counter() - started
+
+    loop_samples = []
+    for lat, lng in points[:max(1, queries // 20)]:  # 1回数秒かかるため一部のみ
+        started = time.perf_counter()
+        _find_closest_loop(lat, lng, df)
+        loop_samples.append(time.perf_counter() - started)
+
+    nearest_samples, knn_samples, radius_samples = [], [], []
+    for lat, lng in points:
+        started = time.perf_counter()
+        index.nearest(lat, lng, k=1, max_distance_km=config.MAP_CLICK_RADIUS_KM)
+        nearest_samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        index.nearest(lat, lng, k=10)
+        knn_samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        index.within_radius(lat, lng, 5.0)
+        radius_samples.append(time.perf_counter() - started)
+
+    print(f"🎯 {size:,}件（インデックス構築 {build * 1000:,.0f}ms）")
+    print(f"🐢 従来のループ: {_format_percentiles(loop_samples)}")
+    print(f"⚡ 最近傍1件: {_format_percentiles(nearest_samples)}")
+    print(f"⚡ 近傍10件: {_format_percentiles(knn_samples)}")
+    print(f"⚡ 半径5km: {_format_percentiles(radius_samples)}")
+
+
+def run_nearby(sizes: list, radius_km: float):
+    """近くの占い師検索：R*Tree＋距離計算と全件読み込み＋距離計算を比較"""
+    import database
+    import migrations
+    from spatial_index import haversine_km
+
+    rng = random.Random(2)
+    points = [(rng.uniform(33.0, 36.0), rng.uniform(130.0, 140.0)) for _ in range(20)]
+    for size in sizes:
+        db_path = _create_synthetic_database(size)
+        with database.get_connection_pool(db_path).connection() as conn:
+            migrations.run_pending_backfills(conn)
+        db = database.get_database_manager()
+
+        samples, found = [], 0
+        for lat, lng in points:
+            started = time.perf_counter()
+            found += len(db.search_nearby(lat, lng, radius_km, limit=20))
+            samples.append(time.perf_counter() - started)
+
+        # 比較：承認済みを全件読み込んでから距離計算
+        full_samples = []
+        for lat, lng in points[:5]:
+            started = time.perf_counter()
+            df = db.get_fortunetellers()
+            df['distance_km'] = haversine_km(lat, lng, df['latitude'].to_numpy(), df['longitude'].to_numpy())
+            df[df['distance_km'] <= radius_km].nsmallest(20, 'distance_km')
+            full_samples.append(time.perf_counter() - started)
+
+        print(f"📍 {size:,}件 半径{radius_km:g}km: R*Tree＋距離計算 {_format_percentiles(samples)}"
+              f"（平均{found / len(points):.1f}件） / 全件読み込み {_format_percentiles(full_samples)}")
+
+
+def run_search(sizes: list):
+    """全文検索：FTS5と従来のpandasのstr.contains（全件読み込み）を比較"""
+    import database
+    import migrations
+
+    queries = ["占い師12345", "占い師99 千代田", "千代田区3", "タロット"]
+    for size in sizes:
+        db_path = _create_synthetic_database(size)
+        with database.get_connection_pool(db_path).connection() as conn:
+            migrations.run_pending_backfills(conn)
+        db = database.get_database_manager()
+
+        print(f"🔍 {size:,}件")
+        for query in queries:
+            samples = []
+            for _ in range(10):
+                started = time.perf_counter()
+                found = len(db.search_fortunetellers(query, limit=50))
+                samples.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            df = db.get_fortunetellers("approved")
+            df[df['name'].str.contains(query, na=False) |
+               df['category'].str.contains(query, na=False) |
+               df['address'].str.contains(query, na=False)]
+            scan = time.perf_counter() - started
+
+            print(f"   「{query}」FTS5 {_format_percentiles(samples)}（{found}件） / "
+                  f"str.contains {scan * 1000:,.0f}ms")
+
+
+def run_pages(sizes: list, pages: int):
+    """管理画面の一覧：キーセットページングの1ページ取得と全件読み込みを比較"""
+    import database
+
+    page_size = config.ADMIN_PAGE_SIZE
+    for size in sizes:
+        _create_synthetic_database(size)
+        db = database.get_database_manager()
+
+        # 先頭から pages ページ目までカーソルをたどり、各ページの取得時間を測る
+        listings = {
+            "承認済み": (lambda limit, after: db.get_fortunetellers(
+                "approved", limit=limit, after=after), "created_at"),
+            "削除済み": (lambda limit, after: db.get_deleted_fortunetellers(
+                limit=limit, after=after), "deleted_at"),
+            "削除ログ": (lambda limit, after: db.get_deletion_logs(
+                limit, after=after), "deleted_at"),
+        }
+        print(f"📄 {size:,}件（{page_size}件/ページ）")
+        for label, (fetch, sort_column) in listings.items():
+            samples, after = [], None
+            for _ in range(pages):
+                started = time.perf_counter()
+                df = fetch(page_size + 1, after)
+                samples.append(time.perf_counter() - started)
+                if len(df) <= page_size:
+                    break
+                after = db.get_next_cursor(df.head(page_size), sort_column)
+            print(f"   {label}: 1〜{len(samples)}ページ目 {_format_percentiles(samples)}"
+                  f"（最終ページ {samples[-1] * 1000:.2f}ms）")
+
+        started = time.perf_counter()
+        db.get_fortunetellers("approved")
+        print(f"   比較：承認済みの全件読み込み {(time.perf_counter() - started) * 1000:,.0f}ms")
+
+
+def _purge_loop(conn, fortuneteller_ids: list, deleted_by: str) -> int:
+    """従来の完全削除（1件ずつSELECT・ログ記録・DELETE）"""
+    import json
+    import sqlite3
+
+    conn.row_factory = sqlite3.Row
+    deleted_count = 0
+    conn.execute("BEGIN IMMEDIATE")
+    for fortuneteller_id in fortuneteller_ids:
+        row = conn.execute("SELECT * FROM fortunetellers WHERE id = ? AND deleted_at IS NOT NULL",
+                           (fortuneteller_id,)).fetchone()
+        if row:
+            conn.execute("""
+                INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
+                VALUES (?, ?, ?, ?, ?)
+            """, ("fortunetellers_permanent", fortuneteller_id,
+                  json.dumps(dict(row), ensure_ascii=False), deleted_by, "完全削除"))
+            deleted_count += conn.execute(
+                "DELETE FROM fortunetellers WHERE id = ?", (fortuneteller_id,)).rowcount
+    conn.commit()
+    return deleted_count
+
+
+def run_purge(size: int, id_count: int):
+    """完全削除：1文ずつの一括処理と従来の1件ずつのループを比較"""
+    import sqlite3
+    import database
+
+    db_path = _create_synthetic_database(size)
+    db = database.get_database_manager()
+
+    # 前半と後半のID群を論理削除し、それぞれの方式で完全削除する
+    ids = random.Random(3).sample(range(1, size + 1), id_count * 2)
+    loop_ids, bulk_ids = ids[:id_count], ids[id_count:]
+    conn = sqlite3.connect(db_path)
+    conn.executemany("UPDATE fortunetellers SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?",
+                     ((i,) for i in ids))
+    conn.commit()
+
+    started = time.perf_counter()
+    loop_count = _purge_loop(conn, loop_ids, "管理者")
+    loop_elapsed = time.perf_counter() - started
+    conn.close()
+
+    started = time.perf_counter()
+    result = db.permanently_delete_fortunetellers(bulk_ids, "管理者")
+    bulk_elapsed = time.perf_counter() - started
+
+    print(f"💀 {size:,}件中 {id_count:,}件を完全削除: "
+          f"一括 {bulk_elapsed * 1000:,.0f}ms（{result['deleted_count']:,}件） / "
+          f"1件ずつ {loop_elapsed * 1000:,.0f}ms（{loop_count:,}件）")
+
+
+def run_moderate(size: int, id_count: int):
+    """一括承認・一括削除と、1件ずつの update_status・delete_fortuneteller を比較"""
+    import database
+
+    _create_synthetic_database(size)
+    db = database.get_database_manager()
+    pending_ids = db.get_fortunetellers("pending")['id'].tolist()
+    if len(pending_ids) < id_count * 2:
+        print(f"❌ 承認待ちが{id_count * 2:,}件未満です（{len(pending_ids):,}件）")
+        return
+    loop_ids, bulk_ids = pending_ids[:id_count], pending_ids[id_count:id_count * 2]
+
+    started = time.perf_counter()
+    for fortuneteller_id in loop_ids:
+        db.update_status(fortuneteller_id, "approved", "管理者")
+    loop_approve = time.perf_counter() - started
+
+    started = time.perf_counter()
+    db.bulk_update_status(bulk_ids, "approved", "管理者")
+    bulk_approve = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for fortuneteller_id in loop_ids:
+        db.delete_fortuneteller(fortuneteller_id, "管理者", "ベンチマーク")
+    loop_delete = time.perf_counter() - started
+
+    started = time.perf_counter()
+    db.bulk_soft_delete(bulk_ids, "管理者", "ベンチマーク")
+    bulk_delete = time.perf_counter() - started
+
+    print(f"📦 {size:,}件中 {id_count:,}件")
+    print(f"   承認: 一括 {bulk_approve * 1000:,.0f}ms / 1件ずつ {loop_approve * 1000:,.0f}ms")
+    print(f"   論理削除: 一括 {bulk_delete * 1000:,.0f}ms / 1件ずつ {loop_delete * 1000:,.0f}ms")
+
+
+def run_import(sizes: list):
+    """一括インポート（CSV・JSONL）の行/秒（索引をその場で作る場合とバックグラウンドに任せる場合）"""
+    import database
+    import importer
+    import migrations
+
+    columns = ["name", "latitude", "longitude", "description", "contact", "category",
+               "zipcode", "address"]
+    for size in sizes:
+        for file_format in importer.IMPORT_FORMATS:
+            for defer_index in (False, True):
+                db_path = _use_temp_database(copy_from=None)
+                db = database.get_database_manager()
+                df = _generate_fortunetellers_df(size)[columns]
+                source = os.path.join(os.path.dirname(db_path), f"import.{file_format}")
+                if file_format == "jsonl":
+                    df.to_json(source, orient="records", lines=True, force_ascii=False)
+                else:
+                    df.to_csv(source, index=False)
+
+                result = importer.import_fortunetellers(db, source, file_format,
+                                                        defer_index=defer_index)
+                timings = result['timings']
+                mode = "索引はバックグラウンド" if defer_index else "索引も作成"
+                print(f"📥 {size:,}行 {file_format.upper()}（{mode}）: {result['elapsed']:.2f}秒 "
+                      f"（{result['total_rows'] / result['elapsed']:,.0f}行/秒・"
+                      f"登録{result['imported_count']:,}件・却下{result['rejected_count']:,}件）")
+                print(f"   読み込み {timings['read']:.2f}秒 / 検証 {timings['validate']:.2f}秒 / "
+                      f"登録 {timings['insert']:.2f}秒 / 索引作成 {timings['index']:.2f}秒")
+                if defer_index:
+                    # バックグラウンドのデータ移行が終わり、新しい行が検索に出るまでの時間
+                    started = time.perf_counter()
+                    while True:
+                        with db._connection() as conn:
+                            if not migrations.pending_backfills(conn):
+                                break
+                        time.sleep(0.05)
+                    print(f"   索引の完了まで さらに{time.perf_counter() - started:.2f}秒")
+
+
+def run_export(sizes: list):
+    """エクスポートの所要時間・出力サイズ・Pythonのピークメモリ（tracemalloc）"""
+    import tracemalloc
+    import database
+    import exporter
+
+    for size in sizes:
+        _create_synthetic_database(size)
+        db = database.get_database_manager()
+        print(f"📤 {size:,}件（論理削除を含む）")
+        for file_format in exporter.available_formats("fortunetellers"):
+            def export():
+                return sum(len(chunk) for chunk in exporter.export_table(
+                    db, "fortunetellers", file_format, include_deleted=True))
+
+            # 時間はtracemallocなしで計測し、メモリは別に計測する
+            started = time.perf_counter()
+            written = export()
+            elapsed = time.perf_counter() - started
+            tracemalloc.start()
+            export()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"   {file_format.upper()}: {elapsed:.2f}秒 / {written / 1e6:,.1f}MB / "
+                  f"ピークメモリ {peak / 1e6:.1f}MB")
+
+        tracemalloc.start()
+        db.get_fortunetellers("all", include_deleted=True).to_csv(io.BytesIO(), index=False)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"   比較：DataFrameに全件読み込んでCSV化 ピークメモリ {peak / 1e6:.1f}MB")
+
+
+def _statistics_scan(conn) -> dict:
+    """従来の統計取得（ステータス別・削除済み・カテゴリ別をその都度集計）"""
+    counts = dict(conn.execute("""
+        SELECT status, COUNT(*) FROM fortunetellers WHERE deleted_at IS NULL GROUP BY status
+    """).fetchall())
+    counts['deleted'] = conn.execute(
+        "SELECT COUNT(*) FROM fortunetellers WHERE deleted_at IS NOT NULL").fetchone()[0]
+    counts['categories'] = conn.execute("""
+        SELECT category, COUNT(*) AS count FROM fortunetellers
+        WHERE status = 'approved' AND deleted_at IS NULL
+        GROUP BY category ORDER BY count DESC
+    """).fetchall()
+    return counts
+
+
+def run_stats(sizes: list, operations: int) -> bool:
+    """統計取得：集計テーブルと従来の集計を比較し、書き込み後も件数が一致するか確認
+
+    Returns:
+        すべての一致確認に通ればTrue（mainは失敗時に終了コード1で終わる）
+    """
+    import database
+
+    operation_names = ["save", "status", "delete", "restore", "purge",
+                       "bulk_status", "bulk_delete", "bulk_insert"]
+    all_consistent = True
+
+    for size in sizes:
+        _create_synthetic_database(size)
+        db = database.get_database_manager()
+
+        table_samples, scan_samples = [], []
+        for _ in range(20):
+            started = time.perf_counter()
+            db.get_statistics()
+            table_samples.append(time.perf_counter() - started)
+        with db._connection() as conn:
+            for _ in range(20):
+                started = time.perf_counter()
+                _statistics_scan(conn)
+                scan_samples.append(time.perf_counter() - started)
+        print(f"📊 {size:,}件")
+        print(f"   集計テーブル: {_format_percentiles(table_samples)}")
+        print(f"   従来の集計:   {_format_percentiles(scan_samples)}")
+
+        # 単体・一括の書き込みを混ぜて実行し、集計テーブルが実データと一致し続けるか確認
+        rng = random.Random(0)
+        ids = db.get_fortunetellers("all", include_deleted=True)['id'].tolist()
+
+        def run_operation(operation: str):
+            targets = rng.sample(ids, 20)
+            if operation == "save":
+                db.save_fortuneteller({"name": "統計確認", "latitude": 35.0, "longitude": 135.0,
+                                       "category": rng.choice(["タロット", None])})
+            elif operation == "status":
+                db.update_status(targets[0], rng.choice(["approved", "pending", "rejected"]), "管理者")
+            elif operation == "delete":
+                db.delete_fortuneteller(targets[0], "管理者", "ベンチマーク")
+            elif operation == "restore":
+                db.restore_fortuneteller(targets[0])
+            elif operation == "purge":
+                db.permanently_delete_fortunetellers(targets, "管理者")
+            elif operation == "bulk_status":
+                db.bulk_update_status(targets, rng.choice(["approved", "rejected"]), "管理者")
+            elif operation == "bulk_delete":
+                db.bulk_soft_delete(targets, "管理者", "ベンチマーク")
+            else:
+                db.bulk_insert_fortunetellers(
+                    [(f"一括{i}", 34.0, 135.0, None, None, None, rng.choice(["霊視", None]),
+                      "ベンチマーク", None, None) for i in range(20)],
+                    status=rng.choice(["pending", "approved"]))
+
+        def check(label: str) -> bool:
+            result = db.check_statistics()
+            if result['consistent']:
+                print(f"   ✅ {label}も実データと一致")
+            else:
+                print(f"   ❌ {label}: {len(result['differences'])}件の食い違い "
+                      f"{result['differences'][:5]}")
+            return result['consistent']
+
+        # 書き込みの種類ごとに1回ずつ実行し、その都度一致を確認
+        for operation in operation_names:
+            run_operation(operation)
+            all_consistent &= check(f"{operation} の後")
+
+        for _ in range(operations):
+            run_operation(rng.choice(operation_names))
+        all_consistent &= check(f"{operations:,}回の書き込み後")
+
+    return all_consistent
+
+
+def _revision_writer(db_path: str, fortuneteller_id: int):
+    """別プロセスから占い師を承認する（リビジョン確認用）"""
+    config.DATABASE_PATH = db_path
+    import database
+    database.get_database_manager().update_status(fortuneteller_id, "approved", "別プロセス")
+
+
+def run_revision(size: int) -> bool:
+    """データのリビジョン：書き込み（別プロセスを含む）で進むことと取得時間を確認
+
+    Returns:
+        すべての確認に通ればTrue（mainは失敗時に終了コード1で終わる）
+    """
+    import multiprocessing
+    import database
+
+    db_path = _create_synthetic_database(size)
+    db = database.get_database_manager()
+    pending_ids = db.get_fortunetellers("pending", limit=2)['id'].tolist()
+
+    checks = []
+    before = db.get_revision()
+    db.update_status(pending_ids[0], "approved", "管理者")
+    checks.append(("このプロセスの書き込みで進む", db.get_revision() > before))
+
+    before = db.get_revision()
+    db.update_status(-1, "approved", "管理者")
+    checks.append(("行が変わらない書き込みでは進まない", db.get_revision() == before))
+
+    before = db.get_revision()
+    process = multiprocessing.get_context("spawn").Process(
+        target=_revision_writer, args=(db_path, pending_ids[1]))
+    process.start()
+    process.join()
+    after = db.get_revision()
+    checks.append(("別プロセスの書き込みで進む", after > before))
+    checks.append(("別プロセスの書き込みが読み取りに反映される",
+                   db.get_fortuneteller_by_id(pending_ids[1])['status'] == "approved"))
+
+    for label, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {label}")
+
+    samples = []
+    for _ in range(1000):
+        started = time.perf_counter()
+        db.get_revision()
+        samples.append(time.perf_counter() - started)
+    print(f"🔢 get_revision（変更なし）: {_format_percentiles(samples)}")
+    return all(ok for _, ok in checks)
+
+
+def run_cache(size: int, visitors: int):
+    """読み取りキャッシュ：変わらない地図を同時に見るN人分の読み取りをキャッシュあり・なしで比較"""
+    import database
+
+    _create_synthetic_database(size)
+    db = database.get_database_manager()
+    read_cache = db.read_cache
+    detail_id = int(db.get_fortunetellers("approved", limit=1)['id'].iloc[0])
+
+    def visit():
+        # 地図画面の1回の再実行で読むもの
+        db.get_fortunetellers()
+        db.get_statistics()
+        db.get_setting('announcements')
+        db.get_fortuneteller_by_id(detail_id)
+
+    def run_visitors() -> float:
+        threads = [threading.Thread(target=visit) for _ in range(visitors)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    db.read_cache = None
+    uncached = run_visitors()
+
+    db.read_cache = read_cache
+    read_cache.clear()
+    visit()  # 最初の1人がDBから読み込む
+    before = read_cache.stats()
+    cached = run_visitors()
+    after = read_cache.stats()
+
+    print(f"🗄️ {size:,}件 / {visitors}人が同時に閲覧")
+    print(f"   キャッシュなし: {uncached:.2f}秒（{visitors * 4:,}回のクエリ）")
+    print(f"   キャッシュあり: {cached:.2f}秒（DB読み込み {after['misses'] - before['misses']}回・"
+          f"ヒット {after['hits'] - before['hits']:,}回）")
+
+    db.update_status(detail_id, "pending", "管理者")
+    visit()
+    print(f"   書き込み後: {read_cache.stats()}")
+
+
+def _run_together(count: int, target) -> list:
+    """count個のスレッドで target を一斉に実行し、それぞれの所要時間を返す"""
+    barrier = threading.Barrier(count)
+    samples = []
+
+    def run():
+        barrier.wait()
+        started = time.perf_counter()
+        target()
+        samples.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def run_stampede(size: int, visitors: int, markers: int):
+    """キャッシュスタンピード：書き込み直後にN人が同時に同じ値を求めたときの計算回数と所要時間"""
+    import database
+    from ui.map_manager import MapManager
+
+    _create_synthetic_database(size)
+    db = database.get_database_manager()
+    read_cache = db.read_cache
+    uncoalesced = database.DatabaseManager.get_fortunetellers.__wrapped__
+    ids = db.get_fortunetellers("approved", limit=visitors * 3)['id'].tolist()
+    queries = []
+
+    def read_uncoalesced():
+        # 単純なキャッシュ：見つからなければ各自がDBから読み込んで保存する
+        key = ('get_fortunetellers', (), ())
+        revision = db.get_revision()
+        found, _ = read_cache.get(key, revision)
+        if not found:
+            queries.append(1)
+            read_cache.put(key, revision, uncoalesced(db))
+
+    def computations() -> int:
+        return read_cache.stats()['computations']
+
+    print(f"🐘 {size:,}件 / 書き込み直後に{visitors}人が同時に地図を表示")
+    db.get_fortunetellers()
+    db.update_status(ids[0], "pending", "ベンチマーク")
+    samples = _run_together(visitors, read_uncoalesced)
+    print(f"   まとめない:     {_format_percentiles(samples)}（DB読み込み {len(queries)}回）")
+
+    db.update_status(ids[1], "pending", "ベンチマーク")
+    before = computations()
+    samples = _run_together(visitors, db.get_fortunetellers)
+    print(f"   まとめる:       {_format_percentiles(samples)}（DB読み込み {computations() - before}回）")
+
+    read_cache.serve_stale = True
+    db.get_fortunetellers()
+    db.update_status(ids[2], "pending", "ベンチマーク")
+    before = computations()
+    samples = _run_together(visitors, db.get_fortunetellers)
+    time.sleep(0.5)  # バックグラウンドの読み込みを待つ
+    print(f"   古い値を返す:   {_format_percentiles(samples)}（DB読み込み {computations() - before}回・"
+          f"古い値 {read_cache.stats()['stale_hits']}回）")
+    read_cache.serve_stale = config.READ_CACHE_SERVE_STALE
+
+    df = _generate_fortunetellers_df(markers)
+    map_cache = MapManager._base_map_cache
+    builds = []
+
+    def build_uncoalesced():
+        found, _ = map_cache.get("bench", 1)
+        if not found:
+            builds.append(1)
+            map_cache.put("bench", 1, MapManager.create_base_map(df))
+
+    print(f"🗺️ {markers:,}マーカー / データ更新後に{visitors}人が同時にベース地図を要求")
+    samples = _run_together(visitors, build_uncoalesced)
+    print(f"   まとめない:     {_format_percentiles(samples)}（地図の作成 {len(builds)}回）")
+    before = map_cache.stats()['computations']
+    samples = _run_together(visitors, lambda: MapManager.get_base_map(2, "bench", df))
+    print(f"   まとめる:       {_format_percentiles(samples)}"
+          f"（地図の作成 {map_cache.stats()['computations'] - before}回）")
+
+
+def run_records(size: int, calls: int):
+    """少数行の読み取り：DataFrameと行レコード（namedtuple）で1回あたりの時間とメモリ確保量を比較"""
+    import tracemalloc
+    import database
+
+    _create_synthetic_database(size)
+    db = database.get_database_manager()
+    db.read_cache = None  # 毎回DBから読み込む時間を計測する
+
+    cases = [
+        ("新着5件", lambda: db.get_fortunetellers("approved", limit=5),
+         lambda: db.get_fortuneteller_records("approved", limit=5)),
+        ("一覧50件", lambda: db.get_fortunetellers("approved", limit=50),
+         lambda: db.get_fortuneteller_records("approved", limit=50)),
+        ("検索50件", lambda: db.search_fortunetellers("千代田区3", limit=50),
+         lambda: db.search_fortuneteller_records("千代田区3", limit=50)),
+    ]
+
+    def measure(read) -> tuple:
+        read()
+        samples = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            read()
+            samples.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        peaks = []
+        for _ in range(max(1, calls // 10)):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            result = read()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            del result
+        tracemalloc.stop()
+        return samples, sum(peaks) / len(peaks)
+
+    print(f"📋 {size:,}件 / 各{calls}回")
+    for label, read_df, read_records in cases:
+        df_samples, df_peak = measure(read_df)
+        record_samples, record_peak = measure(read_records)
+        print(f"   {label} DataFrame:    {_format_percentiles(df_samples)} / 確保 {df_peak / 1024:.0f}KB")
+        print(f"   {label} 行レコード:   {_format_percentiles(record_samples)} / 確保 {record_peak / 1024:.0f}KB")
+
+
+def run_stress(readers: int, writers: int, duration: float):
+    """N個の読み取りスレッドとM個の書き込みスレッドを同時に実行"""
+    db_path = _use_temp_database()
+    from database import DatabaseManager
+
+    db = DatabaseManager()
+    db.read_cache = None  # DBへの同時アクセスを計測するため読み取りキャッシュは使わない
+    ids = db.get_fortunetellers("approved")['id'].tolist()
+    if not ids:
+        print("❌ 承認済みデータがありません")
+        return
+
+    stop = threading.Event()
+    read_latencies = []
+    write_latencies = []
+    write_failures = []
+
+    def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            db.get_fortunetellers()
+            read_latencies.append(time.perf_counter() - started)
+
+    def writer(worker_id: int):
+        count = 0
+        while not stop.is_set():
+            fortuneteller_id = ids[count % len(ids)]
+            started = time.perf_counter()
+            if count % 2 == 0:
+                ok = db.update_status(fortuneteller_id, "approved", "ベンチマーク")
+            else:
+                ok = db.update_setting(f"bench_writer_{worker_id}", str(count))
+            write_latencies.append(time.perf_counter() - started)
+            if not ok:
+                write_failures.append(fortuneteller_id)
+            count += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,))
+                for i in range(writers)]
+
+    print(f"🔧 DB: {db_path}")
+    print(f"🔧 読み取り {readers}スレッド / 書き込み {writers}スレッド / {duration}秒 "
+          f"(同時アクセスモード: {'有効' if config.DATABASE_CONCURRENCY_MODE else '無効'})")
+
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    pool_stats = db.get_pool_stats()
+    print(f"📖 読み取り: {len(read_latencies) / duration:.1f} ops/s  "
+          f"{_format_percentiles(read_latencies)}")
+    print(f"✏️ 書き込み: {len(write_latencies) / duration:.1f} ops/s  "
+          f"{_format_percentiles(write_latencies)}  失敗 {len(write_failures)}件")
+    print(f"🔒 ロック待ち: {_format_percentiles(list(db.pool.lock_wait_samples))}  "
+          f"再試行 {pool_stats['write_retries']}回")
+    print(f"🔌 プール: {pool_stats}")
+
+
+def run_bootstrap(reruns: int):
+    """DB初期化のコールドスタートと再実行時のコストを計測"""
+    db_path = _use_temp_database(copy_from=None)
+    import database
+
+    started = time.perf_counter()
+    db = database.get_database_manager()
+    cold = time.perf_counter() - started
+
+    # user_versionを使わずにマイグレーション履歴を照合した場合
+    full_check = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        with db._connection() as conn:
+            database.migrations.migrate(conn, use_fast_path=False)
+        full_check.append(time.perf_counter() - started)
+
+    # 別プロセス起動相当（user_versionの確認のみ）
+    warm_start = []
+    for _ in range(reruns):
+        database._bootstrapped_paths.discard(db_path)
+        started = time.perf_counter()
+        database.DatabaseManager()
+        warm_start.append(time.perf_counter() - started)
+
+    # Streamlitの再実行（プロセス共通インスタンスを再利用）
+    warm_rerun = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        database.get_database_manager()
+        warm_rerun.append(time.perf_counter() - started)
+
+    print(f"🔧 DB: {db_path}")
+    print(f"🧊 コールドスタート: {cold * 1000:.2f}ms")
+    print(f"🐢 マイグレーション履歴の照合: {_format_percentiles(full_check)}")
+    print(f"🚀 プロセス起動（スキーマ最新）: {_format_percentiles(warm_start)}")
+    print(f"⚡ 再実行: {_format_percentiles(warm_rerun)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="占い師マップのパフォーマンス計測")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stress = subparsers.add_parser("stress", help="読み書き同時実行のストレステスト")
+    stress.add_argument("--readers", type=int, default=8)
+    stress.add_argument("--writers", type=int, default=2)
+    stress.add_argument("--duration", type=float, default=10.0)
+
+    bootstrap = subparsers.add_parser("bootstrap", help="DB初期化の所要時間")
+    bootstrap.add_argument("--reruns", type=int, default=200)
+
+    indexes = subparsers.add_parser("indexes", help="インデックス前後のクエリ時間")
+    indexes.add_argument("--sizes", type=int, nargs="+",
+                         default=[10000, 100000, 1000000])
+
+    bbox = subparsers.add_parser("bbox", help="表示範囲検索の所要時間")
+    bbox.add_argument("--sizes", type=int, nargs="+",
+                      default=[10000, 100000, 1000000])
+
+    viewport = subparsers.add_parser("viewport", help="地図HTMLのサイズと生成時間")
+    viewport.add_argument("--sizes", type=int, nargs="+",
+                          default=[1000, 10000, 50000])
+    viewport.add_argument("--zoom", type=int, default=10)
+
+    markers = subparsers.add_parser("markers", help="マーカー表示方式ごとの地図HTMLサイズ")
+    markers.add_argument("--sizes", type=int, nargs="+",
+                         default=[1000, 10000, 50000])
+
+    basemap = subparsers.add_parser("basemap", help="ベース地図の共有と選択レイヤーの描画時間")
+    basemap.add_argument("--sizes", type=int, nargs="+", default=[300, 2000, 20000])
+    basemap.add_argument("--reruns", type=int, default=10)
+
+    rows = subparsers.add_parser("rows", help="通常マーカー作成の行の取り出し方式の比較")
+    rows.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+
+    nearest = subparsers.add_parser("nearest", help="クリック判定の最近傍探索")
+    nearest.add_argument("--size", type=int, default=100000)
+    nearest.add_argument("--queries", type=int, default=200)
+
+    nearby = subparsers.add_parser("nearby", help="近くの占い師検索の所要時間")
+    nearby.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000, 1000000])
+    nearby.add_argument("--radius", type=float, default=10.0)
+
+    search = subparsers.add_parser("search", help="全文検索の所要時間")
+    search.add_argument("--sizes", type=int, nargs="+",
+                        default=[100000, 1000000])
+
+    page_bench = subparsers.add_parser("pages", help="管理画面一覧のページ取得時間")
+    page_bench.add_argument("--sizes", type=int, nargs="+",
+                            default=[10000, 100000, 1000000])
+    page_bench.add_argument("--pages", type=int, default=100)
+
+    purge = subparsers.add_parser("purge", help="完全削除の所要時間")
+    purge.add_argument("--size", type=int, default=100000)
+    purge.add_argument("--ids", type=int, default=10000)
+
+    moderate = subparsers.add_parser("moderate", help="一括承認・一括削除の所要時間")
+    moderate.add_argument("--size", type=int, default=100000)
+    moderate.add_argument("--ids", type=int, default=5000)
+
+    import_bench = subparsers.add_parser("import", help="一括インポートの行/秒")
+    import_bench.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+
+    export_bench = subparsers.add_parser("export", help="エクスポートの所要時間とメモリ")
+    export_bench.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+
+    stats = subparsers.add_parser("stats", help="統計取得の所要時間と集計テーブルの整合性")
+    stats.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    stats.add_argument("--operations", type=int, default=500)
+
+    revision = subparsers.add_parser("revision", help="データのリビジョンの更新と取得時間")
+    revision.add_argument("--size", type=int, default=10000)
+
+    cache = subparsers.add_parser("cache", help="読み取りキャッシュのヒット率と所要時間")
+    cache.add_argument("--size", type=int, default=100000)
+    cache.add_argument("--visitors", type=int, default=500)
+
+    stampede = subparsers.add_parser("stampede", help="書き込み直後の同時アクセスで計算をまとめる効果")
+    stampede.add_argument("--size", type=int, default=100000)
+    stampede.add_argument("--visitors", type=int, default=50)
+    stampede.add_argument("--markers", type=int, default=2000)
+
+    records = subparsers.add_parser("records", help="少数行の読み取り（DataFrameと行レコード）")
+    records.add_argument("--size", type=int, default=100000)
+    records.add_argument("--calls", type=int, default=300)
+
+    args = parser.parse_args()
+
+    if args.command == "stress":
+        run_stress(args.readers, args.writers, args.duration)
+    elif args.command == "bootstrap":
+        run_bootstrap(args.reruns)
+    elif args.command == "indexes":
+        run_indexes(args.sizes)
+    elif args.command == "bbox":
+        run_bbox(args.sizes)
+    elif args.command == "viewport":
+        run_viewport(args.sizes, args.zoom)
+    elif args.command == "markers":
+        run_markers(args.sizes)
+    elif args.command == "basemap":
+        run_basemap(args.sizes, args.reruns)
+    elif args.command == "rows":
+        run_rows(args.sizes)
+    elif args.command == "nearest":
+        run_nearest(args.size, args.queries)
+    elif args.command == "nearby":
+        run_nearby(args.sizes, args.radius)
+    elif args.command == "search":
+        run_search(args.sizes)
+    elif args.command == "pages":
+        run_pages(args.sizes, args.pages)
+    elif args.command == "purge":
+        run_purge(args.size, args.ids)
+    elif args.command == "moderate":
+        run_moderate(args.size, args.ids)
+    elif args.command == "import":
+        run_import(args.sizes)
+    elif args.command == "export":
+        run_export(args.sizes)
+    elif args.command == "stats":
+        if not run_stats(args.sizes, args.operations):
+            sys.exit(1)
+    elif args.command == "revision":
+        if not run_revision(args.size):
+            sys.exit(1)
+    elif args.command == "cache":
+        run_cache(args.size, args.visitors)
+    elif args.command == "stampede":
+        run_stampede(args.size, args.visitors, args.markers)
+    elif args.command == "records":
+        run_records(args.size, args.calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+読み取りキャッシュ
+データのリビジョン（DatabaseManager.get_revision）をキーに含めたプロセス共通のキャッシュ
+データが変わらない限り、全セッションの再実行で同じ結果を使い回す
+"""
+import functools
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import pandas as pd
+
+import config
+
+
+def estimate_size(value: Any) -> int:
+    """キャッシュする値のおおよそのバイト数"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _copy_value(value: Any) -> Any:
+    """呼び出し側に渡す値（列の追加・削除や辞書の書き換えがキャッシュに及ばないよう浅くコピー）"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _freeze(value: Any) -> Hashable:
+    """引数をキャッシュのキーに使える形に変換（リストはタプル、辞書は並べたタプル）"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return tuple(sorted(value))
+    return value
+
+
+class _Flight:
+    """実行中の計算1件分（待っている呼び出しに結果を渡す）"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """同じキーの計算を同時に1つだけ実行し、待っていた呼び出しにも同じ結果を返す
+
+    キャッシュが切れた直後に多数のセッションが同じ値を作り直す（キャッシュスタンピード）のを防ぐ。
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'computations': 0,  # 実際に計算した
+            'coalesced': 0,     # 他の呼び出しの計算結果を待って受け取った
+        }
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """key の計算が実行中ならその結果を待ち、なければ compute を実行して返す"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats['computations'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def start(self, key: Hashable, compute: Callable[[], Any]) -> bool:
+        """key の計算をバックグラウンドで開始（すでに実行中なら何もせずFalse）"""
+        with self._lock:
+            if key in self._flights:
+                return False
+
+        def run():
+            try:
+                self.do(key, compute)
+            except Exception as e:
+                print(f"❌ バックグラウンド更新エラー: {e}")
+
+        threading.Thread(target=run, name="single-flight", daemon=True).start()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """統計情報を取得"""
+        with self._lock:
+            return dict(self._stats)
+
+
+class RevisionCache:
+    """リビジョン付きのLRUキャッシュ（件数とバイト数の上限付き・スレッドセーフ）
+
+    値は (キー, リビジョン) で保存し、新しいリビジョンの値を保存した時点で
+    古いリビジョンの値はまとめて破棄する。
+    serve_stale=True では古いリビジョンの値も上限の範囲で残し、get_or_compute で
+    作り直している間はその値を返す（stale-while-revalidate）。
+    """
+
+    def __init__(self, max_bytes: int = config.READ_CACHE_MAX_BYTES,
+                 max_entries: int = config.READ_CACHE_MAX_ENTRIES,
+                 serve_stale: bool = False):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.serve_stale = serve_stale
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._revision = None
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._stats = {
+            'hits': 0,           # キャッシュから返した
+            'misses': 0,         # キャッシュになかった
+            'evictions': 0,      # 上限を超えて古い順に破棄
+            'invalidations': 0,  # データが変わって破棄
+            'oversized': 0,      # 大きすぎて保存しなかった
+            'stale_hits': 0,     # 作り直している間、古いリビジョンの値を返した
+        }
+
+    def get(self, key: Hashable, revision: int) -> Tuple[bool, Any]:
+        """(見つかったか, 値) を返す"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != revision:
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, entry[1]
+
+    def get_or_compute(self, key: Hashable, revision: int, compute: Callable[[], Any]) -> Any:
+        """値を返す（なければ compute で作って保存、同じ値の計算は同時に1つだけ）"""
+        found, value = self.get(key, revision)
+        if found:
+            return value
+
+        def compute_and_put():
+            # 待っている間に他の計算が保存していればそれを使う
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry[0] == revision:
+                return entry[1]
+            value = compute()
+            self.put(key, revision, value)
+            return value
+
+        if self.serve_stale:
+            with self._lock:
+                entry = self._entries.get(key)
+                stale = entry is not None and entry[0] < revision
+                if stale:
+                    self._stats['stale_hits'] += 1
+            if stale:
+                self._flights.start((key, revision), compute_and_put)
+                return entry[1]
+
+        return self._flights.do((key, revision), compute_and_put)
+
+    def put(self, key: Hashable, revision: int, value: Any):
+        """値を保存（上限を超えたら使われていない順に破棄）"""
+        size = estimate_size(value)
+        with self._lock:
+            if self._revision is not None and revision < self._revision and not self.serve_stale:
+                return  # 読み込み中に新しいデータが保存された
+            if self._revision is None or revision > self._revision:
+                if not self.serve_stale:
+                    self._invalidate_locked()
+                self._revision = revision
+
+            previous = self._entries.get(key)
+            if previous is not None and previous[0] > revision:
+                return
+            if size > self.max_bytes:
+                self._stats['oversized'] += 1
+                return
+
+            if previous is not None:
+                del self._entries[key]
+                self._bytes -= previous[2]
+                if previous[0] < revision:
+                    self._stats['invalidations'] += 1
+            self._entries[key] = (revision, value, size)
+            self._bytes += size
+
+            while self._entries and (self._bytes > self.max_bytes
+                                     or len(self._entries) > self.max_entries):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats['evictions'] += 1
+
+    def _invalidate_locked(self):
+        """すべての値を破棄（ロック取得済みで呼ぶ）"""
+        self._stats['invalidations'] += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def clear(self):
+        """すべての値を破棄"""
+        with self._lock:
+            self._invalidate_locked()
+            self._revision = None
+
+    def stats(self) -> Dict[str, int]:
+        """キャッシュの統計情報を取得"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        stats.update(self._flights.stats())
+        return stats
+
+
+def cached_read(method):
+    """DatabaseManagerの読み取りメソッドをリビジョン付きでキャッシュするデコレータ
+
+    キーはメソッド名と引数。同じ読み取りが同時に来てもDBを読むのは1回だけ。
+    返した値はキャッシュと共有するため、呼び出し側はDataFrameの値をその場で
+    書き換えないこと（列の追加は可）。
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.read_cache
+        if cache is None:
+            return method(self, *args, **kwargs)
+
+        key = (method.__name__, _freeze(args), _freeze(kwargs))
+        value = cache.get_or_compute(
+            key, self.get_revision(), lambda: method(self, *args, **kwargs))
+        return _copy_value(value)
+    return wrapper
+
+
+_caches: Dict[str, RevisionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_read_cache(db_path: str) -> RevisionCache:
+    """DBファイルごとのプロセス共通キャッシュを取得"""
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = RevisionCache(serve_stale=config.READ_CACHE_SERVE_STALE)
+            _caches[db_path] = cache
+        return cache
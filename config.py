@@ -7,6 +7,28 @@ import os
 
 # データベース設定
 DATABASE_PATH = "fortuneteller.db"
+DATABASE_POOL_SIZE = 8  # プールで保持する最大接続数
+DATABASE_POOL_TIMEOUT = 30.0  # 接続の空き待ち・ロック待ちの上限（秒）
+DATABASE_HEALTH_CHECK_INTERVAL = 60.0  # この秒数以上使われていない接続は貸出前に検査
+# 接続作成時に一度だけ適用するPRAGMA
+DATABASE_PRAGMAS = {
+    "temp_store": "MEMORY",
+    "cache_size": -8000,  # 約8MB
+}
+
+# 同時アクセス設定（複数セッション運用向け）
+# 有効時はWALジャーナルで読み取りと書き込みを並行させ、ロック競合時は書き込みをリトライ
+DATABASE_CONCURRENCY_MODE = True
+DATABASE_BUSY_TIMEOUT_MS = 5000  # ロック解放を待つ時間（ミリ秒）
+DATABASE_SYNCHRONOUS = "NORMAL"  # WALではNORMALで十分（FULL / NORMAL / OFF）
+DATABASE_WRITE_RETRIES = 5  # busy_timeout後も取れない場合の再試行回数
+DATABASE_WRITE_BACKOFF = 0.05  # 再試行の初期待機（秒）、試行ごとに倍増
+DATABASE_CHECKPOINT_WRITES = 500  # この回数書き込むごとにWALをチェックポイント
+DATABASE_CHECKPOINT_INTERVAL = 300.0  # 前回から経過したらチェックポイント（秒）
+
+# マイグレーション設定（大きなテーブルのデータ移行は小分けに実行）
+MIGRATION_BACKFILL_CHUNK_SIZE = 5000  # 1トランザクションで処理する行数
+MIGRATION_BACKFILL_PAUSE = 0.01  # チャンク間の待機（秒）
 
 # 管理者設定（本番対応）
 # 環境変数からパスワードを取得、なければデフォルト値
@@ -18,6 +40,53 @@ DEFAULT_CENTER_LON = 139.6503  # 東京の経度
 DEFAULT_ZOOM_LEVEL = 6
 DETAIL_ZOOM_LEVEL = 14
 
+# 表示範囲連動モード（表示中の範囲＋余白の占い師だけを地図に載せる）
+MAP_VIEWPORT_MODE = True
+MAP_VIEWPORT_MARGIN = 0.5  # 表示範囲の幅・高さに対する余白の割合（片側）
+MAP_VIEWPORT_MAX_MARKERS = 2000  # 1回の取得で地図に載せる最大件数
+MAP_HEIGHT_PX = 500  # 地図の高さ（px）
+MAP_ESTIMATED_WIDTH_PX = 900  # 初回表示時に範囲を見積もるための地図幅（px）
+
+# サーバー側クラスター（表示範囲連動モードで使用）
+MAP_CLUSTER_MODE = True
+MAP_CLUSTER_MAX_ZOOM = 15  # このズーム以上は個別マーカー表示
+MAP_CLUSTER_RADIUS_PX = 60  # クラスターにまとめる範囲（px）
+
+# 軽量表示モード：通常マーカーがこの件数を超えたら [緯度, 経度, ID, カテゴリ] の配列で送る（Noneで無効）
+MAP_COMPACT_MARKER_THRESHOLD = 300
+MAP_POPUP_CACHE_SIZE = 1000  # ポップアップHTMLをキャッシュする件数
+MAP_BASE_CACHE_SIZE = 32  # 全セッションで共有するベース地図（選択表示を除く）の保持数
+MAP_BASE_SERVE_STALE = False  # データ更新後、作り直している間は前のベース地図を表示する
+MAP_CLICK_RADIUS_KM = 10.0  # クリック位置からこの距離以内の占い師を選択
+
+# 近くの占い師検索
+NEARBY_RADIUS_OPTIONS_KM = [1, 3, 5, 10, 30, 100]
+NEARBY_DEFAULT_RADIUS_KM = 10
+NEARBY_PAGE_SIZE = 10
+
+# 全文検索（FTS5 trigram：3文字以上の語で索引を使用）
+SEARCH_RESULT_LIMIT = 10  # 地図画面の検索結果の表示件数
+
+# 管理画面の一覧（キーセットページング）
+ADMIN_PAGE_SIZE = 20  # 1ページの表示件数
+
+# 一括インポート（CSV・JSONL）
+IMPORT_CHUNK_SIZE = 10000  # 1トランザクションで登録する行数
+# Trueなら位置検索・全文検索の索引作成をインポート後のバックグラウンドのデータ移行に任せる
+# （インポートは早く終わるが、索引ができるまで新しい行は範囲検索・全文検索に出ない）
+IMPORT_DEFER_SEARCH_INDEX = False
+
+# エクスポート（CSV・GeoJSON・Parquet）
+EXPORT_BATCH_SIZE = 5000  # DBから一度に読み込む行数
+# 管理画面からダウンロードできるファイルの上限（download_button はファイル全体をメモリに
+# 読み込むため。超える場合は python exporter.py で書き出す）
+EXPORT_DOWNLOAD_MAX_BYTES = 100 * 1024 * 1024
+
+# 読み取りキャッシュ（データのリビジョンが変わるまで全セッションで共有、0で無効）
+READ_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 保持する値の合計バイト数の上限
+READ_CACHE_MAX_ENTRIES = 256  # 保持する件数の上限
+READ_CACHE_SERVE_STALE = False  # データ更新後、読み直している間は前の結果を返す（数秒古い値を許容する場合のみ）
+
 # レスポンシブデザイン設定（新規追加）
 MOBILE_BREAKPOINT = 768   # モバイル判定の幅（px）
 TABLET_BREAKPOINT = 1024  # タブレット判定の幅（px）
@@ -5,12 +5,23 @@ SQLiteを使用した占い師データの管理
 """
 import sqlite3
 import pandas as pd
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
+from contextlib import contextmanager
 import config
+import migrations
+from cache import cached_read, get_read_cache
+from spatial_index import EARTH_RADIUS_KM, haversine_km
 import hashlib
+import math
 import secrets
 import os
+import queue
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from functools import lru_cache
 
 # Fortunetellerクラスを直接インポートではなく、条件付きインポートに変更
 
@@ -21,167 +32,433 @@ def get_fortuneteller_model():
     return Fortuneteller
 
 
+class ConnectionPool:
+    """SQLite接続プール（上限付き・スレッド間で接続を再利用）"""
+
+    def __init__(self, db_path: str, max_size: int = config.DATABASE_POOL_SIZE,
+                 pragmas: Optional[Dict[str, Any]] = None,
+                 timeout: float = config.DATABASE_POOL_TIMEOUT,
+                 health_check_interval: float = config.DATABASE_HEALTH_CHECK_INTERVAL):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = dict(
+            _default_pragmas() if pragmas is None else pragmas)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = queue.LifoQueue()  # 直近に使った接続から再利用
+        self._last_used = {}
+        self._created = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,        # 待機中の接続を再利用
+            'misses': 0,      # 新規に接続を作成
+            'waits': 0,       # 上限に達して空きを待機
+            'discarded': 0,   # ヘルスチェック失敗で破棄
+            'write_retries': 0,  # ロック競合による書き込み再試行
+            'checkpoints': 0,    # WALチェックポイント実行回数
+        }
+        self.lock_wait_samples = deque(maxlen=10000)  # 書き込みロック待ち時間（秒）
+        self._writes_since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._revision = None       # 最後に確認したデータのリビジョン
+        self._data_versions = {}    # 接続ごとの、リビジョン確認時のPRAGMA data_version
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """新しい接続を作成し、PRAGMAを一度だけ適用"""
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.timeout, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """接続が利用可能かチェック"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        """壊れた接続を破棄"""
+        self._last_used.pop(id(conn), None)
+        self._data_versions.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._stats['discarded'] += 1
+
+    def _acquire(self) -> sqlite3.Connection:
+        """接続を取得（空きがなければ作成、上限なら待機）"""
+        while True:
+            try:
+                # 待機中のスレッドがいる場合は割り込まずに順番を待つ
+                if self._waiting:
+                    raise queue.Empty
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.max_size
+                    if can_create:
+                        self._created += 1
+                        self._stats['misses'] += 1
+                    else:
+                        self._waiting += 1
+                        self._stats['waits'] += 1
+                if can_create:
+                    try:
+                        return self._create_connection()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"接続プールの空き待ちがタイムアウトしました（{self.timeout}秒）")
+                finally:
+                    with self._lock:
+                        self._waiting -= 1
+
+            # しばらく使われていない接続だけ貸出前に検査
+            idle_for = time.monotonic() - self._last_used.get(id(conn), 0)
+            if idle_for >= self.health_check_interval and not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._stats['hits'] += 1
+            return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        """接続をプールに返却（未完了のトランザクションは破棄）"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """接続を借りるコンテキストマネージャ"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def record_write(self, lock_wait: float, retries: int) -> bool:
+        """書き込みを記録し、チェックポイントが必要かを返す"""
+        with self._lock:
+            self.lock_wait_samples.append(lock_wait)
+            self._stats['write_retries'] += retries
+            self._writes_since_checkpoint += 1
+            due = (self._writes_since_checkpoint >= config.DATABASE_CHECKPOINT_WRITES or
+                   time.monotonic() - self._last_checkpoint >= config.DATABASE_CHECKPOINT_INTERVAL)
+            if due:
+                self._writes_since_checkpoint = 0
+                self._last_checkpoint = time.monotonic()
+        return due
+
+    def checkpoint(self, conn: sqlite3.Connection, mode: str = "PASSIVE") -> tuple:
+        """WALチェックポイントを実行（PASSIVEは読み取りをブロックしない）"""
+        result = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        with self._lock:
+            self._stats['checkpoints'] += 1
+        return tuple(result) if result else ()
+
+    def data_revision(self, conn: sqlite3.Connection) -> int:
+        """データのリビジョンを取得（他の接続がコミットしていなければDBを読まない）
+
+        PRAGMA data_version は他の接続（別プロセスを含む）がコミットしたときだけ変わる。
+        この接続自身のコミットでは変わらないが、それは record_revision で反映済み。
+        """
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            if self._revision is not None and self._data_versions.get(id(conn)) == data_version:
+                return self._revision
+
+        revision = conn.execute("SELECT revision FROM data_revision WHERE id = 1").fetchone()[0]
+        with self._lock:
+            self._data_versions[id(conn)] = data_version
+            self._revision = max(self._revision or 0, revision)
+            return self._revision
+
+    def record_revision(self, revision: int):
+        """このプロセスでコミットした書き込みのリビジョンを記録"""
+        with self._lock:
+            self._revision = max(self._revision or 0, revision)
+
+    def stats(self) -> Dict[str, int]:
+        """プールの統計情報を取得"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = self._created
+        stats['idle'] = self._idle.qsize()
+        return stats
+
+    def close_all(self):
+        """待機中の接続をすべて閉じる"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._last_used.pop(id(conn), None)
+            self._data_versions.pop(id(conn), None)
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+def _default_pragmas() -> Dict[str, Any]:
+    """設定から接続用PRAGMAを組み立て"""
+    pragmas = dict(config.DATABASE_PRAGMAS)
+    if config.DATABASE_CONCURRENCY_MODE:
+        pragmas.update({
+            "journal_mode": "WAL",
+            "busy_timeout": config.DATABASE_BUSY_TIMEOUT_MS,
+            "synchronous": config.DATABASE_SYNCHRONOUS,
+        })
+    return pragmas
+
+
+@lru_cache(maxsize=64)
+def _record_type(columns: Tuple[str, ...]):
+    """列の並びごとの行レコード型（namedtuple：row.name で参照でき、行ごとの辞書を持たない）"""
+    return namedtuple("Record", columns, rename=True)
+
+
+def _is_lock_error(error: Exception) -> bool:
+    """ロック競合によるエラーかどうか"""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str) -> ConnectionPool:
+    """DBファイルごとのプロセス共通プールを取得"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+
+# このプロセスで初期化済みのDBファイル
+_bootstrapped_paths = set()
+_bootstrap_lock = threading.Lock()
+
+
 class DatabaseManager:
     """データベース管理クラス（削除機能・パスワード管理追加版）"""
 
     def __init__(self):
         """初期化"""
         self.db_path = config.DATABASE_PATH
-        self._init_database()
-        self._upgrade_database()  # 新しい列を追加
-        self._init_admin_password()  # 管理者パスワード初期化
-        self._insert_sample_data()
-
-    def _init_database(self):
-        """データベース初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 占い師テーブル
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS fortunetellers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                description TEXT,
-                contact TEXT,
-                website TEXT,
-                category TEXT,
-                status TEXT DEFAULT 'pending',
-                submitted_by TEXT DEFAULT '匿名',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                approved_by TEXT,
-                approved_at TIMESTAMP,
-                zipcode TEXT,
-                address TEXT,
-                deleted_at TIMESTAMP,
-                deleted_by TEXT
-            )
-        """)
-
-        # お仕事依頼テーブル
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS work_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                subject TEXT NOT NULL,
-                content TEXT NOT NULL,
-                client_name TEXT NOT NULL,
-                client_email TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                deleted_at TIMESTAMP,
-                deleted_by TEXT
-            )
-        """)
-
-        # 設定テーブル
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 管理者パスワードテーブル（新規追加）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admin_passwords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                password_hash TEXT NOT NULL,
-                salt TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1
-            )
-        """)
-
-        # パスワード履歴テーブル（新規追加）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS password_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 削除ログテーブル（新規追加）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS deletion_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                table_name TEXT NOT NULL,
-                record_id INTEGER NOT NULL,
-                record_data TEXT NOT NULL,
-                deleted_by TEXT NOT NULL,
-                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                reason TEXT
-            )
-        """)
-
-        conn.commit()
-        conn.close()
-
-    def _upgrade_database(self):
-        """データベースのアップグレード（既存テーブルに新しい列を追加）"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # fortunetellersテーブルの列を確認・追加
-        cursor.execute("PRAGMA table_info(fortunetellers)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        new_columns = {
-            'zipcode': 'TEXT',
-            'address': 'TEXT',
-            'deleted_at': 'TIMESTAMP',
-            'deleted_by': 'TEXT'
+        self.pool = get_connection_pool(self.db_path)
+        self.read_cache = get_read_cache(self.db_path) if config.READ_CACHE_MAX_BYTES else None
+        self._change_listeners = []
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        """スキーマ初期化（最新ならDDLを一切実行しない）"""
+        if self.db_path in _bootstrapped_paths:
+            return
+
+        with _bootstrap_lock:
+            if self.db_path in _bootstrapped_paths:
+                return
+
+            with self._connection() as conn:
+                applied = migrations.migrate(conn)
+                has_backfills = bool(migrations.pending_backfills(conn))
+
+            if applied:
+                self._init_admin_password()  # 管理者パスワード初期化
+                self._insert_sample_data()
+
+            if has_backfills:
+                self._start_backfill_worker()
+
+            _bootstrapped_paths.add(self.db_path)
+
+    def _start_backfill_worker(self):
+        """未完了のデータ移行をバックグラウンドで実行"""
+        def worker():
+            try:
+                self._run_backfills()
+            except Exception as e:
+                print(f"❌ データ移行エラー: {e}")
+
+        threading.Thread(target=worker, name="migration-backfill",
+                         daemon=True).start()
+
+    def _run_backfills(self, versions: Optional[List[int]] = None):
+        """データ移行を実行（versions を省略すると未完了のものすべて）"""
+        with self._connection() as conn:
+            if versions is None:
+                migrations.run_pending_backfills(conn)
+            else:
+                for version in versions:
+                    migrations.run_backfill(conn, version)
+            # この接続自身のコミットは PRAGMA data_version に表れないため記録しておく
+            self.pool.record_revision(conn.execute(
+                "SELECT revision FROM data_revision WHERE id = 1").fetchone()[0])
+
+    def get_schema_version(self) -> int:
+        """DBに記録されたスキーマバージョンを取得"""
+        with self._connection() as conn:
+            return migrations.get_user_version(conn)
+
+    def _connection(self):
+        """プールから接続を借りる（with文で使用）"""
+        return self.pool.connection()
+
+    @contextmanager
+    def _write_transaction(self):
+        """書き込み用トランザクション（ロック競合時はバックオフして再試行）
+
+        BEGIN IMMEDIATEで最初に書き込みロックを確保するため、途中で
+        読み取りロックから昇格できずに失敗することがない。
+        ブロックを抜けるとコミット、例外時はロールバックする。
+        """
+        with self._connection() as conn:
+            started = time.monotonic()
+            retries = 0
+            while True:
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    break
+                except sqlite3.OperationalError as e:
+                    if (not config.DATABASE_CONCURRENCY_MODE or not _is_lock_error(e)
+                            or retries >= config.DATABASE_WRITE_RETRIES):
+                        raise
+                    delay = config.DATABASE_WRITE_BACKOFF * (2 ** retries)
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+                    retries += 1
+            lock_wait = time.monotonic() - started
+
+            try:
+                changes = conn.total_changes
+                yield conn
+                # 行が変わったときだけリビジョンを進める（キャッシュの無効化に使う）
+                revision = self._bump_revision(conn) if conn.total_changes != changes else None
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+            if revision is not None:
+                self.pool.record_revision(revision)
+
+            if self.pool.record_write(lock_wait, retries) and config.DATABASE_CONCURRENCY_MODE:
+                try:
+                    self.pool.checkpoint(conn)
+                except sqlite3.Error as e:
+                    print(f"チェックポイントエラー: {e}")
+
+    @staticmethod
+    def _bump_revision(conn: sqlite3.Connection) -> int:
+        """データのリビジョンを1進めて新しい値を返す（呼び出し側のトランザクション内で使う）"""
+        return conn.execute(
+            "UPDATE data_revision SET revision = revision + 1 WHERE id = 1 RETURNING revision"
+        ).fetchall()[0][0]
+
+    def get_revision(self) -> int:
+        """データのリビジョン（書き込みのたびに増える）
+
+        キャッシュのキーに含めると、データが変わったときだけ作り直せる。
+        他のプロセスの書き込みも反映され、変わっていなければ PRAGMA data_version の確認だけで済む。
+        """
+        with self._connection() as conn:
+            return self.pool.data_revision(conn)
+
+    @cached_read
+    def get_locations_revision(self) -> int:
+        """地図に出る位置（承認済みで削除されていない行の追加・削除・移動）が最後に変わったリビジョン
+
+        承認待ちの投稿や設定の変更では進まない。
+        """
+        return self.get_revision_details()['locations_revision']
+
+    def get_revision_details(self) -> Dict[str, int]:
+        """データのリビジョンと、地図に出る位置の最新・直前のリビジョンをキャッシュを通さずに取得"""
+        with self._connection() as conn:
+            revision, locations_revision, locations_previous = conn.execute("""
+                SELECT revision, locations_revision, locations_previous
+                FROM data_revision WHERE id = 1
+            """).fetchone()
+        return {
+            'revision': revision,
+            'locations_revision': locations_revision,
+            'locations_previous': locations_previous
         }
 
-        for column_name, column_type in new_columns.items():
-            if column_name not in columns:
-                cursor.execute(
-                    f"ALTER TABLE fortunetellers ADD COLUMN {column_name} {column_type}")
-                print(f"✅ {column_name}列を追加しました")
+    def checkpoint(self, mode: str = "PASSIVE") -> tuple:
+        """WALチェックポイントを手動実行（busy, log, checkpointedを返す）"""
+        with self._connection() as conn:
+            return self.pool.checkpoint(conn, mode)
 
-        # work_requestsテーブルの列を確認・追加
-        cursor.execute("PRAGMA table_info(work_requests)")
-        work_columns = [column[1] for column in cursor.fetchall()]
+    def get_pool_stats(self) -> Dict[str, int]:
+        """接続プールの統計情報（ヒット・ミス数など）を取得"""
+        return self.pool.stats()
 
-        work_new_columns = {
-            'deleted_at': 'TIMESTAMP',
-            'deleted_by': 'TEXT'
-        }
+    def get_cache_stats(self) -> Dict[str, int]:
+        """読み取りキャッシュの統計情報（ヒット・ミス・破棄数など）を取得"""
+        return self.read_cache.stats() if self.read_cache else {}
 
-        for column_name, column_type in work_new_columns.items():
-            if column_name not in work_columns:
-                cursor.execute(
-                    f"ALTER TABLE work_requests ADD COLUMN {column_name} {column_type}")
-                print(f"✅ work_requests.{column_name}列を追加しました")
+    def add_change_listener(self, listener):
+        """占い師の公開状態（承認・削除・復元）が変わったときの通知先を登録
 
-        conn.commit()
-        conn.close()
+        listener は変更された占い師IDのリストを受け取る。コミット後に呼ばれる。
+        """
+        if listener not in self._change_listeners:
+            self._change_listeners.append(listener)
+
+    def _notify_change(self, fortuneteller_ids: list):
+        """変更通知（通知先のエラーで書き込み結果を変えない）"""
+        for listener in list(self._change_listeners):
+            try:
+                listener(fortuneteller_ids)
+            except Exception as e:
+                print(f"❌ 変更通知エラー: {e}")
 
     def _init_admin_password(self):
         """管理者パスワードの初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 既存のアクティブなパスワードがあるかチェック
-        cursor.execute(
-            "SELECT COUNT(*) FROM admin_passwords WHERE is_active = 1")
-        count = cursor.fetchone()[0]
-
-        # アクティブなパスワードがない場合、デフォルトパスワードを設定
-        if count == 0:
-            password_hash, salt = self._hash_password(
-                config.DEFAULT_ADMIN_PASSWORD)
-            cursor.execute("""
-                INSERT INTO admin_passwords (password_hash, salt, is_active)
-                VALUES (?, ?, 1)
-            """, (password_hash, salt))
-            print("✅ デフォルト管理者パスワードを設定しました")
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            # 既存のアクティブなパスワードがあるかチェック
+            cursor.execute(
+                "SELECT COUNT(*) FROM admin_passwords WHERE is_active = 1")
+            count = cursor.fetchone()[0]
+
+            # アクティブなパスワードがない場合、デフォルトパスワードを設定
+            if count == 0:
+                password_hash, salt = self._hash_password(
+                    config.DEFAULT_ADMIN_PASSWORD)
+                cursor.execute("""
+                    INSERT INTO admin_passwords (password_hash, salt, is_active)
+                    VALUES (?, ?, 1)
+                """, (password_hash, salt))
+                print("✅ デフォルト管理者パスワードを設定しました")
+
+            conn.commit()
 
     def _hash_password(self, password: str) -> tuple:
         """パスワードをハッシュ化"""
@@ -198,17 +475,16 @@ class DatabaseManager:
 
     def verify_admin_password(self, password: str) -> bool:
         """管理者パスワードを検証"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT password_hash, salt FROM admin_passwords 
-            WHERE is_active = 1 
-            ORDER BY created_at DESC 
-            LIMIT 1
-        """)
-        result = cursor.fetchone()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT password_hash, salt FROM admin_passwords 
+                WHERE is_active = 1 
+                ORDER BY created_at DESC 
+                LIMIT 1
+            """)
+            result = cursor.fetchone()
 
         if result:
             stored_hash, salt = result
@@ -230,38 +506,35 @@ class DatabaseManager:
             if self._is_password_used_before(new_password):
                 return {'success': False, 'error': '過去に使用したパスワードは使用できません'}
 
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # 現在のパスワードを無効化
-            cursor.execute(
-                "UPDATE admin_passwords SET is_active = 0 WHERE is_active = 1")
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
 
-            # 新しいパスワードをハッシュ化して保存
-            password_hash, salt = self._hash_password(new_password)
-            cursor.execute("""
-                INSERT INTO admin_passwords (password_hash, salt, is_active)
-                VALUES (?, ?, 1)
-            """, (password_hash, salt))
+                # 現在のパスワードを無効化
+                cursor.execute(
+                    "UPDATE admin_passwords SET is_active = 0 WHERE is_active = 1")
 
-            # パスワード履歴に追加
-            cursor.execute("""
-                INSERT INTO password_history (password_hash)
-                VALUES (?)
-            """, (password_hash,))
+                # 新しいパスワードをハッシュ化して保存
+                password_hash, salt = self._hash_password(new_password)
+                cursor.execute("""
+                    INSERT INTO admin_passwords (password_hash, salt, is_active)
+                    VALUES (?, ?, 1)
+                """, (password_hash, salt))
 
-            # 古いパスワード履歴を削除（最新N件のみ保持）
-            cursor.execute("""
-                DELETE FROM password_history 
-                WHERE id NOT IN (
-                    SELECT id FROM password_history 
-                    ORDER BY created_at DESC 
-                    LIMIT ?
-                )
-            """, (config.PASSWORD_HISTORY_LIMIT,))
+                # パスワード履歴に追加
+                cursor.execute("""
+                    INSERT INTO password_history (password_hash)
+                    VALUES (?)
+                """, (password_hash,))
 
-            conn.commit()
-            conn.close()
+                # 古いパスワード履歴を削除（最新N件のみ保持）
+                cursor.execute("""
+                    DELETE FROM password_history 
+                    WHERE id NOT IN (
+                        SELECT id FROM password_history 
+                        ORDER BY created_at DESC 
+                        LIMIT ?
+                    )
+                """, (config.PASSWORD_HISTORY_LIMIT,))
 
             return {'success': True, 'message': 'パスワードを変更しました'}
 
@@ -270,13 +543,12 @@ class DatabaseManager:
 
     def _is_password_used_before(self, password: str) -> bool:
         """パスワードが過去に使用されたかチェック"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute(
-            "SELECT password_hash FROM password_history ORDER BY created_at DESC")
-        password_histories = cursor.fetchall()
-        conn.close()
+            cursor.execute(
+                "SELECT password_hash FROM password_history ORDER BY created_at DESC")
+            password_histories = cursor.fetchall()
 
         # 仮のソルトでハッシュ化（履歴比較用）
         temp_salt = "temp_salt_for_comparison"
@@ -293,70 +565,287 @@ class DatabaseManager:
 
     def _insert_sample_data(self):
         """サンプルデータ挿入"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # データが空の場合のみサンプルを挿入
-        cursor.execute(
-            "SELECT COUNT(*) FROM fortunetellers WHERE deleted_at IS NULL")
-        count = cursor.fetchone()[0]
-
-        if count == 0:
-            sample_data = [
-                ("東京占い館", 35.6762, 139.6503, "タロット", "タロットカードと西洋占星術が得意",
-                 "03-1234-5678", "https://example.com", "approved", "1000001", "東京都千代田区千代田"),
-                ("渋谷占いの部屋", 35.6580, 139.7016, "手相",
-                 "手相占いの専門家", "03-2345-6789", None, "approved", "1500001", "東京都渋谷区神宮前"),
-                ("新宿スピリチュアル", 35.6896, 139.6921, "霊視", "霊視とオーラ診断",
-                 "03-3456-7890", "https://example2.com", "approved", "1600001", "東京都新宿区西新宿"),
-                ("池袋占いサロン", 35.7295, 139.7109, "占星術",
-                 "西洋占星術と数秘術", "03-4567-8901", None, "approved", "1700001", "東京都豊島区南池袋"),
-                ("品川占い処", 35.6285, 139.7387, "四柱推命",
-                 "四柱推命の専門家", "03-5678-9012", None, "approved", "1400001", "東京都品川区北品川")
-            ]
-
-            for name, lat, lon, category, desc, contact, website, status, zipcode, address in sample_data:
-                cursor.execute("""
-                    INSERT INTO fortunetellers 
-                    (name, latitude, longitude, category, description, contact, website, status, submitted_by, approved_by, approved_at, zipcode, address)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
-                """, (name, lat, lon, category, desc, contact, website, status, "システム", "システム", zipcode, address))
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            # データが空の場合のみサンプルを挿入
+            cursor.execute(
+                "SELECT COUNT(*) FROM fortunetellers WHERE deleted_at IS NULL")
+            count = cursor.fetchone()[0]
+
+            if count == 0:
+                sample_data = [
+                    ("東京占い館", 35.6762, 139.6503, "タロット", "タロットカードと西洋占星術が得意",
+                     "03-1234-5678", "https://example.com", "approved", "1000001", "東京都千代田区千代田"),
+                    ("渋谷占いの部屋", 35.6580, 139.7016, "手相",
+                     "手相占いの専門家", "03-2345-6789", None, "approved", "1500001", "東京都渋谷区神宮前"),
+                    ("新宿スピリチュアル", 35.6896, 139.6921, "霊視", "霊視とオーラ診断",
+                     "03-3456-7890", "https://example2.com", "approved", "1600001", "東京都新宿区西新宿"),
+                    ("池袋占いサロン", 35.7295, 139.7109, "占星術",
+                     "西洋占星術と数秘術", "03-4567-8901", None, "approved", "1700001", "東京都豊島区南池袋"),
+                    ("品川占い処", 35.6285, 139.7387, "四柱推命",
+                     "四柱推命の専門家", "03-5678-9012", None, "approved", "1400001", "東京都品川区北品川")
+                ]
+
+                for name, lat, lon, category, desc, contact, website, status, zipcode, address in sample_data:
+                    cursor.execute("""
+                        INSERT INTO fortunetellers 
+                        (name, latitude, longitude, category, description, contact, website, status, submitted_by, approved_by, approved_at, zipcode, address)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
+                    """, (name, lat, lon, category, desc, contact, website, status, "システム", "システム", zipcode, address))
+                self._bump_revision(conn)
 
-    def get_fortunetellers(self, status: str = "approved", include_deleted: bool = False) -> pd.DataFrame:
-        """占い師一覧取得（削除対応版）"""
-        conn = sqlite3.connect(self.db_path)
+            conn.commit()
 
+    @staticmethod
+    def _keyset_condition(sort_column: str, after: Optional[tuple], params: dict) -> str:
+        """キーセットページングの条件（(sort_column, id) が after より後ろの行）"""
+        if after is None:
+            return ""
+        params['after_key'], params['after_id'] = after[0], int(after[1])
+        return f"AND ({sort_column}, id) < (:after_key, :after_id)"
+
+    @staticmethod
+    def get_next_cursor(df: pd.DataFrame, sort_column: str = "created_at") -> Optional[tuple]:
+        """ページの最後の行から次ページ取得用のカーソル (sort_column の値, id) を作る"""
+        if df.empty:
+            return None
+        last = df.iloc[-1]
+        return (last[sort_column], int(last['id']))
+
+    def _fortunetellers_query(self, status: str, include_deleted: bool, limit: Optional[int],
+                              after: Optional[tuple], category: Optional[str]) -> Tuple[str, dict]:
+        """占い師一覧のSQLとパラメータ（get_fortunetellers・get_fortuneteller_records 共通）"""
+        params = {'limit': -1 if limit is None else int(limit)}
         # 削除されたレコードの扱い
-        deleted_condition = "" if include_deleted else "AND deleted_at IS NULL"
+        conditions = "" if include_deleted else "AND deleted_at IS NULL"
+
+        if status != "all":
+            conditions += " AND status = :status"
+            params['status'] = status
+        if category:
+            conditions += " AND category = :category"
+            params['category'] = category
+        conditions += " " + self._keyset_condition("created_at", after, params)
+
+        query = f"""
+            SELECT * FROM fortunetellers
+            WHERE 1=1 {conditions}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit
+        """
+        return query, params
+
+    def _fetch_records(self, query: str, params) -> list:
+        """クエリ結果を行レコード（namedtuple）のリストで取得（DataFrameを作らない）"""
+        with self._connection() as conn:
+            cursor = conn.execute(query, params)
+            rows = cursor.fetchall()
+        record = _record_type(tuple(column[0] for column in cursor.description))
+        return list(map(record._make, rows))
+
+    @cached_read
+    def get_fortunetellers(self, status: str = "approved", include_deleted: bool = False,
+                           limit: Optional[int] = None, after: Optional[tuple] = None,
+                           category: Optional[str] = None) -> pd.DataFrame:
+        """占い師一覧取得（削除対応版）
+
+        limit・after を指定するとキーセットページングで1ページ分だけ取得する。
+        after には前ページの get_next_cursor() の値を渡す（(created_at, id) の降順）。
+        """
+        query, params = self._fortunetellers_query(status, include_deleted, limit, after, category)
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        return df
+
+    @cached_read
+    def get_fortuneteller_records(self, status: str = "approved", include_deleted: bool = False,
+                                  limit: Optional[int] = None, after: Optional[tuple] = None,
+                                  category: Optional[str] = None) -> list:
+        """占い師一覧を行レコードのリストで取得（引数は get_fortunetellers と同じ）
+
+        数件だけ表示する画面向け。列単位の処理や表形式の表示が必要な場合は
+        get_fortunetellers（DataFrame）を使う。
+        """
+        return self._fetch_records(
+            *self._fortunetellers_query(status, include_deleted, limit, after, category))
+
+    @cached_read
+    def get_fortunetellers_in_bbox(self, south: float, west: float, north: float, east: float,
+                                   limit: Optional[int] = None, status: str = "approved") -> pd.DataFrame:
+        """表示範囲（緯度経度の矩形）内の占い師を取得（R*Treeで絞り込み）"""
+        if south > north:
+            south, north = north, south
+        if west > east:
+            west, east = east, west
+
+        query = """
+            SELECT f.*
+            FROM fortunetellers_rtree r
+            CROSS JOIN fortunetellers f ON f.id = r.id  -- R*Treeを必ず先に走査させる
+            WHERE r.max_lat >= :south AND r.min_lat <= :north
+              AND r.max_lng >= :west AND r.min_lng <= :east
+              AND f.latitude BETWEEN :south AND :north
+              AND f.longitude BETWEEN :west AND :east
+              AND f.status = :status AND f.deleted_at IS NULL
+            ORDER BY f.created_at DESC
+            LIMIT :limit
+        """
+        params = {
+            'south': south, 'west': west, 'north': north, 'east': east,
+            'status': status, 'limit': -1 if limit is None else int(limit)
+        }
+
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        return df
+
+    def search_nearby(self, lat: float, lng: float, radius_km: float, category: Optional[str] = None,
+                      limit: int = 20, offset: int = 0) -> pd.DataFrame:
+        """指定地点から半径 radius_km 以内の承認済み占い師を近い順に取得（distance_km 列付き）
+
+        R*Treeで半径を囲む矩形に絞り込み、候補の座標だけを読んで距離をまとめて計算する。
+        ページ分の行だけを改めて取得するため、範囲内の件数が多くても転送量は増えない。
+        """
+        # 半径を囲む矩形（経度方向は矩形内で最も高緯度の位置で見積もる）
+        lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+        south, north = max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0)
+        max_abs_lat = min(max(abs(south), abs(north)), 89.9)
+        lng_delta = min(lat_delta / math.cos(math.radians(max_abs_lat)), 180.0)
+
+        query = """
+            SELECT f.id, f.latitude, f.longitude, f.created_at
+            FROM fortunetellers_rtree r
+            CROSS JOIN fortunetellers f ON f.id = r.id  -- R*Treeを必ず先に走査させる
+            WHERE r.max_lat >= :south AND r.min_lat <= :north
+              AND r.max_lng >= :west AND r.min_lng <= :east
+              AND f.status = 'approved' AND f.deleted_at IS NULL
+        """
+        params = {'south': south, 'north': north, 'west': lng - lng_delta, 'east': lng + lng_delta}
+        if category:
+            query += " AND f.category = :category"
+            params['category'] = category
+
+        with self._connection() as conn:
+            candidates = pd.read_sql_query(query, conn, params=params)
+
+        candidates['distance_km'] = haversine_km(
+            lat, lng, candidates['latitude'].to_numpy(), candidates['longitude'].to_numpy())
+        page = candidates[candidates['distance_km'] <= radius_km] \
+            .sort_values(['distance_km', 'created_at'], ascending=[True, False], kind='stable') \
+            .iloc[offset:offset + limit]
+        if page.empty:
+            return page.drop(columns=['created_at'])
+
+        rows = self.get_fortunetellers_by_ids(page['id'].tolist())
+        return page[['id', 'distance_km']].merge(rows, on='id', how='inner')
+
+    def search_fortunetellers(self, query: str, status: str = "approved", limit: int = 50,
+                              offset: int = 0, category: Optional[str] = None) -> pd.DataFrame:
+        """名前・住所・説明の全文検索（FTS5 trigram、BM25の関連度順）
+
+        空白区切りの語はすべて含むものを返す（AND）。trigramは3文字以上の語しか
+        索引を引けないため、2文字以下の語はLIKEの部分一致で追加の絞り込みに使う。
+        2文字以下の語しかない場合（空の検索語を含む）はLIKEのみで検索し、新しい順に並べる。
+        """
+        sql, params = self._search_query(query, status, limit, offset, category)
+        with self._connection() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        return df
 
-        if status == "all":
-            query = f"SELECT * FROM fortunetellers WHERE 1=1 {deleted_condition} ORDER BY created_at DESC"
+    def search_fortuneteller_records(self, query: str, status: str = "approved", limit: int = 50,
+                                     offset: int = 0, category: Optional[str] = None) -> list:
+        """全文検索の結果を行レコードのリストで取得（引数は search_fortunetellers と同じ）"""
+        return self._fetch_records(*self._search_query(query, status, limit, offset, category))
+
+    def _search_query(self, query: str, status: str, limit: int, offset: int,
+                      category: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+        """全文検索のSQLとパラメータ（search_fortunetellers・search_fortuneteller_records 共通）"""
+        terms = [term for term in (query or "").split() if term]
+        match_terms = [term for term in terms if len(term) >= 3]
+        like_terms = [term for term in terms if len(term) < 3]
+
+        params: Dict[str, Any] = {'status': status, 'limit': int(limit), 'offset': int(offset)}
+        conditions = ["f.status = :status", "f.deleted_at IS NULL"]
+        if category:
+            conditions.append("f.category = :category")
+            params['category'] = category
+        for i, term in enumerate(like_terms):
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(
+                f"(f.name LIKE :like{i} ESCAPE '\\' OR f.address LIKE :like{i} ESCAPE '\\' "
+                f"OR f.description LIKE :like{i} ESCAPE '\\')")
+            params[f'like{i}'] = f"%{escaped}%"
+
+        if match_terms:
+            # 各語をフレーズとして引用符で囲み、FTSの構文として解釈させない
+            params['match'] = " ".join('"' + term.replace('"', '""') + '"' for term in match_terms)
+            sql = f"""
+                SELECT f.*, bm25(fortunetellers_fts, 10.0, 5.0, 1.0) AS rank
+                FROM fortunetellers_fts
+                CROSS JOIN fortunetellers f ON f.id = fortunetellers_fts.rowid  -- FTSを必ず先に引かせる
+                WHERE fortunetellers_fts MATCH :match AND {' AND '.join(conditions)}
+                ORDER BY rank, f.created_at DESC
+                LIMIT :limit OFFSET :offset
+            """
         else:
-            query = f"SELECT * FROM fortunetellers WHERE status = '{status}' {deleted_condition} ORDER BY created_at DESC"
+            sql = f"""
+                SELECT f.* FROM fortunetellers f
+                WHERE {' AND '.join(conditions)}
+                ORDER BY f.created_at DESC
+                LIMIT :limit OFFSET :offset
+            """
+
+        return sql, params
+
+    @cached_read
+    def get_fortunetellers_by_ids(self, fortuneteller_ids: list,
+                                  status: str = "approved") -> pd.DataFrame:
+        """複数IDの占い師をまとめて取得（指定ステータスのみ・論理削除済みは除く）"""
+        import json
+        query = """
+            SELECT * FROM fortunetellers
+            WHERE id IN (SELECT value FROM json_each(?)) AND status = ? AND deleted_at IS NULL
+            ORDER BY created_at DESC
+        """
+        with self._connection() as conn:
+            df = pd.read_sql_query(
+                query, conn, params=(json.dumps([int(i) for i in fortuneteller_ids]), status))
+        return df
 
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+    def get_fortuneteller_locations(self, status: str = "approved",
+                                    fortuneteller_ids: Optional[list] = None) -> pd.DataFrame:
+        """地図集計用に id・緯度・経度だけを取得（IDを指定するとその中から絞り込み）"""
+        import json
+        query = """
+            SELECT id, latitude, longitude FROM fortunetellers
+            WHERE status = ? AND deleted_at IS NULL
+        """
+        params = [status]
+        if fortuneteller_ids is not None:
+            query += " AND id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps([int(i) for i in fortuneteller_ids]))
+
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
         return df
 
+    @cached_read
     def get_fortuneteller_by_id(self, fortuneteller_id: int, include_deleted: bool = False) -> Optional[Dict[str, Any]]:
         """IDから占い師情報を取得（削除対応版）"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
 
-        # 削除されたレコードの扱い
-        deleted_condition = "" if include_deleted else "AND deleted_at IS NULL"
+            # 削除されたレコードの扱い
+            deleted_condition = "" if include_deleted else "AND deleted_at IS NULL"
 
-        cursor.execute(f"""
-            SELECT * FROM fortunetellers 
-            WHERE id = ? {deleted_condition}
-        """, (fortuneteller_id,))
+            cursor.execute(f"""
+                SELECT * FROM fortunetellers 
+                WHERE id = ? {deleted_condition}
+            """, (fortuneteller_id,))
 
-        row = cursor.fetchone()
-        conn.close()
+            row = cursor.fetchone()
 
         if row:
             return dict(row)
@@ -365,45 +854,41 @@ class DatabaseManager:
     def delete_fortuneteller(self, fortuneteller_id: int, deleted_by: str, reason: str = "") -> bool:
         """占い師情報を削除（論理削除）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
 
-            # 削除前にデータを取得
-            cursor.execute(
-                "SELECT * FROM fortunetellers WHERE id = ? AND deleted_at IS NULL", (fortuneteller_id,))
-            fortuneteller_data = cursor.fetchone()
+                # 削除前にデータを取得
+                cursor.execute(
+                    "SELECT * FROM fortunetellers WHERE id = ? AND deleted_at IS NULL", (fortuneteller_id,))
+                fortuneteller_data = cursor.fetchone()
 
-            if not fortuneteller_data:
-                conn.close()
-                print(f"削除対象が見つかりません: ID {fortuneteller_id}")
-                return False
+                if not fortuneteller_data:
+                    print(f"削除対象が見つかりません: ID {fortuneteller_id}")
+                    return False
 
-            # 論理削除実行
-            cursor.execute("""
-                UPDATE fortunetellers 
-                SET deleted_at = CURRENT_TIMESTAMP, deleted_by = ?
-                WHERE id = ? AND deleted_at IS NULL
-            """, (deleted_by, fortuneteller_id))
-
-            # 削除が実行されたか確認
-            if cursor.rowcount == 0:
-                conn.close()
-                print(f"削除対象が見つからないか、既に削除済み: ID {fortuneteller_id}")
-                return False
-
-            # 削除ログを記録
-            import json
-            cursor.execute("""
-                INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
-                VALUES (?, ?, ?, ?, ?)
-            """, ("fortunetellers", fortuneteller_id, json.dumps(dict(fortuneteller_data), ensure_ascii=False), deleted_by, reason))
+                # 論理削除実行
+                cursor.execute("""
+                    UPDATE fortunetellers 
+                    SET deleted_at = CURRENT_TIMESTAMP, deleted_by = ?
+                    WHERE id = ? AND deleted_at IS NULL
+                """, (deleted_by, fortuneteller_id))
 
-            conn.commit()
-            conn.close()
+                # 削除が実行されたか確認
+                if cursor.rowcount == 0:
+                    print(f"削除対象が見つからないか、既に削除済み: ID {fortuneteller_id}")
+                    return False
+
+                # 削除ログを記録
+                import json
+                cursor.execute("""
+                    INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
+                    VALUES (?, ?, ?, ?, ?)
+                """, ("fortunetellers", fortuneteller_id, json.dumps(dict(fortuneteller_data), ensure_ascii=False), deleted_by, reason))
 
             print(
                 f"✅ 占い師を削除しました: ID {fortuneteller_id}, Name: {fortuneteller_data['name']}")
+            self._notify_change([fortuneteller_id])
             return True
 
         except Exception as e:
@@ -413,72 +898,74 @@ class DatabaseManager:
             return False
 
     def restore_fortuneteller(self, fortuneteller_id: int) -> bool:
-        """占い師情報を復元"""
+        """占い師情報を復元（復元した行がなければFalse）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                UPDATE fortunetellers 
-                SET deleted_at = NULL, deleted_by = NULL
-                WHERE id = ? AND deleted_at IS NOT NULL
-            """, (fortuneteller_id,))
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
 
-            conn.commit()
-            conn.close()
-            return True
+                cursor.execute("""
+                    UPDATE fortunetellers 
+                    SET deleted_at = NULL, deleted_by = NULL
+                    WHERE id = ? AND deleted_at IS NOT NULL
+                """, (fortuneteller_id,))
+                restored = cursor.rowcount > 0
+            # 存在しない・削除されていないIDは何も変わらないので通知しない
+            if restored:
+                self._notify_change([fortuneteller_id])
+            return restored
 
         except Exception as e:
             print(f"復元エラー: {e}")
             return False
 
-    def get_deleted_fortunetellers(self) -> pd.DataFrame:
-        """削除された占い師一覧を取得"""
-        conn = sqlite3.connect(self.db_path)
-        query = "SELECT * FROM fortunetellers WHERE deleted_at IS NOT NULL ORDER BY deleted_at DESC"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+    def get_deleted_fortunetellers(self, limit: Optional[int] = None,
+                                   after: Optional[tuple] = None) -> pd.DataFrame:
+        """削除された占い師一覧を取得（after は (deleted_at, id) のカーソル）"""
+        params = {'limit': -1 if limit is None else int(limit)}
+        query = f"""
+            SELECT * FROM fortunetellers
+            WHERE deleted_at IS NOT NULL {self._keyset_condition("deleted_at", after, params)}
+            ORDER BY deleted_at DESC, id DESC
+            LIMIT :limit
+        """
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
         return df
 
     def delete_work_request(self, request_id: int, deleted_by: str, reason: str = "") -> bool:
         """お仕事依頼を削除（論理削除）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
 
-            # 削除前にデータを取得
-            cursor.execute(
-                "SELECT * FROM work_requests WHERE id = ? AND deleted_at IS NULL", (request_id,))
-            request_data = cursor.fetchone()
+                # 削除前にデータを取得
+                cursor.execute(
+                    "SELECT * FROM work_requests WHERE id = ? AND deleted_at IS NULL", (request_id,))
+                request_data = cursor.fetchone()
 
-            if not request_data:
-                conn.close()
-                print(f"削除対象が見つかりません: ID {request_id}")
-                return False
+                if not request_data:
+                    print(f"削除対象が見つかりません: ID {request_id}")
+                    return False
 
-            # 論理削除実行
-            cursor.execute("""
-                UPDATE work_requests 
-                SET deleted_at = CURRENT_TIMESTAMP, deleted_by = ?
-                WHERE id = ? AND deleted_at IS NULL
-            """, (deleted_by, request_id))
-
-            # 削除が実行されたか確認
-            if cursor.rowcount == 0:
-                conn.close()
-                print(f"削除対象が見つからないか、既に削除済み: ID {request_id}")
-                return False
-
-            # 削除ログを記録
-            import json
-            cursor.execute("""
-                INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
-                VALUES (?, ?, ?, ?, ?)
-            """, ("work_requests", request_id, json.dumps(dict(request_data), ensure_ascii=False), deleted_by, reason))
+                # 論理削除実行
+                cursor.execute("""
+                    UPDATE work_requests 
+                    SET deleted_at = CURRENT_TIMESTAMP, deleted_by = ?
+                    WHERE id = ? AND deleted_at IS NULL
+                """, (deleted_by, request_id))
 
-            conn.commit()
-            conn.close()
+                # 削除が実行されたか確認
+                if cursor.rowcount == 0:
+                    print(f"削除対象が見つからないか、既に削除済み: ID {request_id}")
+                    return False
+
+                # 削除ログを記録
+                import json
+                cursor.execute("""
+                    INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
+                    VALUES (?, ?, ?, ?, ?)
+                """, ("work_requests", request_id, json.dumps(dict(request_data), ensure_ascii=False), deleted_by, reason))
 
             print(
                 f"✅ お仕事依頼を削除しました: ID {request_id}, Subject: {request_data['subject']}")
@@ -493,95 +980,281 @@ class DatabaseManager:
     def save_fortuneteller(self, fortuneteller_data: Dict[str, Any]) -> bool:
         """占い師情報を保存（辞書形式で受け取り）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                INSERT INTO fortunetellers 
-                (name, latitude, longitude, description, contact, website, category, status, submitted_by, zipcode, address)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                fortuneteller_data.get('name'),
-                fortuneteller_data.get('latitude'),
-                fortuneteller_data.get('longitude'),
-                fortuneteller_data.get('description'),
-                fortuneteller_data.get('contact'),
-                fortuneteller_data.get('website'),
-                fortuneteller_data.get('category'),
-                'pending',
-                fortuneteller_data.get('submitted_by', '匿名'),
-                fortuneteller_data.get('zipcode'),
-                fortuneteller_data.get('address')
-            ))
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
 
-            conn.commit()
-            conn.close()
+                cursor.execute("""
+                    INSERT INTO fortunetellers 
+                    (name, latitude, longitude, description, contact, website, category, status, submitted_by, zipcode, address)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    fortuneteller_data.get('name'),
+                    fortuneteller_data.get('latitude'),
+                    fortuneteller_data.get('longitude'),
+                    fortuneteller_data.get('description'),
+                    fortuneteller_data.get('contact'),
+                    fortuneteller_data.get('website'),
+                    fortuneteller_data.get('category'),
+                    'pending',
+                    fortuneteller_data.get('submitted_by', '匿名'),
+                    fortuneteller_data.get('zipcode'),
+                    fortuneteller_data.get('address')
+                ))
             return True
         except Exception as e:
             print(f"保存エラー: {e}")
             return False
 
+    # bulk_insert_fortunetellers に渡す行の列順
+    BULK_INSERT_COLUMNS = ("name", "latitude", "longitude", "description", "contact", "website",
+                           "category", "submitted_by", "zipcode", "address")
+
+    def bulk_insert_fortunetellers(self, rows: list, status: str = "pending",
+                                   approved_by: Optional[str] = None) -> int:
+        """検証済みの行（BULK_INSERT_COLUMNS の順のタプル）を1トランザクションでまとめて登録
+
+        承認済みとして登録した場合は、追加した行を変更リスナーに通知する。
+        失敗時は例外をそのまま送出する（呼び出し側でチャンク単位に扱う）。
+        """
+        columns = ", ".join(self.BULK_INSERT_COLUMNS)
+        placeholders = ", ".join("?" for _ in self.BULK_INSERT_COLUMNS)
+        approved = status == "approved"
+
+        with self._write_transaction() as conn:
+            cursor = conn.cursor()
+            # AUTOINCREMENTなので、追加した行のIDは登録前の最大IDより大きい
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM fortunetellers")
+            last_id = cursor.fetchone()[0]
+            # R*Tree・全文検索へは行ごとのトリガーではなく、登録後にまとめて追加する
+            with migrations.deferred_insert_triggers(conn, "fortunetellers"):
+                cursor.executemany(f"""
+                    INSERT INTO fortunetellers ({columns}, status, approved_by, approved_at)
+                    VALUES ({placeholders}, ?, ?, {"CURRENT_TIMESTAMP" if approved else "NULL"})
+                """, (tuple(row) + (status, approved_by if approved else None) for row in rows))
+                inserted = cursor.rowcount
+            inserted_ids = []
+            if approved and inserted > 0:
+                cursor.execute("SELECT id FROM fortunetellers WHERE id > ?", (last_id,))
+                inserted_ids = [row[0] for row in cursor.fetchall()]
+
+        if inserted_ids:
+            self._notify_change(inserted_ids)
+        return inserted
+
+    @contextmanager
+    def deferred_search_indexing(self, background: bool = config.IMPORT_DEFER_SEARCH_INDEX):
+        """複数チャンクの一括登録の間、位置検索・全文検索の索引作成を止めて最後にまとめて行う
+
+        チャンクごとではなく、ブロックの前後で1回ずつトリガーを外して作り直し、
+        追加された行の索引はデータ移行と同じ小分けのトランザクションで作る。
+        例外で抜けてもトリガーは作り直す（その場合も登録済みのチャンクの索引は作る）。
+        background=True なら索引作成はバックグラウンドのデータ移行に任せる。
+        """
+        with self._write_transaction() as conn:
+            deferred = migrations.defer_insert_triggers(conn, "fortunetellers")
+        try:
+            yield
+        finally:
+            with self._write_transaction() as conn:
+                migrations.restore_insert_triggers(conn, "fortunetellers")
+            if deferred and background:
+                self._start_backfill_worker()
+            elif deferred:
+                self._run_backfills(deferred)
+
     def update_status(self, fortuneteller_id: int, status: str, approved_by: str) -> bool:
-        """ステータス更新"""
+        """ステータス更新（更新した行がなければFalse）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
 
-            if status == "approved":
-                cursor.execute("""
-                    UPDATE fortunetellers 
-                    SET status = ?, approved_by = ?, approved_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ? AND deleted_at IS NULL
-                """, (status, approved_by, fortuneteller_id))
+                if status == "approved":
+                    cursor.execute("""
+                        UPDATE fortunetellers 
+                        SET status = ?, approved_by = ?, approved_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ? AND deleted_at IS NULL
+                    """, (status, approved_by, fortuneteller_id))
+                else:
+                    cursor.execute("""
+                        UPDATE fortunetellers 
+                        SET status = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ? AND deleted_at IS NULL
+                    """, (status, fortuneteller_id))
+                updated = cursor.rowcount > 0
+            # 存在しない・削除済みのIDは何も変わらないので通知しない
+            if updated:
+                self._notify_change([fortuneteller_id])
+            return updated
+        except Exception as e:
+            print(f"更新エラー: {e}")
+            return False
+
+    @staticmethod
+    def _bulk_result(record_ids: list, done_ids: set, failure: str) -> Tuple[Dict[int, str], List[str]]:
+        """一括処理のID別の結果 {ID: 'ok' または failure} とエラーメッセージ"""
+        results, errors = {}, []
+        for record_id in dict.fromkeys(int(i) for i in record_ids):  # 重複指定は1件として扱う
+            if record_id in done_ids:
+                results[record_id] = 'ok'
             else:
+                results[record_id] = failure
+                errors.append(f"ID {record_id}: {failure}")
+        return results, errors
+
+    def bulk_update_status(self, fortuneteller_ids: list, status: str, approved_by: str) -> dict:
+        """複数の占い師のステータスを1トランザクションでまとめて更新
+
+        戻り値の results は {ID: 'ok' または失敗理由}。削除済み・存在しないIDは更新しない。
+        """
+        import json
+        ids_json = json.dumps([int(i) for i in fortuneteller_ids])
+        target = """
+            WHERE id IN (SELECT value FROM json_each(:ids)) AND deleted_at IS NULL
+        """
+        try:
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT id FROM fortunetellers {target}", {'ids': ids_json})
+                updated_ids = {row[0] for row in cursor.fetchall()}
+
+                if status == "approved":
+                    cursor.execute(f"""
+                        UPDATE fortunetellers
+                        SET status = :status, approved_by = :approved_by,
+                            approved_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                        {target}
+                    """, {'ids': ids_json, 'status': status, 'approved_by': approved_by})
+                else:
+                    cursor.execute(f"""
+                        UPDATE fortunetellers
+                        SET status = :status, updated_at = CURRENT_TIMESTAMP
+                        {target}
+                    """, {'ids': ids_json, 'status': status})
+
+            self._notify_change(sorted(updated_ids))
+            print(f"✅ ステータスを一括更新しました: {status} {len(updated_ids)}件")
+            results, errors = self._bulk_result(fortuneteller_ids, updated_ids, "対象が見つかりません")
+            return {
+                'success': len(errors) < len(results),
+                'updated_count': len(results) - len(errors),
+                'results': results,
+                'errors': errors,
+                'total_requested': len(fortuneteller_ids)
+            }
+
+        except Exception as e:
+            print(f"❌ 一括更新エラー: {e}")
+            return {
+                'success': False,
+                'updated_count': 0,
+                'results': {int(i): f"システムエラー: {str(e)}" for i in fortuneteller_ids},
+                'errors': [f"システムエラー: {str(e)}"],
+                'total_requested': len(fortuneteller_ids)
+            }
+
+    def bulk_soft_delete(self, fortuneteller_ids: list, deleted_by: str, reason: str = "") -> dict:
+        """複数の占い師を1トランザクションでまとめて論理削除（削除ログも行ごとに記録）
+
+        戻り値の results は {ID: 'ok' または失敗理由}。
+        """
+        import json
+        ids_json = json.dumps([int(i) for i in fortuneteller_ids])
+        target = """
+            FROM fortunetellers
+            WHERE id IN (SELECT value FROM json_each(:ids)) AND deleted_at IS NULL
+        """
+        try:
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT id, name {target}", {'ids': ids_json})
+                names = dict(cursor.fetchall())
+
+                # 削除ログを記録（削除前の行を保存）
+                cursor.execute(f"""
+                    INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
+                    SELECT 'fortunetellers', id, {self._row_json(cursor, "fortunetellers")},
+                           :deleted_by, :reason
+                    {target}
+                """, {'ids': ids_json, 'deleted_by': deleted_by, 'reason': reason})
+
+                # 論理削除実行
                 cursor.execute("""
-                    UPDATE fortunetellers 
-                    SET status = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ? AND deleted_at IS NULL
-                """, (status, fortuneteller_id))
+                    UPDATE fortunetellers
+                    SET deleted_at = CURRENT_TIMESTAMP, deleted_by = :deleted_by
+                    WHERE id IN (SELECT value FROM json_each(:ids)) AND deleted_at IS NULL
+                """, {'ids': ids_json, 'deleted_by': deleted_by})
+
+            self._notify_change(sorted(names))
+            print(f"✅ 占い師を一括削除しました: {len(names)}件")
+            results, errors = self._bulk_result(
+                fortuneteller_ids, set(names), "削除対象が見つからないか、既に削除済み")
+            return {
+                'success': len(errors) < len(results),
+                'deleted_count': len(results) - len(errors),
+                'deleted_names': [names[i] for i, outcome in results.items() if outcome == 'ok'],
+                'results': results,
+                'errors': errors,
+                'total_requested': len(fortuneteller_ids)
+            }
 
-            conn.commit()
-            conn.close()
-            return True
         except Exception as e:
-            print(f"更新エラー: {e}")
-            return False
+            print(f"❌ 一括削除エラー: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                'success': False,
+                'deleted_count': 0,
+                'deleted_names': [],
+                'results': {int(i): f"システムエラー: {str(e)}" for i in fortuneteller_ids},
+                'errors': [f"システムエラー: {str(e)}"],
+                'total_requested': len(fortuneteller_ids)
+            }
 
     def save_work_request(self, subject: str, content: str, client_name: str, client_email: str) -> bool:
         """お仕事依頼を保存"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                INSERT INTO work_requests (subject, content, client_name, client_email)
-                VALUES (?, ?, ?, ?)
-            """, (subject, content, client_name, client_email))
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
 
-            conn.commit()
-            conn.close()
+                cursor.execute("""
+                    INSERT INTO work_requests (subject, content, client_name, client_email)
+                    VALUES (?, ?, ?, ?)
+                """, (subject, content, client_name, client_email))
             return True
         except Exception as e:
             print(f"保存エラー: {e}")
             return False
 
-    def get_work_requests(self, include_deleted: bool = False) -> pd.DataFrame:
-        """お仕事依頼一覧取得（削除対応版）"""
-        conn = sqlite3.connect(self.db_path)
-        deleted_condition = "" if include_deleted else "WHERE deleted_at IS NULL"
-        query = f"SELECT * FROM work_requests {deleted_condition} ORDER BY created_at DESC"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+    def get_work_requests(self, include_deleted: bool = False, limit: Optional[int] = None,
+                          after: Optional[tuple] = None) -> pd.DataFrame:
+        """お仕事依頼一覧取得（削除対応版・after は (created_at, id) のカーソル）"""
+        params = {'limit': -1 if limit is None else int(limit)}
+        deleted_condition = "" if include_deleted else "AND deleted_at IS NULL"
+        query = f"""
+            SELECT * FROM work_requests
+            WHERE 1=1 {deleted_condition} {self._keyset_condition("created_at", after, params)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit
+        """
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
         return df
 
+    def count_work_requests(self) -> int:
+        """削除されていないお仕事依頼の件数"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM work_requests WHERE deleted_at IS NULL")
+            return cursor.fetchone()[0]
+
+    @cached_read
     def get_setting(self, key: str) -> Optional[str]:
         """設定値取得"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        result = cursor.fetchone()
-        conn.close()
+            cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+            result = cursor.fetchone()
 
         if result:
             return result[0]
@@ -590,114 +1263,143 @@ class DatabaseManager:
     def update_setting(self, key: str, value: str) -> bool:
         """設定値更新"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                INSERT OR REPLACE INTO settings (key, value, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, (key, value))
-
-            conn.commit()
-            conn.close()
+                cursor.execute("""
+                    INSERT OR REPLACE INTO settings (key, value, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                """, (key, value))
             return True
         except Exception as e:
             print(f"設定更新エラー: {e}")
             return False
 
+    @cached_read
     def get_statistics(self) -> Dict[str, Any]:
-        """統計情報取得（削除対応版）"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # ステータス別件数
-        cursor.execute("""
-            SELECT 
-                COUNT(CASE WHEN status = 'approved' AND deleted_at IS NULL THEN 1 END) as approved,
-                COUNT(CASE WHEN status = 'pending' AND deleted_at IS NULL THEN 1 END) as pending,
-                COUNT(CASE WHEN status = 'rejected' AND deleted_at IS NULL THEN 1 END) as rejected,
-                COUNT(CASE WHEN deleted_at IS NOT NULL THEN 1 END) as deleted
-            FROM fortunetellers
-        """)
-
-        counts = cursor.fetchone()
+        """統計情報取得（削除対応版）
 
-        # カテゴリ別件数
-        categories_df = pd.read_sql_query("""
-            SELECT category, COUNT(*) as count
-            FROM fortunetellers
-            WHERE status = 'approved' AND deleted_at IS NULL
-            GROUP BY category
-            ORDER BY count DESC
-        """, conn)
+        件数はトリガーで更新される集計テーブル（stats_counters）から読むため、
+        占い師の件数に関係なく数十行を読むだけで済む。
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT kind, key, count FROM stats_counters WHERE count > 0")
+            rows = cursor.fetchall()
 
-        conn.close()
+        counts = {(kind, key): count for kind, key, count in rows}
+        # カテゴリ未設定は集計テーブルでは空文字なので None に戻す
+        categories = sorted(((key or None, count) for kind, key, count in rows if kind == 'category'),
+                            key=lambda item: item[1], reverse=True)
 
         return {
-            'approved': counts[0] or 0,
-            'pending': counts[1] or 0,
-            'rejected': counts[2] or 0,
-            'deleted': counts[3] or 0,
-            'categories': categories_df
+            'approved': counts.get(('status', 'approved'), 0),
+            'pending': counts.get(('status', 'pending'), 0),
+            'rejected': counts.get(('status', 'rejected'), 0),
+            'deleted': counts.get(('deleted', ''), 0),
+            'categories': pd.DataFrame(categories, columns=['category', 'count'])
         }
 
-    def permanently_delete_fortunetellers(self, fortuneteller_ids: list, deleted_by: str) -> dict:
-        """占い師情報を完全削除（物理削除）"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+    @cached_read
+    def get_daily_registrations(self, since: str) -> pd.DataFrame:
+        """since（YYYY-MM-DD、UTC）以降の日別登録件数（論理削除済みは除く、date・count列）
 
-            deleted_count = 0
-            deleted_names = []
-            errors = []
+        since を引数にしているため、日付が変わればキャッシュも別の値になる。
+        """
+        query = """
+            SELECT date(created_at) AS date, COUNT(*) AS count
+            FROM fortunetellers
+            WHERE deleted_at IS NULL AND created_at >= ?
+            GROUP BY date(created_at)
+            ORDER BY date
+        """
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=(since,))
+        return df
 
-            for fortuneteller_id in fortuneteller_ids:
-                try:
-                    # 削除前にデータを取得（削除済みのもののみ）
-                    cursor.execute("""
-                        SELECT * FROM fortunetellers 
-                        WHERE id = ? AND deleted_at IS NOT NULL
-                    """, (fortuneteller_id,))
-
-                    fortuneteller_data = cursor.fetchone()
-
-                    if fortuneteller_data:
-                        # 完全削除ログを記録
-                        import json
-                        cursor.execute("""
-                            INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, ("fortunetellers_permanent", fortuneteller_id,
-                              json.dumps(dict(fortuneteller_data),
-                                         ensure_ascii=False),
-                              deleted_by, "完全削除"))
-
-                        # 物理削除実行
-                        cursor.execute(
-                            "DELETE FROM fortunetellers WHERE id = ?", (fortuneteller_id,))
-
-                        if cursor.rowcount > 0:
-                            deleted_count += 1
-                            deleted_names.append(fortuneteller_data['name'])
-                            print(
-                                f"✅ 完全削除: ID {fortuneteller_id}, Name: {fortuneteller_data['name']}")
-                        else:
-                            errors.append(f"ID {fortuneteller_id}: 削除に失敗")
-                    else:
-                        errors.append(
-                            f"ID {fortuneteller_id}: 削除済みデータが見つかりません")
+    def check_statistics(self) -> Dict[str, Any]:
+        """集計テーブルと実データの件数を突き合わせる
 
-                except Exception as e:
-                    errors.append(f"ID {fortuneteller_id}: {str(e)}")
-                    print(f"❌ 完全削除エラー (ID: {fortuneteller_id}): {e}")
+        differences は食い違った (種類, キー, 集計テーブルの件数, 実際の件数) のリスト。
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT kind, key, count FROM stats_counters WHERE count != 0")
+            stored = {(kind, key): count for kind, key, count in cursor.fetchall()}
+            cursor.execute(migrations.stats_counts_sql())
+            actual = {(kind, key): count for kind, key, count in cursor.fetchall()}
+
+        differences = [
+            (kind, key, stored.get((kind, key), 0), actual.get((kind, key), 0))
+            for kind, key in sorted(set(stored) | set(actual))
+            if stored.get((kind, key), 0) != actual.get((kind, key), 0)
+        ]
+        return {'consistent': not differences, 'differences': differences}
+
+    def rebuild_statistics(self) -> bool:
+        """集計テーブルを実データから作り直す（トリガーを経由しない書き換えの後の修復用）"""
+        try:
+            with self._write_transaction() as conn:
+                migrations.rebuild_stats_counters(conn)
+            print("✅ 統計の集計テーブルを再構築しました")
+            return True
+        except Exception as e:
+            print(f"統計再構築エラー: {e}")
+            return False
 
-            conn.commit()
-            conn.close()
+    @staticmethod
+    def _row_json(cursor: sqlite3.Cursor, table: str) -> str:
+        """行全体をJSONにするSQL式（削除ログの record_data 用、dict(row) と同じキー）"""
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        return "json_object(" + ", ".join(f"'{column}', {column}" for column in columns) + ")"
+
+    def _purge_deleted_rows(self, table: str, record_ids: list, deleted_by: str,
+                            label_column: str) -> Tuple[List[str], List[str]]:
+        """論理削除済みの行をまとめて物理削除し、(削除した行のラベル, エラー) を返す
+
+        IDの一覧はJSON配列として1回だけ渡し、ログの記録（json_objectで行全体を保存）と
+        削除をそれぞれ1文で行う。行数に関係なく1トランザクション・3文で完了する。
+        """
+        import json
+        ids_json = json.dumps([int(record_id) for record_id in record_ids])
+        target = f"""
+            FROM {table}
+            WHERE id IN (SELECT value FROM json_each(:ids)) AND deleted_at IS NOT NULL
+        """
+
+        with self._write_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, {label_column} {target}", {'ids': ids_json})
+            labels = dict(cursor.fetchall())
+
+            # 完全削除ログを記録
+            cursor.execute(f"""
+                INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
+                SELECT :table_name, id, {self._row_json(cursor, table)}, :deleted_by, '完全削除'
+                {target}
+            """, {'ids': ids_json, 'table_name': f"{table}_permanent", 'deleted_by': deleted_by})
+
+            # 物理削除実行
+            cursor.execute(f"DELETE {target}", {'ids': ids_json})
+
+        deleted, errors = [], []
+        for record_id in record_ids:
+            label = labels.pop(int(record_id), None)
+            if label is not None:
+                deleted.append(label)
+            else:
+                errors.append(f"ID {record_id}: 削除済みデータが見つかりません")
+        print(f"✅ 完全削除: {table} {len(deleted)}件")
+        return deleted, errors
 
+    def permanently_delete_fortunetellers(self, fortuneteller_ids: list, deleted_by: str) -> dict:
+        """占い師情報を完全削除（物理削除・論理削除済みのもののみ）"""
+        try:
+            deleted_names, errors = self._purge_deleted_rows(
+                "fortunetellers", fortuneteller_ids, deleted_by, "name")
             return {
-                'success': deleted_count > 0,
-                'deleted_count': deleted_count,
+                'success': len(deleted_names) > 0,
+                'deleted_count': len(deleted_names),
                 'deleted_names': deleted_names,
                 'errors': errors,
                 'total_requested': len(fortuneteller_ids)
@@ -716,61 +1418,13 @@ class DatabaseManager:
             }
 
     def permanently_delete_work_requests(self, request_ids: list, deleted_by: str) -> dict:
-        """お仕事依頼を完全削除（物理削除）"""
+        """お仕事依頼を完全削除（物理削除・論理削除済みのもののみ）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            deleted_count = 0
-            deleted_subjects = []
-            errors = []
-
-            for request_id in request_ids:
-                try:
-                    # 削除前にデータを取得（削除済みのもののみ）
-                    cursor.execute("""
-                        SELECT * FROM work_requests 
-                        WHERE id = ? AND deleted_at IS NOT NULL
-                    """, (request_id,))
-
-                    request_data = cursor.fetchone()
-
-                    if request_data:
-                        # 完全削除ログを記録
-                        import json
-                        cursor.execute("""
-                            INSERT INTO deletion_logs (table_name, record_id, record_data, deleted_by, reason)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, ("work_requests_permanent", request_id,
-                              json.dumps(dict(request_data),
-                                         ensure_ascii=False),
-                              deleted_by, "完全削除"))
-
-                        # 物理削除実行
-                        cursor.execute(
-                            "DELETE FROM work_requests WHERE id = ?", (request_id,))
-
-                        if cursor.rowcount > 0:
-                            deleted_count += 1
-                            deleted_subjects.append(request_data['subject'])
-                            print(
-                                f"✅ 依頼完全削除: ID {request_id}, Subject: {request_data['subject']}")
-                        else:
-                            errors.append(f"ID {request_id}: 削除に失敗")
-                    else:
-                        errors.append(f"ID {request_id}: 削除済みデータが見つかりません")
-
-                except Exception as e:
-                    errors.append(f"ID {request_id}: {str(e)}")
-                    print(f"❌ 依頼完全削除エラー (ID: {request_id}): {e}")
-
-            conn.commit()
-            conn.close()
-
+            deleted_subjects, errors = self._purge_deleted_rows(
+                "work_requests", request_ids, deleted_by, "subject")
             return {
-                'success': deleted_count > 0,
-                'deleted_count': deleted_count,
+                'success': len(deleted_subjects) > 0,
+                'deleted_count': len(deleted_subjects),
                 'deleted_subjects': deleted_subjects,
                 'errors': errors,
                 'total_requested': len(request_ids)
@@ -788,10 +1442,85 @@ class DatabaseManager:
                 'total_requested': len(request_ids)
             }
 
-    def get_deletion_logs(self, limit: int = 50) -> pd.DataFrame:
-        """削除ログ一覧を取得"""
-        conn = sqlite3.connect(self.db_path)
-        query = f"SELECT * FROM deletion_logs ORDER BY deleted_at DESC LIMIT {limit}"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+    # エクスポートできるテーブルと、日付範囲の絞り込みに使う列
+    EXPORT_DATE_COLUMNS = {
+        "fortunetellers": "created_at",
+        "work_requests": "created_at",
+        "deletion_logs": "deleted_at",
+    }
+
+    def get_table_columns(self, table: str) -> List[Tuple[str, str]]:
+        """テーブルの (列名, 宣言された型) の一覧"""
+        with self._connection() as conn:
+            return [(row[1], row[2]) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+    def iter_export_batches(self, table: str, status: Optional[str] = None,
+                            category: Optional[str] = None, date_from: Optional[str] = None,
+                            date_to: Optional[str] = None, include_deleted: bool = False,
+                            batch_size: int = config.EXPORT_BATCH_SIZE):
+        """エクスポート用に行タプルのリストを batch_size 件ずつ返すジェネレータ（ID順）
+
+        カーソルから fetchmany で読み進めるため、テーブルの大きさによらずメモリ使用量は一定。
+        読み終える前にやめる場合は close() を呼ぶと、その時点で接続をプールに返す。
+        列の順序は get_table_columns と同じ。status・category は占い師のみ、
+        date_from・date_to（YYYY-MM-DD、両端を含む）は EXPORT_DATE_COLUMNS の列で絞り込む。
+        """
+        if table not in self.EXPORT_DATE_COLUMNS:
+            raise ValueError(f"エクスポートできないテーブルです: {table}")
+
+        date_column = self.EXPORT_DATE_COLUMNS[table]
+        conditions, params = [], {}
+        if table != "deletion_logs" and not include_deleted:
+            conditions.append("deleted_at IS NULL")
+        if table == "fortunetellers" and status and status != "all":
+            conditions.append("status = :status")
+            params['status'] = status
+        if table == "fortunetellers" and category:
+            conditions.append("category = :category")
+            params['category'] = category
+        if date_from:
+            conditions.append(f"{date_column} >= :date_from")
+            params['date_from'] = str(date_from)
+        if date_to:
+            conditions.append(f"{date_column} < date(:date_to, '+1 day')")
+            params['date_to'] = str(date_to)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connection() as conn:
+            cursor = conn.execute(f"SELECT * FROM {table} {where} ORDER BY id", params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                # 途中で破棄されたとき（close・GeneratorExit）も読み取りを終えてから接続を返す
+                cursor.close()
+
+    def get_deletion_logs(self, limit: int = 50, after: Optional[tuple] = None) -> pd.DataFrame:
+        """削除ログ一覧を取得（after は (deleted_at, id) のカーソル）"""
+        params = {'limit': int(limit)}
+        query = f"""
+            SELECT * FROM deletion_logs
+            WHERE 1=1 {self._keyset_condition("deleted_at", after, params)}
+            ORDER BY deleted_at DESC, id DESC
+            LIMIT :limit
+        """
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
         return df
+
+
+_manager: Optional[DatabaseManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_database_manager() -> DatabaseManager:
+    """プロセス共通のDatabaseManagerを取得（初回呼び出し時に初期化）"""
+    global _manager
+    if _manager is None or _manager.db_path != config.DATABASE_PATH:
+        with _manager_lock:
+            if _manager is None or _manager.db_path != config.DATABASE_PATH:
+                _manager = DatabaseManager()
+    return _manager
@@ -0,0 +1,196 @@
+"""
+データのエクスポート
+占い師・お仕事依頼・削除ログを一定件数ずつ読み込み、CSV・GeoJSON・Parquetをチャンク単位で書き出す
+管理画面のダウンロードからも同じ処理を使用する
+
+使い方:
+    python exporter.py fortunetellers --format csv -o fortunetellers.csv
+    python exporter.py fortunetellers --format geojson --status approved --category タロット
+    python exporter.py deletion_logs --format parquet --from 2024-01-01 --to 2024-12-31
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Iterable, Iterator, List, Tuple
+
+import config
+
+# Parquetは任意の依存関係（pyarrowが無ければ他の形式のみ）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("csv", "geojson", "parquet")
+FILE_EXTENSIONS = {"csv": "csv", "geojson": "geojson", "parquet": "parquet"}
+MIME_TYPES = {
+    "csv": "text/csv",
+    "geojson": "application/geo+json",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+Columns = List[Tuple[str, str]]
+
+
+def available_formats(table: str) -> List[str]:
+    """テーブルで使える形式（GeoJSONは座標を持つ占い師のみ、Parquetはpyarrowが必要）"""
+    formats = ["csv"]
+    if table == "fortunetellers":
+        formats.append("geojson")
+    if pa is not None:
+        formats.append("parquet")
+    return formats
+
+
+def export_csv(columns: Columns, batches: Iterable[list]) -> Iterator[bytes]:
+    """CSV（Excelで開けるようBOM付きUTF-8）をバッチごとに返す"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue().encode("utf-8-sig")
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_geojson(columns: Columns, batches: Iterable[list]) -> Iterator[bytes]:
+    """GeoJSONのFeatureCollection（緯度経度以外の列はproperties）をバッチごとに返す"""
+    names = [name for name, _ in columns]
+    lat_index, lng_index = names.index("latitude"), names.index("longitude")
+    property_indexes = [i for i in range(len(names)) if i not in (lat_index, lng_index)]
+
+    yield b'{"type": "FeatureCollection", "features": ['
+    separator = ""
+    for rows in batches:
+        features = []
+        for row in rows:
+            features.append(json.dumps({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [row[lng_index], row[lat_index]]},
+                "properties": {names[i]: row[i] for i in property_indexes},
+            }, ensure_ascii=False))
+        if features:
+            yield (separator + ",".join(features)).encode("utf-8")
+            separator = ","
+    yield b"]}"
+
+
+def _arrow_type(declared_type: str):
+    """SQLiteで宣言された型に対応するArrowの型"""
+    declared_type = declared_type.upper()
+    if "INT" in declared_type:
+        return pa.int64()
+    if "REAL" in declared_type or "FLOA" in declared_type or "DOUB" in declared_type:
+        return pa.float64()
+    if "BOOL" in declared_type:
+        return pa.bool_()
+    return pa.string()
+
+
+class _ChunkSink(io.RawIOBase):
+    """書き込まれたバイト列を溜めておき、取り出すたびに空にする出力先"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_parquet(columns: Columns, batches: Iterable[list]) -> Iterator[bytes]:
+    """Parquet（バッチごとに1つの行グループ）を書き出したぶんずつ返す"""
+    if pa is None:
+        raise RuntimeError("Parquetの書き出しには pyarrow が必要です（pip install pyarrow）")
+
+    schema = pa.schema([(name, _arrow_type(declared_type)) for name, declared_type in columns])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in batches:
+            arrays = [pa.array(values, type=field.type)
+                      for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+EXPORTERS = {
+    "csv": export_csv,
+    "geojson": export_geojson,
+    "parquet": export_parquet,
+}
+
+
+def export_table(db, table: str, file_format: str, **filters) -> Iterator[bytes]:
+    """テーブルを指定形式で書き出すジェネレータ（filters は iter_export_batches の引数）"""
+    if file_format not in available_formats(table):
+        raise ValueError(f"{table} は {file_format} 形式で書き出せません")
+    columns = db.get_table_columns(table)
+    batches = db.iter_export_batches(table, **filters)
+    return _close_batches_after(EXPORTERS[file_format](columns, batches), batches)
+
+
+def _close_batches_after(chunks: Iterator[bytes], batches) -> Iterator[bytes]:
+    """書き出しを途中でやめても（例外・close）、DBの読み込みを閉じて接続をプールに返す"""
+    try:
+        yield from chunks
+    finally:
+        batches.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="データのエクスポート（CSV・GeoJSON・Parquet）")
+    parser.add_argument("table", choices=["fortunetellers", "work_requests", "deletion_logs"])
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("-o", "--output", help="出力ファイル（省略時は標準出力）")
+    parser.add_argument("--status", choices=["all", "approved", "pending", "rejected"],
+                        help="ステータスで絞り込み（占い師のみ）")
+    parser.add_argument("--category", help="カテゴリで絞り込み（占い師のみ）")
+    parser.add_argument("--from", dest="date_from", help="この日以降（YYYY-MM-DD）")
+    parser.add_argument("--to", dest="date_to", help="この日まで（YYYY-MM-DD）")
+    parser.add_argument("--include-deleted", action="store_true", help="論理削除済みも含める")
+    parser.add_argument("--batch-size", type=int, default=config.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from database import get_database_manager
+
+    chunks = export_table(
+        get_database_manager(), args.table, args.format, status=args.status,
+        category=args.category, date_from=args.date_from, date_to=args.date_to,
+        include_deleted=args.include_deleted, batch_size=args.batch_size)
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        written = 0
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    if args.output:
+        print(f"✅ {args.output} に書き出しました（{written:,}バイト）")
+
+
+if __name__ == "__main__":
+    main()
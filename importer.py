@@ -0,0 +1,222 @@
+"""
+占い師データの一括インポート
+CSV・JSONL（1行1レコード）をチャンクごとに読み込み、チャンク単位でまとめて検証・登録する
+管理画面のアップロードからも同じ処理を使用する
+
+使い方:
+    python importer.py partners.csv
+    python importer.py partners.jsonl --status approved --rejects rejected.csv
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from models.fortuneteller import LATITUDE_RANGE, LONGITUDE_RANGE, ZIPCODE_PATTERN
+
+IMPORT_FORMATS = ("csv", "jsonl")
+REQUIRED_COLUMNS = ("name", "latitude", "longitude")
+TEXT_COLUMNS = ("name", "description", "contact", "website", "category",
+                "submitted_by", "zipcode", "address")
+# 投稿フォームと同じく、空でも空文字で登録する列（その他の任意列は空ならNULL）
+EMPTY_STRING_COLUMNS = ("description", "contact", "category")
+
+
+def detect_format(filename: str) -> str:
+    """拡張子から形式を判定（.jsonl / .ndjson はJSONL、それ以外はCSV）"""
+    extension = os.path.splitext(filename)[1].lower()
+    return "jsonl" if extension in (".jsonl", ".ndjson") else "csv"
+
+
+def read_chunks(source, file_format: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """ファイルパスまたはファイルオブジェクトから chunk_size 行ずつ読み込む
+
+    CSVは郵便番号の先頭の0が消えないよう、すべて文字列として読む。
+    """
+    if file_format == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        reader = pd.read_csv(source, chunksize=chunk_size, dtype=str,
+                             keep_default_na=False, encoding="utf-8-sig")
+    with reader:
+        yield from reader
+
+
+def _text_column(chunk: pd.DataFrame, column: str) -> pd.Series:
+    """文字列列を前後の空白を除いて取り出す（列が無い・空文字はNA）"""
+    if column not in chunk:
+        return pd.Series(pd.NA, index=chunk.index, dtype="string")
+    values = chunk[column].astype("string").str.strip()
+    return values.mask(values == "")
+
+
+def validate_chunk(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """チャンクをまとめて検証し、(正規化した全行, 行ごとの却下理由) を返す
+
+    規則は Fortuneteller.validate と同じ（名前必須・緯度経度の範囲・郵便番号の形式）。
+    却下理由が空文字の行が登録対象になる。
+    """
+    records = pd.DataFrame({column: _text_column(chunk, column) for column in TEXT_COLUMNS})
+    for column in ("latitude", "longitude"):
+        values = chunk[column] if column in chunk else pd.Series(np.nan, index=chunk.index)
+        records[column] = pd.to_numeric(values, errors="coerce")
+
+    latitude, longitude = records["latitude"], records["longitude"]
+    reasons = np.select(
+        [
+            records["name"].isna().to_numpy(),
+            (latitude.isna() | longitude.isna()).to_numpy(),
+            (~latitude.between(*LATITUDE_RANGE) | ~longitude.between(*LONGITUDE_RANGE)).to_numpy(),
+            (records["zipcode"].notna()
+             & ~records["zipcode"].str.match(ZIPCODE_PATTERN, na=True)).to_numpy(dtype=bool),
+        ],
+        [
+            "占い師名がありません",
+            "緯度・経度が数値ではありません",
+            "緯度・経度が範囲外です",
+            "郵便番号の形式が正しくありません",
+        ],
+        default="",
+    )
+    return records, pd.Series(reasons, index=chunk.index)
+
+
+def _to_rows(records: pd.DataFrame, columns: tuple, submitted_by: str) -> list:
+    """DB登録用のタプルのリストに変換（NAはNone・EMPTY_STRING_COLUMNS は空文字、投稿者が空なら submitted_by）"""
+    records = records.assign(
+        submitted_by=records["submitted_by"].fillna(submitted_by),
+        **{column: records[column].fillna("") for column in EMPTY_STRING_COLUMNS})
+    values = records.loc[:, list(columns)].astype(object)
+    return list(values.where(values.notna(), None).itertuples(index=False, name=None))
+
+
+def import_fortunetellers(db, source, file_format: str = "csv", status: str = "pending",
+                          chunk_size: int = config.IMPORT_CHUNK_SIZE,
+                          submitted_by: str = "一括インポート",
+                          progress: Optional[Callable[[int, int], None]] = None,
+                          defer_index: bool = config.IMPORT_DEFER_SEARCH_INDEX) -> Dict[str, Any]:
+    """CSV・JSONLを一括登録して結果を返す
+
+    チャンクごとに1トランザクションで登録するため、途中のチャンクが失敗しても
+    それまでのチャンクは登録済みになる（失敗したチャンクの範囲は errors に記録）。
+    rejected は却下した元の行に row（データ行の番号、1始まり）と reason を付けたDataFrame。
+    progress を渡すと、チャンクごとに (読み込んだ行数, 登録した行数) で呼び出す。
+    timings は工程ごとの秒数（read: 読み込み、validate: 検証とタプル化、insert: 登録、
+    index: 位置検索（R*Tree）・全文検索（trigram）の索引作成）。
+    索引はインポート全体で1回、最後にまとめて作る。defer_index=True なら
+    バックグラウンドのデータ移行に任せ、索引ができる前に結果を返す。
+    """
+    started = time.perf_counter()
+    total_rows = imported_count = 0
+    rejected_chunks, errors = [], []
+    timings = {'read': 0.0, 'validate': 0.0, 'insert': 0.0, 'index': 0.0}
+
+    try:
+        with db.deferred_search_indexing(background=defer_index):
+            chunks = read_chunks(source, file_format, chunk_size)
+            while True:
+                step = time.perf_counter()
+                chunk = next(chunks, None)
+                timings['read'] += time.perf_counter() - step
+                if chunk is None:
+                    break
+
+                missing = [column for column in REQUIRED_COLUMNS if column not in chunk]
+                if missing:
+                    errors.append(f"必須の列がありません: {', '.join(missing)}")
+                    break
+
+                total_rows += len(chunk)
+                step = time.perf_counter()
+                records, reasons = validate_chunk(chunk)
+                accepted = (reasons == "").to_numpy()
+                if not accepted.all():
+                    rejected_chunks.append(chunk.loc[~accepted].assign(
+                        row=chunk.index[~accepted] + 1, reason=reasons[~accepted]))
+
+                rows = _to_rows(records.loc[accepted], db.BULK_INSERT_COLUMNS, submitted_by)
+                timings['validate'] += time.perf_counter() - step
+                if rows:
+                    step = time.perf_counter()
+                    try:
+                        imported_count += db.bulk_insert_fortunetellers(
+                            rows, status=status, approved_by="一括インポート")
+                    except Exception as e:
+                        errors.append(f"{chunk.index[0] + 1}〜{chunk.index[-1] + 1}行目の登録に失敗: {e}")
+                        print(f"❌ インポートエラー: {e}")
+                    timings['insert'] += time.perf_counter() - step
+
+                if progress:
+                    progress(total_rows, imported_count)
+
+            step = time.perf_counter()
+        timings['index'] = time.perf_counter() - step
+
+    except Exception as e:
+        errors.append(f"ファイルの読み込みに失敗: {e}")
+        print(f"❌ インポートの読み込みエラー: {e}")
+
+    rejected = pd.concat(rejected_chunks) if rejected_chunks else pd.DataFrame(columns=["row", "reason"])
+    elapsed = time.perf_counter() - started
+    print(f"✅ インポート完了: {imported_count}件登録 / {len(rejected)}件却下（{elapsed:.1f}秒）")
+    return {
+        'success': imported_count > 0 and not errors,
+        'imported_count': imported_count,
+        'rejected_count': len(rejected),
+        'rejected': rejected,
+        'errors': errors,
+        'total_rows': total_rows,
+        'elapsed': elapsed,
+        'timings': timings
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="占い師データの一括インポート（CSV・JSONL）")
+    parser.add_argument("path", help="インポートするファイル")
+    parser.add_argument("--format", choices=IMPORT_FORMATS,
+                        help="ファイル形式（省略時は拡張子から判定）")
+    parser.add_argument("--status", choices=["pending", "approved"], default="pending",
+                        help="登録時のステータス")
+    parser.add_argument("--chunk-size", type=int, default=config.IMPORT_CHUNK_SIZE)
+    parser.add_argument("--submitted-by", default="一括インポート",
+                        help="投稿者名の列が空の行に設定する投稿者名")
+    parser.add_argument("--rejects", help="却下した行と理由を書き出すCSVファイル")
+    parser.add_argument("--defer-index", action="store_true",
+                        default=config.IMPORT_DEFER_SEARCH_INDEX,
+                        help="位置検索・全文検索の索引作成をバックグラウンドで行う")
+    args = parser.parse_args()
+
+    from database import get_database_manager
+
+    result = import_fortunetellers(
+        get_database_manager(), args.path, args.format or detect_format(args.path),
+        status=args.status, chunk_size=args.chunk_size, submitted_by=args.submitted_by,
+        progress=lambda read, imported: print(f"   {read:,}行読み込み / {imported:,}件登録"),
+        defer_index=args.defer_index)
+
+    rate = result['total_rows'] / result['elapsed'] if result['elapsed'] else 0
+    print(f"📥 {result['total_rows']:,}行: 登録 {result['imported_count']:,}件 / "
+          f"却下 {result['rejected_count']:,}件（{rate:,.0f}行/秒）")
+    timings = result['timings']
+    print(f"   読み込み {timings['read']:.1f}秒 / 検証 {timings['validate']:.1f}秒 / "
+          f"登録 {timings['insert']:.1f}秒 / 索引作成 {timings['index']:.1f}秒")
+    for error in result['errors']:
+        print(f"❌ {error}")
+
+    if args.rejects and result['rejected_count']:
+        result['rejected'].to_csv(args.rejects, index=False, encoding="utf-8-sig")
+        print(f"📝 却下した行を書き出しました: {args.rejects}")
+    elif result['rejected_count']:
+        print(result['rejected'][['row', 'reason']].head(20).to_string(index=False))
+
+    sys.exit(0 if not result['errors'] else 1)
+
+
+if __name__ == "__main__":
+    main()
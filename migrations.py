@@ -0,0 +1,667 @@
+"""
+スキーママイグレーション管理モジュール
+番号付きマイグレーションを順番に適用し、schema_migrationsテーブルに記録
+大きなテーブルのデータ移行は小分けのトランザクションでオンライン実行
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import config
+
+
+@dataclass
+class Backfill:
+    """大きなテーブルを主キー範囲ごとに小分けして更新するデータ移行
+
+    sqlには `rowid > ? AND rowid <= ?` に相当する範囲条件を含め、
+    開始・終了のrowidを受け取るようにする。
+    insert_trigger には、追加された行に同じ処理を1行ずつ行うトリガー名を指定する
+    （一括登録ではトリガーを外し、代わりにsqlをまとめて実行する）。
+    外れたトリガーはマイグレーションの再実行で作り直すため、トリガーは
+    CREATE TRIGGER IF NOT EXISTS で定義する。
+    """
+    table: str
+    sql: str
+    insert_trigger: Optional[str] = None
+    chunk_size: int = config.MIGRATION_BACKFILL_CHUNK_SIZE
+    pause: float = config.MIGRATION_BACKFILL_PAUSE
+
+
+@dataclass
+class Migration:
+    """マイグレーション1件分の定義"""
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+    backfill: Optional[Backfill] = None
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str, backfill: Optional[Backfill] = None):
+    """マイグレーション関数を登録するデコレータ"""
+    def register(func: Callable[[sqlite3.Connection], None]):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"マイグレーション番号が重複しています: {version}")
+        MIGRATIONS.append(Migration(version, name, func, backfill))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+
+def latest_version() -> int:
+    """最新のスキーマバージョン"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def get_user_version(conn: sqlite3.Connection) -> int:
+    """DBに記録されたスキーマバージョン（PRAGMA user_version）"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, column_type: str) -> bool:
+    """列がなければ追加（ALTER TABLE ADD COLUMNは行数によらず一瞬で終わる）"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    print(f"✅ {table}.{column}列を追加しました")
+    return True
+
+
+def _ensure_migrations_table(conn: sqlite3.Connection):
+    """適用履歴テーブルを作成"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            backfill_cursor INTEGER,
+            backfill_done BOOLEAN DEFAULT 1
+        )
+    """)
+    conn.commit()
+
+
+def migrate(conn: sqlite3.Connection, use_fast_path: bool = True,
+            max_version: Optional[int] = None) -> List[int]:
+    """未適用のマイグレーションを順番に適用し、適用したバージョンを返す
+
+    user_versionが最新ならテーブルを一切参照せずに終了する。
+    max_version を指定するとそのバージョンまでで止める（計測用に古いスキーマを作る場合）。
+    各マイグレーションはスキーマ変更・履歴記録・user_version更新を
+    1つのトランザクションで行うため、途中で失敗しても中途半端な状態が残らない。
+    """
+    target_version = latest_version() if max_version is None else min(max_version, latest_version())
+    if use_fast_path and get_user_version(conn) >= target_version:
+        return []
+
+    _ensure_migrations_table(conn)
+    applied_versions = {
+        row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+    applied = []
+    for m in MIGRATIONS:
+        if m.version in applied_versions or m.version > target_version:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            m.apply(conn)
+            conn.execute("""
+                INSERT INTO schema_migrations (version, name, backfill_cursor, backfill_done)
+                VALUES (?, ?, ?, ?)
+            """, (m.version, m.name, 0 if m.backfill else None, 0 if m.backfill else 1))
+            conn.execute(f"PRAGMA user_version = {int(m.version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        applied.append(m.version)
+        print(f"✅ マイグレーション {m.version:03d} を適用しました: {m.name}")
+
+        # 小さなテーブルはその場でデータ移行まで済ませる
+        if m.backfill and _max_rowid(conn, m.backfill.table) <= m.backfill.chunk_size:
+            run_backfill(conn, m.version)
+
+    # 履歴はあるがuser_versionが古い場合（手動復旧など）も最新にそろえる
+    if get_user_version(conn) < target_version:
+        conn.execute(f"PRAGMA user_version = {int(target_version)}")
+
+    return applied
+
+
+def pending_backfills(conn: sqlite3.Connection) -> List[int]:
+    """データ移行が完了していないマイグレーション番号"""
+    try:
+        rows = conn.execute("""
+            SELECT version FROM schema_migrations
+            WHERE backfill_done = 0
+            ORDER BY version
+        """).fetchall()
+    except sqlite3.OperationalError:
+        return []  # 履歴テーブルがまだない
+    return [row[0] for row in rows]
+
+
+def _max_rowid(conn: sqlite3.Connection, table: str) -> int:
+    """テーブルの最大rowid（データ移行の終了位置）"""
+    return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+
+
+def bump_data_revision(conn: sqlite3.Connection):
+    """データのリビジョンを1つ進める（007より前でテーブルがなければ何もしない）"""
+    try:
+        conn.execute("UPDATE data_revision SET revision = revision + 1 WHERE id = 1")
+    except sqlite3.OperationalError:
+        pass
+
+
+def run_backfill(conn: sqlite3.Connection, version: int) -> int:
+    """データ移行を小分けのトランザクションで実行し、処理したチャンク数を返す
+
+    チャンクごとにコミットして進捗（最後に処理したrowid）を記録するため、
+    他の書き込みを長時間ブロックせず、中断しても続きから再開できる。
+    位置検索・全文検索の結果が変わるため、チャンクごとにデータのリビジョンも進める
+    （途中までの結果がキャッシュに残り続けないように）。
+    """
+    m = next((m for m in MIGRATIONS if m.version == version), None)
+    if m is None or m.backfill is None:
+        return 0
+    backfill = m.backfill
+
+    chunks = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 一括登録（defer_insert_triggers）が開始位置を戻すことがあるため、毎回読み直す
+            row = conn.execute(
+                "SELECT backfill_cursor FROM schema_migrations WHERE version = ?", (version,)).fetchone()
+            last_rowid = (row[0] if row else 0) or 0
+            if row is None or last_rowid >= _max_rowid(conn, backfill.table):
+                # トリガーが外れている間（他のセッションの一括登録中）は完了にしない
+                trigger_missing = backfill.insert_trigger and not conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                    (backfill.insert_trigger,)).fetchone()
+                if not trigger_missing:
+                    conn.execute(
+                        "UPDATE schema_migrations SET backfill_done = 1 WHERE version = ?", (version,))
+                conn.commit()
+                break
+            upper = last_rowid + backfill.chunk_size
+            conn.execute(backfill.sql, (last_rowid, upper))
+            bump_data_revision(conn)
+            conn.execute(
+                "UPDATE schema_migrations SET backfill_cursor = ? WHERE version = ?", (upper, version))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        chunks += 1
+        if backfill.pause:
+            time.sleep(backfill.pause)  # 他のセッションに書き込みロックを譲る
+
+    print(f"✅ マイグレーション {version:03d} のデータ移行が完了しました（{chunks}チャンク）")
+    return chunks
+
+
+def _deferrable_backfills(conn: sqlite3.Connection, table: str) -> Dict[str, Backfill]:
+    """tableへの追加で行単位のトリガーが索引を作っているデータ移行（トリガー名→定義）"""
+    triggers = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))}
+    return {m.backfill.insert_trigger: m.backfill for m in MIGRATIONS
+            if m.backfill and m.backfill.table == table and m.backfill.insert_trigger in triggers}
+
+
+@contextmanager
+def deferred_insert_triggers(conn: sqlite3.Connection, table: str):
+    """一括INSERTの間だけ行単位の同期トリガーを外し、最後にデータ移行のSQLでまとめて反映
+
+    呼び出し側のトランザクション内で使う。DROP/CREATE TRIGGERもトランザクションに含まれるため、
+    途中で失敗してロールバックすればトリガーも元に戻る。
+    defer_insert_triggers で既に外れている場合は何もしない。
+    """
+    triggers = dict(conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)))
+    deferred = list(_deferrable_backfills(conn, table).items())
+
+    start = _max_rowid(conn, table)
+    for name, _ in deferred:
+        conn.execute(f"DROP TRIGGER {name}")
+    completed = False
+    try:
+        yield
+        completed = True
+    finally:
+        if completed:
+            end = _max_rowid(conn, table)
+            if end > start:
+                for _, backfill in deferred:
+                    conn.execute(backfill.sql, (start, end))
+        for name, _ in deferred:
+            conn.execute(triggers[name])
+
+
+def defer_insert_triggers(conn: sqlite3.Connection, table: str) -> List[int]:
+    """複数トランザクションにまたがる一括登録の前に、索引を作る行単位のトリガーを外す
+
+    呼び出し側のトランザクション内で使う。外したマイグレーションはデータ移行を未完了に戻し、
+    外した時点の位置から再開するように記録する。登録後は restore_insert_triggers で
+    トリガーを作り直し、run_backfill で追加された行の索引を作る。途中でプロセスが終了しても、
+    次の起動時のデータ移行（run_pending_backfills）で同じ手順により元に戻る。
+    外したマイグレーション番号を返す。
+    """
+    start = _max_rowid(conn, table)
+    triggers = _deferrable_backfills(conn, table)
+    deferred = []
+    for m in MIGRATIONS:
+        if m.backfill and m.backfill.insert_trigger in triggers:
+            conn.execute(f"DROP TRIGGER {m.backfill.insert_trigger}")
+            conn.execute("""
+                UPDATE schema_migrations
+                SET backfill_cursor = CASE WHEN backfill_done THEN ?
+                                           ELSE MIN(COALESCE(backfill_cursor, 0), ?) END,
+                    backfill_done = 0
+                WHERE version = ?
+            """, (start, start, m.version))
+            deferred.append(m.version)
+    return deferred
+
+
+def restore_insert_triggers(conn: sqlite3.Connection, table: Optional[str] = None) -> List[int]:
+    """外れたままの行単位トリガーを作り直し、作り直したマイグレーション番号を返す
+
+    呼び出し側のトランザクション内で使う。トリガーを定義したマイグレーションを再実行する
+    （CREATE ... IF NOT EXISTS で書かれているため、足りないトリガーだけが作られる）。
+    """
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    applied_versions = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+    restored = []
+    for m in MIGRATIONS:
+        if (m.backfill and m.backfill.insert_trigger and m.version in applied_versions
+                and (table is None or m.backfill.table == table)
+                and m.backfill.insert_trigger not in triggers):
+            m.apply(conn)
+            restored.append(m.version)
+    return restored
+
+
+def run_pending_backfills(conn: sqlite3.Connection) -> Dict[int, int]:
+    """未完了のデータ移行をすべて実行
+
+    一括登録の途中でプロセスが終了してトリガーが外れたままなら、先に作り直す。
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        restore_insert_triggers(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {version: run_backfill(conn, version) for version in pending_backfills(conn)}
+
+
+# ===== マイグレーション定義（番号は追加のみ・既存の定義は変更しない） =====
+
+@migration(1, "初期テーブル作成")
+def _001_initial_schema(conn: sqlite3.Connection):
+    # 占い師テーブル
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fortunetellers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            description TEXT,
+            contact TEXT,
+            website TEXT,
+            category TEXT,
+            status TEXT DEFAULT 'pending',
+            submitted_by TEXT DEFAULT '匿名',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            approved_by TEXT,
+            approved_at TIMESTAMP,
+            zipcode TEXT,
+            address TEXT,
+            deleted_at TIMESTAMP,
+            deleted_by TEXT
+        )
+    """)
+
+    # お仕事依頼テーブル
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS work_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject TEXT NOT NULL,
+            content TEXT NOT NULL,
+            client_name TEXT NOT NULL,
+            client_email TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP,
+            deleted_by TEXT
+        )
+    """)
+
+    # 設定テーブル
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 管理者パスワードテーブル
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_passwords (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            password_hash TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+    """)
+
+    # パスワード履歴テーブル
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS password_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 削除ログテーブル
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS deletion_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            record_id INTEGER NOT NULL,
+            record_data TEXT NOT NULL,
+            deleted_by TEXT NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            reason TEXT
+        )
+    """)
+
+
+@migration(2, "住所・論理削除列の追加（旧バージョンのDB向け）")
+def _002_address_and_soft_delete_columns(conn: sqlite3.Connection):
+    for column_name, column_type in [('website', 'TEXT'),
+                                     ('zipcode', 'TEXT'),
+                                     ('address', 'TEXT'),
+                                     ('deleted_at', 'TIMESTAMP'),
+                                     ('deleted_by', 'TEXT')]:
+        add_column_if_missing(conn, 'fortunetellers',
+                              column_name, column_type)
+
+    for column_name, column_type in [('deleted_at', 'TIMESTAMP'),
+                                     ('deleted_by', 'TEXT')]:
+        add_column_if_missing(conn, 'work_requests', column_name, column_type)
+
+
+@migration(3, "一覧・統計クエリ用のインデックス追加")
+def _003_list_query_indexes(conn: sqlite3.Connection):
+    # get_fortunetellers(status): status = ? AND deleted_at IS NULL ORDER BY created_at DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fortunetellers_status_created
+        ON fortunetellers (status, created_at)
+        WHERE deleted_at IS NULL
+    """)
+    # get_fortunetellers("all"): deleted_at IS NULL ORDER BY created_at DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fortunetellers_live_created
+        ON fortunetellers (created_at)
+        WHERE deleted_at IS NULL
+    """)
+    # get_deleted_fortunetellers: deleted_at IS NOT NULL ORDER BY deleted_at DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fortunetellers_deleted_at
+        ON fortunetellers (deleted_at)
+        WHERE deleted_at IS NOT NULL
+    """)
+    # get_statistics: 承認済みのカテゴリ別件数（インデックスだけで集計できる）
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fortunetellers_approved_category
+        ON fortunetellers (category)
+        WHERE status = 'approved' AND deleted_at IS NULL
+    """)
+    # get_work_requests: deleted_at IS NULL ORDER BY created_at DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_work_requests_live_created
+        ON work_requests (created_at)
+        WHERE deleted_at IS NULL
+    """)
+    # get_deletion_logs: ORDER BY deleted_at DESC LIMIT ?
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_deletion_logs_deleted_at
+        ON deletion_logs (deleted_at)
+    """)
+
+
+@migration(4, "位置検索用R*Treeインデックス追加", backfill=Backfill(
+    table="fortunetellers",
+    sql="""
+        INSERT OR REPLACE INTO fortunetellers_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        SELECT id, latitude, latitude, longitude, longitude
+        FROM fortunetellers
+        WHERE rowid > ? AND rowid <= ?
+    """,
+    insert_trigger="trg_fortunetellers_rtree_insert"))
+def _004_fortunetellers_rtree(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS fortunetellers_rtree
+        USING rtree(id, min_lat, max_lat, min_lng, max_lng)
+    """)
+
+    # fortunetellersの座標とR*Treeをトリガーで同期
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_rtree_insert
+        AFTER INSERT ON fortunetellers
+        BEGIN
+            INSERT OR REPLACE INTO fortunetellers_rtree (id, min_lat, max_lat, min_lng, max_lng)
+            VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_rtree_update
+        AFTER UPDATE OF latitude, longitude ON fortunetellers
+        BEGIN
+            UPDATE fortunetellers_rtree
+            SET min_lat = NEW.latitude, max_lat = NEW.latitude,
+                min_lng = NEW.longitude, max_lng = NEW.longitude
+            WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_rtree_delete
+        AFTER DELETE ON fortunetellers
+        BEGIN
+            DELETE FROM fortunetellers_rtree WHERE id = OLD.id;
+        END
+    """)
+
+
+@migration(5, "全文検索用FTS5（trigram）インデックス追加", backfill=Backfill(
+    table="fortunetellers",
+    sql="""
+        INSERT OR REPLACE INTO fortunetellers_fts (rowid, name, address, description)
+        SELECT id, name, address, description
+        FROM fortunetellers
+        WHERE rowid > ? AND rowid <= ?
+    """,
+    insert_trigger="trg_fortunetellers_fts_insert"))
+def _005_fortunetellers_fts(conn: sqlite3.Connection):
+    # trigramトークナイザーは分かち書き不要で日本語の部分一致に使える（3文字以上の語）
+    # 外部コンテンツ表にするとチャンク単位の再投入が冪等にならないため、本文を複製して持つ
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS fortunetellers_fts
+        USING fts5(name, address, description, tokenize='trigram')
+    """)
+
+    # fortunetellersの名前・住所・説明とFTSをトリガーで同期（rowid = 占い師ID）
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_fts_insert
+        AFTER INSERT ON fortunetellers
+        BEGIN
+            INSERT OR REPLACE INTO fortunetellers_fts (rowid, name, address, description)
+            VALUES (NEW.id, NEW.name, NEW.address, NEW.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_fts_update
+        AFTER UPDATE OF name, address, description ON fortunetellers
+        BEGIN
+            INSERT OR REPLACE INTO fortunetellers_fts (rowid, name, address, description)
+            VALUES (NEW.id, NEW.name, NEW.address, NEW.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_fts_delete
+        AFTER DELETE ON fortunetellers
+        BEGIN
+            DELETE FROM fortunetellers_fts WHERE rowid = OLD.id;
+        END
+    """)
+
+
+# 集計テーブル（stats_counters）に1行ぶんが寄与する (種類, キー, 条件)
+# status: 削除されていない行のステータス別件数 / deleted: 論理削除済みの件数 /
+# category: 承認済みで削除されていない行のカテゴリ別件数（カテゴリ未設定は空文字）
+STATS_CONTRIBUTIONS = (
+    ("'status'", "COALESCE({row}status, '')", "{row}deleted_at IS NULL"),
+    ("'deleted'", "''", "{row}deleted_at IS NOT NULL"),
+    ("'category'", "COALESCE({row}category, '')",
+     "{row}status = 'approved' AND {row}deleted_at IS NULL"),
+)
+
+
+def _stats_upsert_sql(row: str, delta: int) -> str:
+    """行 row（NEW / OLD）の寄与ぶんだけ集計テーブルを増減するSQL"""
+    prefix = f"{row}." if row else ""
+    selects = " UNION ALL ".join(
+        f"SELECT {kind}, {key.format(row=prefix)}, {delta} WHERE {condition.format(row=prefix)}"
+        for kind, key, condition in STATS_CONTRIBUTIONS)
+    return f"""
+        INSERT INTO stats_counters (kind, key, count)
+        SELECT * FROM ({selects}) WHERE true
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count
+    """
+
+
+def stats_counts_sql() -> str:
+    """fortunetellersを直接集計して (kind, key, count) を返すSQL（集計テーブルの正解）"""
+    selects = " UNION ALL ".join(
+        f"SELECT {kind} AS kind, {key.format(row='')} AS key FROM fortunetellers "
+        f"WHERE {condition.format(row='')}"
+        for kind, key, condition in STATS_CONTRIBUTIONS)
+    return f"SELECT kind, key, COUNT(*) AS count FROM ({selects}) GROUP BY kind, key"
+
+
+def rebuild_stats_counters(conn: sqlite3.Connection):
+    """集計テーブルをfortunetellersから作り直す（呼び出し側のトランザクション内で使う）"""
+    conn.execute("DELETE FROM stats_counters")
+    conn.execute(f"INSERT INTO stats_counters (kind, key, count) {stats_counts_sql()}")
+
+
+@migration(6, "統計用の集計テーブル（トリガーで更新）追加")
+def _006_stats_counters(conn: sqlite3.Connection):
+    # get_statisticsが全件を集計せずに済むよう、件数をトリガーで常に最新に保つ
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_stats_insert
+        AFTER INSERT ON fortunetellers
+        BEGIN
+            {_stats_upsert_sql("NEW", 1)};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_stats_update
+        AFTER UPDATE OF status, category, deleted_at ON fortunetellers
+        BEGIN
+            {_stats_upsert_sql("OLD", -1)};
+            {_stats_upsert_sql("NEW", 1)};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_stats_delete
+        AFTER DELETE ON fortunetellers
+        BEGIN
+            {_stats_upsert_sql("OLD", -1)};
+        END
+    """)
+
+    # 既存の行を1回だけ集計する（以降はトリガーが差分だけを反映）
+    rebuild_stats_counters(conn)
+
+
+@migration(7, "データのリビジョン（キャッシュ無効化用）追加")
+def _007_data_revision(conn: sqlite3.Connection):
+    # 書き込みのたびに revision を進め、読み取り側はこの値をキャッシュのキーに使う
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO data_revision (id, revision) VALUES (1, 0)")
+
+
+# 地図に出る行（承認済みで削除されていない行）の条件
+_LOCATION_VISIBLE = "{row}.status = 'approved' AND {row}.deleted_at IS NULL"
+
+# 地図に出る行の追加・削除・移動があった書き込みで locations_revision を進める。
+# 値はこの書き込みがコミットされるときのリビジョン（コミット直前に revision が1進む）で、
+# 1つの書き込みで何行変わっても1回だけ更新し、直前の値を locations_previous に残す
+_LOCATIONS_REVISION_SQL = """
+    UPDATE data_revision
+    SET locations_previous = locations_revision, locations_revision = revision + 1
+    WHERE id = 1 AND locations_revision <> revision + 1
+"""
+
+
+@migration(8, "地図に出る位置のリビジョン（クラスターの差分更新用）追加")
+def _008_locations_revision(conn: sqlite3.Connection):
+    # データのリビジョンは承認待ちの投稿や設定の変更でも進むため、地図のクラスターは
+    # 承認済みの位置が変わったときだけ読み直せるよう別に記録する
+    add_column_if_missing(conn, "data_revision", "locations_revision", "INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "data_revision", "locations_previous", "INTEGER NOT NULL DEFAULT 0")
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_locations_insert
+        AFTER INSERT ON fortunetellers
+        WHEN {_LOCATION_VISIBLE.format(row="NEW")}
+        BEGIN
+            {_LOCATIONS_REVISION_SQL};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_locations_update
+        AFTER UPDATE OF status, deleted_at, latitude, longitude ON fortunetellers
+        WHEN ({_LOCATION_VISIBLE.format(row="OLD")}) OR ({_LOCATION_VISIBLE.format(row="NEW")})
+        BEGIN
+            {_LOCATIONS_REVISION_SQL};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fortunetellers_locations_delete
+        AFTER DELETE ON fortunetellers
+        WHEN {_LOCATION_VISIBLE.format(row="OLD")}
+        BEGIN
+            {_LOCATIONS_REVISION_SQL};
+        END
+    """)
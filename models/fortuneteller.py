@@ -4,6 +4,12 @@
 from dataclasses import dataclass
 from typing import Optional, Dict, Any
 
+# 日本の郵便番号形式：1234567 または 123-4567（一括インポートの検証でも使用）
+ZIPCODE_PATTERN = r'^(\d{7}|\d{3}-\d{4})$'
+# 緯度・経度の有効範囲
+LATITUDE_RANGE = (-90, 90)
+LONGITUDE_RANGE = (-180, 180)
+
 
 @dataclass
 class Fortuneteller:
@@ -33,9 +39,9 @@ class Fortuneteller:
         """バリデーション"""
         if not self.name:
             return False
-        if not (-90 <= self.latitude <= 90):
+        if not (LATITUDE_RANGE[0] <= self.latitude <= LATITUDE_RANGE[1]):
             return False
-        if not (-180 <= self.longitude <= 180):
+        if not (LONGITUDE_RANGE[0] <= self.longitude <= LONGITUDE_RANGE[1]):
             return False
 
         # 郵便番号のバリデーション（任意フィールドなので、値があれば検証）
@@ -47,6 +53,4 @@ class Fortuneteller:
     def _validate_zipcode(self, zipcode: str) -> bool:
         """郵便番号の形式チェック（日本の郵便番号形式）"""
         import re
-        # 日本の郵便番号形式：1234567 または 123-4567
-        pattern = r'^(\d{7}|\d{3}-\d{4})$'
-        return bool(re.match(pattern, zipcode))
+        return bool(re.match(ZIPCODE_PATTERN, zipcode))
@@ -7,7 +7,7 @@ import streamlit as st
 import json
 import config
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 
 class AdminPage:
@@ -33,9 +33,9 @@ class AdminPage:
                 st.rerun()
 
         # タブ表示
-        tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
+        tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(
             ["📋 承認待ち", "✅ 承認済み", "🗑️ 削除済み", "⚙️ サイト設定",
-                "💼 お仕事依頼", "📊 統計", "🔐 パスワード変更"]
+                "💼 お仕事依頼", "📦 データ管理", "📊 統計", "🔐 パスワード変更"]
         )
 
         with tab1:
@@ -54,9 +54,12 @@ class AdminPage:
             self._show_work_requests()
 
         with tab6:
-            self._show_statistics()
+            self._show_data_management()
 
         with tab7:
+            self._show_statistics()
+
+        with tab8:
             self._show_password_change()
 
     def _show_login(self):
@@ -74,6 +77,101 @@ class AdminPage:
             else:
                 st.error("❌ パスワードが間違っています")
 
+    def _load_page(self, key: str, fetch, conditions=None):
+        """ページング状態に従って1ページ分を取得
+
+        fetch(limit, after) は after（前ページ末尾のカーソル、先頭ページはNone）より後ろを
+        limit 件まで返す関数。1件多く取得して次ページの有無を判定する。
+        検索条件 conditions が変わったら先頭ページに戻す。
+        戻り値は (ページのDataFrame, 次ページの有無, このページのカーソル)。
+        """
+        state_key = f"{key}_page_state"
+        state = st.session_state.get(state_key)
+        if state is None or state['conditions'] != conditions:
+            state = {'conditions': conditions, 'cursors': [None]}
+            st.session_state[state_key] = state
+
+        page_size = config.ADMIN_PAGE_SIZE
+        cursors = state['cursors']
+        df = fetch(page_size + 1, cursors[-1])
+        # 承認・削除などでページが空になったら前のページに戻る
+        while df.empty and len(cursors) > 1:
+            cursors.pop()
+            df = fetch(page_size + 1, cursors[-1])
+        return df.head(page_size), len(df) > page_size, cursors[-1]
+
+    def _show_page_controls(self, key: str, has_next: bool, next_cursor):
+        """前へ・次へボタンとページ番号（1ページに収まる場合は表示しない）"""
+        cursors = st.session_state[f"{key}_page_state"]['cursors']
+        if len(cursors) == 1 and not has_next:
+            return
+
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("◀ 前へ", key=f"{key}_prev_page", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"{len(cursors)}ページ目（{config.ADMIN_PAGE_SIZE}件ずつ表示）")
+        with col3:
+            if st.button("次へ ▶", key=f"{key}_next_page", disabled=not has_next):
+                cursors.append(next_cursor)
+                st.rerun()
+
+    def _show_bulk_actions(self, key: str, page_df: pd.DataFrame, actions: dict):
+        """表示中のページから複数選択してまとめて処理するフォーム
+
+        actions は {変更後のステータス または "delete": ボタンのラベル}。
+        1回の操作が1トランザクションになり、結果は再描画後に _show_bulk_result で表示する。
+        """
+        labels = {int(row.id): f"{row.name} (ID: {row.id})"
+                  for row in page_df.itertuples(index=False)}
+
+        with st.expander("📦 一括操作"):
+            with st.form(f"{key}_bulk_form", clear_on_submit=True):
+                select_all = st.checkbox("このページをすべて選択", key=f"{key}_bulk_all")
+                selected = st.multiselect(
+                    "対象", list(labels), format_func=labels.get, key=f"{key}_bulk_ids")
+                reason = st.text_input(
+                    "削除理由（削除時）", placeholder="例：スパム、重複投稿", key=f"{key}_bulk_reason")
+
+                submitted = None
+                for col, (action, label) in zip(st.columns(len(actions)), actions.items()):
+                    with col:
+                        if st.form_submit_button(label):
+                            submitted = action
+
+        if submitted is None:
+            return
+        target_ids = list(labels) if select_all else selected
+        if not target_ids:
+            st.warning("⚠️ 対象を選択してください")
+            return
+
+        if submitted == "delete":
+            result = self.db.bulk_soft_delete(target_ids, "管理者", reason)
+        else:
+            result = self.db.bulk_update_status(target_ids, submitted, "管理者")
+        st.session_state[f"{key}_bulk_result"] = (actions[submitted], result)
+        st.rerun()
+
+    def _show_bulk_result(self, key: str):
+        """直前の一括操作の結果（ID別の失敗を含む）を表示"""
+        bulk_result = st.session_state.pop(f"{key}_bulk_result", None)
+        if not bulk_result:
+            return
+
+        label, result = bulk_result
+        succeeded = sum(1 for outcome in result['results'].values() if outcome == 'ok')
+        if succeeded:
+            st.success(f"✅ {label}: {succeeded}件を処理しました")
+        if result['errors']:
+            st.error(f"❌ {len(result['errors'])}件は処理できませんでした")
+            for error in result['errors'][:5]:
+                st.write(f"• {error}")
+            if len(result['errors']) > 5:
+                st.write(f"• ...他{len(result['errors']) - 5}件")
+
     def _show_pending_submissions(self):
         """承認待ち表示（削除ボタン追加版）"""
         st.subheader("📋 承認待ち一覧")
@@ -84,9 +182,19 @@ class AdminPage:
             self._handle_delete_confirmation(delete_confirm_key)
             return
 
-        pending_df = self.db.get_fortunetellers("pending")
+        self._show_bulk_result("pending")
+
+        pending_df, has_next, _ = self._load_page(
+            "pending", lambda limit, after: self.db.get_fortunetellers(
+                "pending", limit=limit, after=after))
         if not pending_df.empty:
-            for idx, row in pending_df.iterrows():
+            self._show_bulk_actions("pending", pending_df, {
+                "approved": "✅ 一括承認",
+                "rejected": "❌ 一括却下",
+                "delete": "🗑️ 一括削除",
+            })
+
+            for row in pending_df.to_dict('records'):
                 with st.expander(f"🔮 {row['name']} (ID: {row['id']})"):
                     self._show_fortuneteller_details(row)
 
@@ -111,6 +219,9 @@ class AdminPage:
                                 'tab': 'pending'
                             }
                             st.rerun()
+
+            self._show_page_controls(
+                "pending", has_next, self.db.get_next_cursor(pending_df))
         else:
             st.info("📝 承認待ちの投稿はありません")
 
@@ -124,33 +235,47 @@ class AdminPage:
             self._handle_delete_confirmation(delete_confirm_key)
             return
 
-        approved_df = self.db.get_fortunetellers("approved")
-        if not approved_df.empty:
+        self._show_bulk_result("approved")
+
+        approved_total = self.db.get_statistics()['approved']
+        if approved_total:
             # 検索フィルター
             col1, col2 = st.columns([3, 1])
             with col1:
                 search_term = st.text_input(
-                    "🔍 検索（名前・カテゴリ・住所）", key="approved_search")
+                    "🔍 検索（名前・住所・説明）", key="approved_search")
             with col2:
                 category_filter = st.selectbox(
                     "カテゴリフィルター", ["すべて"] + config.FORTUNE_CATEGORIES, key="approved_category")
 
-            # フィルター適用
-            filtered_df = approved_df
+            # フィルター適用（検索語は全文検索インデックスで関連度順に絞り込み）
+            category = None if category_filter == "すべて" else category_filter
             if search_term:
-                filtered_df = filtered_df[
-                    filtered_df['name'].str.contains(search_term, na=False) |
-                    filtered_df['category'].str.contains(search_term, na=False) |
-                    filtered_df['address'].str.contains(search_term, na=False)
-                ]
-            if category_filter != "すべて":
-                filtered_df = filtered_df[filtered_df['category']
-                                          == category_filter]
+                # 関連度順の検索結果はオフセットでページ送り
+                filtered_df, has_next, offset = self._load_page(
+                    "approved", lambda limit, offset: self.db.search_fortunetellers(
+                        search_term, "approved", limit=limit, offset=offset or 0,
+                        category=category),
+                    conditions=(search_term, category))
+                next_cursor = (offset or 0) + len(filtered_df)
+            else:
+                filtered_df, has_next, _ = self._load_page(
+                    "approved", lambda limit, after: self.db.get_fortunetellers(
+                        "approved", limit=limit, after=after, category=category),
+                    conditions=(None, category))
+                next_cursor = self.db.get_next_cursor(filtered_df)
 
             st.markdown(
-                f"**表示件数: {len(filtered_df)}件 / 全{len(approved_df)}件**")
+                f"**表示件数: {len(filtered_df)}件 / 全{approved_total}件**")
+
+            if not filtered_df.empty:
+                self._show_bulk_actions("approved", filtered_df, {
+                    "pending": "↩️ 承認待ちに戻す",
+                    "rejected": "❌ 一括却下",
+                    "delete": "🗑️ 一括削除",
+                })
 
-            for idx, row in filtered_df.iterrows():
+            for row in filtered_df.to_dict('records'):
                 with st.expander(f"✅ {row['name']} (ID: {row['id']}) - {row.get('category', '未設定')}"):
                     self._show_fortuneteller_details(row)
 
@@ -170,6 +295,8 @@ class AdminPage:
                                 'tab': 'approved'
                             }
                             st.rerun()
+
+            self._show_page_controls("approved", has_next, next_cursor)
         else:
             st.info("✅ 承認済みの投稿はありません")
 
@@ -183,15 +310,18 @@ class AdminPage:
             self._handle_permanent_delete_confirmation(permanent_delete_key)
             return
 
-        deleted_df = self.db.get_deleted_fortunetellers()
+        deleted_df, has_next, _ = self._load_page(
+            "deleted", lambda limit, after: self.db.get_deleted_fortunetellers(
+                limit=limit, after=after))
         if not deleted_df.empty:
-            st.warning(f"⚠️ 削除済みレコード: {len(deleted_df)}件")
+            st.warning(f"⚠️ 削除済みレコード: {self.db.get_statistics()['deleted']}件")
+            st.caption("完全削除の選択は表示中のページ内で行います")
 
             # チェックボックス用のセッション状態を初期化
             if 'selected_for_permanent_delete' not in st.session_state:
                 st.session_state.selected_for_permanent_delete = set()
 
-            # 無効なIDを削除
+            # 無効なID・表示中のページ以外のIDを削除
             valid_ids = set(deleted_df['id'].tolist())
             st.session_state.selected_for_permanent_delete = st.session_state.selected_for_permanent_delete.intersection(
                 valid_ids)
@@ -204,7 +334,7 @@ class AdminPage:
             col1, col2, col3, col4 = st.columns([2, 2, 3, 3])
 
             with col1:
-                if st.button("☑️ 全選択", key="select_all_deleted"):
+                if st.button("☑️ ページ内を全選択", key="select_all_deleted"):
                     try:
                         st.session_state.selected_for_permanent_delete = set(
                             deleted_df['id'].tolist())
@@ -274,7 +404,7 @@ class AdminPage:
                 # 一時的な選択状態を保持
                 temp_selection = set()
 
-                for idx, row in deleted_df.iterrows():
+                for row in deleted_df.to_dict('records'):
                     # 現在の選択状態
                     is_currently_selected = row['id'] in st.session_state.selected_for_permanent_delete
 
@@ -331,7 +461,7 @@ class AdminPage:
             st.markdown("---")
             st.markdown("### 🔍 詳細情報")
 
-            for idx, row in deleted_df.iterrows():
+            for row in deleted_df.to_dict('records'):
                 is_selected = row['id'] in st.session_state.selected_for_permanent_delete
 
                 # 静的なexpander（DOM競合を回避）
@@ -375,22 +505,30 @@ class AdminPage:
                     else:
                         st.info("復元ボタンは選択解除後に表示されます")
 
+            self._show_page_controls(
+                "deleted", has_next, self.db.get_next_cursor(deleted_df, "deleted_at"))
+
         else:
             st.info("🗑️ 削除済みの投稿はありません")
 
         # 削除ログ表示
         with st.expander("📜 削除ログを表示"):
             try:
-                logs_df = self.db.get_deletion_logs(20)
+                logs_df, logs_has_next, _ = self._load_page(
+                    "deletion_logs", lambda limit, after: self.db.get_deletion_logs(
+                        limit, after=after))
                 if not logs_df.empty:
                     st.markdown("**最近の削除・完全削除ログ**")
-                    for idx, log in logs_df.iterrows():
+                    for log in logs_df.to_dict('records'):
                         if "permanent" in str(log['table_name']):
                             st.error(
                                 f"💀 完全削除: {log['table_name']} ID:{log['record_id']} by {log['deleted_by']} ({log['deleted_at']})")
                         else:
                             st.info(
                                 f"🗑️ 論理削除: {log['table_name']} ID:{log['record_id']} by {log['deleted_by']} ({log['deleted_at']})")
+                    self._show_page_controls(
+                        "deletion_logs", logs_has_next,
+                        self.db.get_next_cursor(logs_df, "deleted_at"))
                 else:
                     st.info("削除ログはありません")
             except Exception as e:
@@ -536,8 +674,8 @@ class AdminPage:
         """占い師詳細情報表示（共通関数）"""
         # 基本情報
         st.write(f"**🎴 カテゴリ**: {row.get('category', '未設定')}")
-        st.write(f"**📝 説明**: {row.get('description', '説明なし')}")
-        st.write(f"**📞 連絡先**: {row.get('contact', '未登録')}")
+        st.write(f"**📝 説明**: {row.get('description') or '説明なし'}")
+        st.write(f"**📞 連絡先**: {row.get('contact') or '未登録'}")
         st.write(f"**👤 投稿者**: {row.get('submitted_by', '不明')}")
         st.write(f"**📅 投稿日時**: {row['created_at']}")
 
@@ -664,9 +802,11 @@ class AdminPage:
         st.subheader("💼 お仕事依頼一覧")
 
         try:
-            requests_df = self.db.get_work_requests()
+            requests_df, has_next, _ = self._load_page(
+                "work_requests", lambda limit, after: self.db.get_work_requests(
+                    limit=limit, after=after))
             if not requests_df.empty:
-                st.info(f"📧 受信件数: {len(requests_df)}件")
+                st.info(f"📧 受信件数: {self.db.count_work_requests()}件")
 
                 # フォームベースの削除システム
                 with st.form("work_request_management_form", clear_on_submit=False):
@@ -677,7 +817,7 @@ class AdminPage:
                     # 削除対象を選択
                     selected_for_deletion = []
 
-                    for idx, row in requests_df.iterrows():
+                    for row in requests_df.to_dict('records'):
                         # チェックボックスで削除対象を選択
                         delete_this = st.checkbox(
                             f"📧 {row['subject']} - {row['client_name']} ({row['created_at'][:19]})",
@@ -773,11 +913,140 @@ class AdminPage:
                     st.info("✅ 表示を更新しました")
                     st.rerun()
 
+                self._show_page_controls(
+                    "work_requests", has_next, self.db.get_next_cursor(requests_df))
+
             else:
                 st.info("💼 お仕事依頼はありません")
         except Exception as e:
             st.error(f"❌ 依頼一覧の取得エラー: {str(e)}")
 
+    def _show_data_management(self):
+        """データ管理（CSV・JSONLの一括インポート、CSV・GeoJSON・Parquetのエクスポート）"""
+        st.subheader("📦 データ管理")
+
+        st.markdown("### 📥 一括インポート")
+        st.caption("CSVまたはJSONL（1行1件）。必須列: name, latitude, longitude / "
+                   "任意列: description, contact, website, category, submitted_by, zipcode, address")
+
+        uploaded_file = st.file_uploader(
+            "インポートするファイル", type=["csv", "jsonl", "ndjson"], key="import_file")
+        status_label = st.radio(
+            "登録時のステータス", ["承認待ち", "承認済み"], horizontal=True, key="import_status")
+
+        if uploaded_file is not None and st.button("📥 インポート実行", type="primary"):
+            from importer import detect_format, import_fortunetellers
+
+            progress_text = st.empty()
+            with st.spinner("インポート中..."):
+                result = import_fortunetellers(
+                    self.db, uploaded_file, detect_format(uploaded_file.name),
+                    status="approved" if status_label == "承認済み" else "pending",
+                    progress=lambda read, imported: progress_text.caption(
+                        f"{read:,}行読み込み / {imported:,}件登録"))
+            st.session_state.import_result = result
+
+        result = st.session_state.get('import_result')
+        if result:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("登録", f"{result['imported_count']:,}件")
+            with col2:
+                st.metric("却下", f"{result['rejected_count']:,}件")
+            with col3:
+                st.metric("処理時間", f"{result['elapsed']:.1f}秒")
+
+            for error in result['errors']:
+                st.error(f"❌ {error}")
+
+            if result['rejected_count']:
+                st.warning("⚠️ 却下した行（row はデータ行の番号）")
+                st.dataframe(result['rejected'][['row', 'reason']].head(100), hide_index=True)
+                st.download_button(
+                    "📝 却下した行をダウンロード（CSV）",
+                    result['rejected'].to_csv(index=False).encode("utf-8-sig"),
+                    file_name="rejected_rows.csv", mime="text/csv")
+
+        st.markdown("---")
+        self._show_export()
+
+    def _show_export(self):
+        """エクスポート（条件を指定してファイルを作成し、ダウンロード）"""
+        import os
+        import tempfile
+        import exporter
+
+        st.markdown("### 📤 エクスポート")
+        tables = {"占い師": "fortunetellers", "お仕事依頼": "work_requests", "削除ログ": "deletion_logs"}
+        table = tables[st.selectbox("対象", list(tables), key="export_table")]
+
+        filters = {}
+        if table == "fortunetellers":
+            col1, col2 = st.columns(2)
+            with col1:
+                statuses = {"すべて": "all", "承認済み": "approved", "承認待ち": "pending", "却下": "rejected"}
+                filters['status'] = statuses[st.selectbox("ステータス", list(statuses), key="export_status")]
+            with col2:
+                category = st.selectbox(
+                    "カテゴリ", ["すべて"] + config.FORTUNE_CATEGORIES, key="export_category")
+                filters['category'] = None if category == "すべて" else category
+        col1, col2 = st.columns(2)
+        with col1:
+            filters['date_from'] = st.date_input("開始日", value=None, key="export_date_from")
+        with col2:
+            filters['date_to'] = st.date_input("終了日", value=None, key="export_date_to")
+        if table != "deletion_logs":
+            filters['include_deleted'] = st.checkbox("論理削除済みも含める", key="export_include_deleted")
+
+        # 一定件数ずつ一時ファイルへ書き出す（DataFrameに全件を読み込まない）
+        formats = exporter.available_formats(table)
+        for col, file_format in zip(st.columns(len(formats)), formats):
+            with col:
+                if st.button(f"📦 {file_format.upper()}を作成", key=f"export_{file_format}"):
+                    previous = st.session_state.pop('export_file', None)
+                    if previous and os.path.exists(previous['path']):
+                        os.remove(previous['path'])
+                    output = None
+                    try:
+                        with st.spinner("書き出し中..."):
+                            with tempfile.NamedTemporaryFile(
+                                    "wb", prefix="fortuneteller_export_",
+                                    suffix=f".{exporter.FILE_EXTENSIONS[file_format]}",
+                                    delete=False) as output:
+                                for chunk in exporter.export_table(self.db, table, file_format, **filters):
+                                    output.write(chunk)
+                        st.session_state.export_file = {
+                            'path': output.name,
+                            'name': f"{table}.{exporter.FILE_EXTENSIONS[file_format]}",
+                            'mime': exporter.MIME_TYPES[file_format],
+                            'table': table,
+                            'format': file_format,
+                        }
+                    except Exception as e:
+                        # 書きかけの一時ファイルを残さない
+                        if output is not None and os.path.exists(output.name):
+                            os.remove(output.name)
+                        st.error(f"❌ エクスポートエラー: {str(e)}")
+        if "parquet" not in formats:
+            st.caption("Parquet形式には pyarrow のインストールが必要です")
+
+        export_file = st.session_state.get('export_file')
+        if export_file and os.path.exists(export_file['path']):
+            size = os.path.getsize(export_file['path'])
+            # download_button はファイル全体をメモリに読み込むため、大きなファイルはCLIで書き出す
+            if size > config.EXPORT_DOWNLOAD_MAX_BYTES:
+                st.warning(
+                    f"⚠️ {export_file['name']}（{size:,}バイト）は画面からダウンロードできる上限"
+                    f"（{config.EXPORT_DOWNLOAD_MAX_BYTES:,}バイト）を超えています。"
+                    f"`python exporter.py {export_file['table']} --format {export_file['format']}"
+                    f" -o ファイル名` で書き出してください")
+            else:
+                with open(export_file['path'], "rb") as file:
+                    st.download_button(
+                        f"⬇️ {export_file['name']} をダウンロード（{size:,}バイト）",
+                        file, file_name=export_file['name'], mime=export_file['mime'],
+                        key="export_download")
+
     def _show_statistics(self):
         """統計表示（削除件数追加版）"""
         st.subheader("📊 統計情報")
@@ -812,13 +1081,33 @@ class AdminPage:
                     st.write(
                         f"**削除率**: {stats['deleted']/total_records*100:.1f}%")
 
-                # 最近の活動
-                recent_df = self.db.get_fortunetellers("all")
-                if not recent_df.empty:
-                    recent_counts = recent_df['created_at'].str[:10].value_counts().head(
-                        7)
+                # 最近の活動（登録日時はUTCで保存されている）
+                since = (datetime.now(timezone.utc).date() - timedelta(days=6)).isoformat()
+                recent_counts = self.db.get_daily_registrations(since)
+                if not recent_counts.empty:
                     st.markdown("**📅 最近7日間の登録件数**")
-                    st.bar_chart(recent_counts)
+                    st.bar_chart(recent_counts.set_index('date'))
+
+            # 集計テーブルの点検・修復
+            with st.expander("🧮 集計テーブルの点検"):
+                st.caption("件数はトリガーで更新される集計テーブルから表示しています")
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("🔍 実データと突き合わせ", key="check_statistics"):
+                        result = self.db.check_statistics()
+                        if result['consistent']:
+                            st.success("✅ 集計テーブルは実データと一致しています")
+                        else:
+                            st.warning(f"⚠️ {len(result['differences'])}件の食い違いがあります")
+                            st.dataframe(pd.DataFrame(
+                                result['differences'],
+                                columns=['種類', 'キー', '集計テーブル', '実データ']))
+                with col2:
+                    if st.button("🔧 集計テーブルを再構築", key="rebuild_statistics"):
+                        if self.db.rebuild_statistics():
+                            st.success("✅ 再構築しました（画面を再読み込みすると件数に反映されます）")
+                        else:
+                            st.error("❌ 再構築に失敗しました")
 
         except Exception as e:
             st.error(f"❌ 統計情報の取得エラー: {str(e)}")
@@ -0,0 +1,172 @@
+"""
+空間インデックス - 地図クリック・近隣検索用の最近傍探索
+緯度経度を単位球面上の3次元ベクトルに変換してKD木を作り、大圏距離（km）で検索する
+"""
+import heapq
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """2点間の大圏距離（km）を計算（numpy配列どうし・配列とスカラーにも対応）"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 \
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _to_unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """緯度経度を単位球面上の (x, y, z) に変換"""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lng = np.radians(np.asarray(longitudes, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)])
+
+
+def _km_to_chord(distance_km: float) -> float:
+    """大圏距離を単位球の弦の長さに変換"""
+    return 2 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def _chord_to_km(chord):
+    """単位球の弦の長さを大圏距離（km）に変換"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+class SpatialIndex:
+    """単位球面ベクトルのKD木（k近傍・半径検索）
+
+    弦の長さは大圏距離に対して単調なので、3次元のユークリッド距離で枝刈りしても
+    大圏距離での結果と一致する。各ノードは担当範囲の外接箱を持ち、
+    クエリ点から箱までの距離が現在の候補より遠いノードは調べない。
+    """
+
+    def __init__(self, ids, latitudes, longitudes, leaf_size: int = 32):
+        self.ids = np.asarray(ids)
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.leaf_size = leaf_size
+
+        points = _to_unit_vectors(self.latitudes, self.longitudes)
+        self._order = np.arange(len(self.ids))
+        # ノードごとの [開始, 終了, 左の子, 右の子]（葉は子が -1）と外接箱
+        self._nodes: List[List[int]] = []
+        self._lower: List[np.ndarray] = []
+        self._upper: List[np.ndarray] = []
+        if len(self.ids):
+            self._build(points, 0, len(self.ids))
+        # 葉の中の点を連続した配列で持つ（検索時のコピーを避ける）
+        self._points = points[self._order]
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, **kwargs) -> "SpatialIndex":
+        """id・latitude・longitude 列を持つDataFrameから作成"""
+        if df.empty:
+            return cls([], [], [], **kwargs)
+        return cls(df['id'].to_numpy(), df['latitude'].to_numpy(),
+                   df['longitude'].to_numpy(), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _build(self, points: np.ndarray, start: int, end: int) -> int:
+        """[start, end) の点でノードを作り、ノード番号を返す"""
+        node_points = points[self._order[start:end]]
+        node = len(self._nodes)
+        self._nodes.append([start, end, -1, -1])
+        self._lower.append(node_points.min(axis=0))
+        self._upper.append(node_points.max(axis=0))
+
+        if end - start > self.leaf_size:
+            # 広がりの最も大きい軸の中央値で2分割
+            axis = int(np.argmax(self._upper[node] - self._lower[node]))
+            mid = (end - start) // 2
+            partition = np.argpartition(node_points[:, axis], mid)
+            self._order[start:end] = self._order[start:end][partition]
+            self._nodes[node][2] = self._build(points, start, start + mid)
+            self._nodes[node][3] = self._build(points, start + mid, end)
+        return node
+
+    def _box_distance2(self, node: int, query: np.ndarray) -> float:
+        """クエリ点からノードの外接箱までの距離の2乗"""
+        gap = np.maximum(self._lower[node] - query, 0) + np.maximum(query - self._upper[node], 0)
+        return float(gap @ gap)
+
+    def _leaf_distance2(self, node: int, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """葉の中の点（並び替え後の位置）と距離の2乗"""
+        start, end = self._nodes[node][0], self._nodes[node][1]
+        diff = self._points[start:end] - query
+        return np.arange(start, end), np.einsum('ij,ij->i', diff, diff)
+
+    def _result(self, positions, distance2, max_results: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(ID, 距離km) の近い順リストに変換"""
+        positions = np.asarray(positions, dtype=np.int64)
+        distance2 = np.asarray(distance2, dtype=float)
+        order = np.argsort(distance2, kind='stable')[:max_results]
+        distances = _chord_to_km(np.sqrt(distance2[order]))
+        ids = self.ids[self._order[positions[order]]].tolist()
+        return list(zip(ids, distances.tolist()))
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1,
+                max_distance_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """近い順にk件の (ID, 距離km) を返す（max_distance_km より遠いものは除外）"""
+        if not len(self) or k <= 0:
+            return []
+        query = _to_unit_vectors([latitude], [longitude])[0]
+        limit2 = _km_to_chord(max_distance_km) ** 2 if max_distance_km is not None else math.inf
+
+        # best: 距離の2乗の符号を反転した最大ヒープ（k件目が先頭）
+        best: List[Tuple[float, int]] = []
+        queue = [(self._box_distance2(0, query), 0)]
+        while queue:
+            box2, node = heapq.heappop(queue)
+            bound2 = -best[0][0] if len(best) == k else limit2
+            if box2 > bound2:
+                break  # 残りのノードはすべてこれより遠い
+            start, end, left, right = self._nodes[node]
+            if left < 0:
+                positions, distance2 = self._leaf_distance2(node, query)
+                for position, d2 in zip(positions.tolist(), distance2.tolist()):
+                    if d2 > limit2:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d2, position))
+                    elif d2 < -best[0][0]:
+                        heapq.heapreplace(best, (-d2, position))
+            else:
+                for child in (left, right):
+                    heapq.heappush(queue, (self._box_distance2(child, query), child))
+
+        return self._result([p for _, p in best], [-d for d, _ in best])
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float,
+                      limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """半径 radius_km 以内の (ID, 距離km) を近い順に返す"""
+        if not len(self) or radius_km < 0:
+            return []
+        query = _to_unit_vectors([latitude], [longitude])[0]
+        radius2 = _km_to_chord(radius_km) ** 2
+
+        positions, distances2 = [], []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_distance2(node, query) > radius2:
+                continue
+            start, end, left, right = self._nodes[node]
+            if left < 0:
+                leaf_positions, leaf_distance2 = self._leaf_distance2(node, query)
+                inside = leaf_distance2 <= radius2
+                positions.append(leaf_positions[inside])
+                distances2.append(leaf_distance2[inside])
+            else:
+                stack.extend((left, right))
+
+        if not positions:
+            return []
+        return self._result(np.concatenate(positions), np.concatenate(distances2), limit)
@@ -0,0 +1,246 @@
+"""
+地図クラスターのインデックス - ズームレベルごとの事前集計
+承認済み占い師をWebメルカトル上のグリッドに集計し、低ズームではクラスター（重心と件数）だけを地図に載せる
+"""
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# (south, west, north, east) の矩形
+Bounds = Tuple[float, float, float, float]
+
+# Webメルカトルで表現できる緯度の上限
+MAX_LATITUDE = 85.05112878
+
+
+def _project(latitude, longitude):
+    """緯度経度をWebメルカトルの [0, 1) 座標に変換（numpy配列・スカラー両対応）"""
+    latitude = np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE)
+    sin = np.sin(np.radians(latitude))
+    x = (np.asarray(longitude) + 180.0) / 360.0
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return np.clip(x, 0.0, 1.0 - 1e-12), np.clip(y, 0.0, 1.0 - 1e-12)
+
+
+class ClusterIndex:
+    """ズームレベル別のクラスター集計
+
+    ズームzのセルは一辺 radius_px ピクセル相当で、世界全体を 256 * 2^z / radius_px 分割する。
+    分割数がズームごとに2倍になるため、ズームzのセルはズームz+1の2×2セルをちょうど含む。
+    各セルは [件数, 緯度の合計, 経度の合計, IDのXOR] を持つだけなので、
+    1件の追加・削除はレベル数ぶんの加減算で済む（件数1のセルではXORがそのままIDになる）。
+    """
+
+    def __init__(self, min_zoom: int = config.DEFAULT_ZOOM_LEVEL,
+                 max_zoom: int = config.MAP_CLUSTER_MAX_ZOOM,
+                 radius_px: int = config.MAP_CLUSTER_RADIUS_PX):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom  # このズーム以上はクラスター化しない
+        self.radius_px = radius_px
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._levels: Dict[int, Dict[int, list]] = {
+            zoom: {} for zoom in self.zooms
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def zooms(self) -> range:
+        """集計するズームレベル"""
+        return range(self.min_zoom, self.max_zoom)
+
+    def _cells_per_side(self, zoom: int) -> float:
+        """ズームzでの一辺あたりのセル数"""
+        return 256 * (2 ** zoom) / self.radius_px
+
+    def _cell_key(self, zoom: int, cx, cy):
+        """セル座標 (cx, cy) を1つの整数キーにする（numpy配列にも使える）"""
+        return cx * (int(self._cells_per_side(zoom)) + 1) + cy
+
+    def _cell(self, zoom: int, latitude: float, longitude: float) -> int:
+        """1点が属するセルのキー"""
+        x, y = _project(latitude, longitude)
+        scale = self._cells_per_side(zoom)
+        return self._cell_key(zoom, int(x * scale), int(y * scale))
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def load(self, locations: pd.DataFrame):
+        """id・latitude・longitude の一覧から全レベルを作り直す"""
+        ids = locations['id'].to_numpy(dtype=np.int64)
+        latitudes = locations['latitude'].to_numpy(dtype=float)
+        longitudes = locations['longitude'].to_numpy(dtype=float)
+        x, y = _project(latitudes, longitudes)
+
+        levels = {}
+        for zoom in self.zooms:
+            scale = self._cells_per_side(zoom)
+            cx = (x * scale).astype(np.int64)
+            cy = (y * scale).astype(np.int64)
+            keys, inverse = np.unique(self._cell_key(zoom, cx, cy), return_inverse=True)
+            counts = np.bincount(inverse)
+            lat_sums = np.bincount(inverse, weights=latitudes)
+            lng_sums = np.bincount(inverse, weights=longitudes)
+            id_xors = np.zeros(len(keys), dtype=np.int64)
+            np.bitwise_xor.at(id_xors, inverse, ids)
+            levels[zoom] = {
+                key: list(entry) for key, *entry in zip(
+                    keys.tolist(), counts.tolist(), lat_sums.tolist(),
+                    lng_sums.tolist(), id_xors.tolist())
+            }
+
+        with self._lock:
+            self._points = dict(zip(ids.tolist(), zip(latitudes.tolist(), longitudes.tolist())))
+            self._levels = levels
+
+    def _apply(self, fortuneteller_id: int, latitude: float, longitude: float, sign: int):
+        """1点ぶんを全レベルに加算（sign=1）または減算（sign=-1）"""
+        for zoom in self.zooms:
+            level = self._levels[zoom]
+            key = self._cell(zoom, latitude, longitude)
+            entry = level.setdefault(key, [0, 0.0, 0.0, 0])
+            entry[0] += sign
+            entry[1] += sign * latitude
+            entry[2] += sign * longitude
+            entry[3] ^= fortuneteller_id
+            if entry[0] <= 0:
+                del level[key]
+
+    def upsert(self, fortuneteller_id: int, latitude: float, longitude: float):
+        """1点を追加（既にあれば位置を更新）"""
+        with self._lock:
+            previous = self._points.pop(fortuneteller_id, None)
+            if previous is not None:
+                self._apply(fortuneteller_id, previous[0], previous[1], -1)
+            self._points[fortuneteller_id] = (latitude, longitude)
+            self._apply(fortuneteller_id, latitude, longitude, 1)
+
+    def remove(self, fortuneteller_id: int):
+        """1点を削除（無ければ何もしない）"""
+        with self._lock:
+            previous = self._points.pop(fortuneteller_id, None)
+            if previous is not None:
+                self._apply(fortuneteller_id, previous[0], previous[1], -1)
+
+    def get_clusters(self, bounds: Bounds, zoom: int) -> Optional[List[dict]]:
+        """表示範囲内のクラスターを取得（クラスター化しないズームではNone）
+
+        件数1のセルは {'id': 占い師ID, 'count': 1} として返し、通常のマーカーで表示する。
+        """
+        zoom = int(zoom)
+        if zoom >= self.max_zoom:
+            return None
+        zoom = max(zoom, self.min_zoom)
+
+        south, west, north, east = bounds
+        west_x, north_y = _project(north, west)
+        east_x, south_y = _project(south, east)
+        scale = self._cells_per_side(zoom)
+        min_cx, max_cx = int(west_x * scale), int(east_x * scale)
+        min_cy, max_cy = int(north_y * scale), int(south_y * scale)
+
+        with self._lock:
+            level = self._levels[zoom]
+            # 範囲内のセル数がセルの総数より多ければ全件を走査した方が速い
+            span = (max_cx - min_cx + 1) * (max_cy - min_cy + 1)
+            if span > len(level):
+                side = int(scale) + 1
+                cells = [entry for key, entry in level.items()
+                         if min_cx <= key // side <= max_cx and min_cy <= key % side <= max_cy]
+            else:
+                keys = (self._cell_key(zoom, cx, cy)
+                        for cx in range(min_cx, max_cx + 1)
+                        for cy in range(min_cy, max_cy + 1))
+                cells = [level[key] for key in keys if key in level]
+
+            clusters = []
+            for count, lat_sum, lng_sum, id_xor in cells:
+                if count == 1:
+                    clusters.append({'id': id_xor, 'count': 1})
+                else:
+                    clusters.append({
+                        'latitude': lat_sum / count,
+                        'longitude': lng_sum / count,
+                        'count': count,
+                    })
+        return clusters
+
+
+class FortunetellerClusterIndex(ClusterIndex):
+    """DatabaseManagerと連動するクラスターインデックス（承認・削除・復元で差分更新）
+
+    同じプロセスの書き込みは変更通知で差分更新する。通知のない変更（他のプロセスの
+    インポートなど）は地図に出る位置のリビジョンで検出し、get_cluster_index で全件読み直す。
+    承認待ちの投稿や設定の変更など、地図に出る位置が変わらない書き込みでは読み直さない。
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db
+        self.revision = None  # 反映済みの地図に出る位置のリビジョン
+        self._reload_lock = threading.Lock()
+        self.reload()
+        db.add_change_listener(self.refresh)
+
+    def reload(self):
+        """承認済みの占い師を全件読み直す"""
+        with self._reload_lock:
+            # 読み込み前のリビジョンを記録し、読み込み中の書き込みは次回に反映する
+            revision = self.db.get_revision_details()['locations_revision']
+            self.load(self.db.get_fortuneteller_locations())
+            self.revision = revision
+
+    def is_stale(self) -> bool:
+        """反映していない地図に出る位置の変更があるか"""
+        return self.db.get_locations_revision() > self.revision
+
+    def refresh(self, fortuneteller_ids: list):
+        """指定IDの承認状態をDBから読み直して反映"""
+        revisions = self.db.get_revision_details()
+        locations = self.db.get_fortuneteller_locations(fortuneteller_ids=fortuneteller_ids)
+        visible = set()
+        for row in locations.itertuples(index=False):
+            self.upsert(int(row.id), float(row.latitude), float(row.longitude))
+            visible.add(int(row.id))
+        for fortuneteller_id in fortuneteller_ids:
+            if int(fortuneteller_id) not in visible:
+                self.remove(int(fortuneteller_id))
+
+        # 最後の書き込みが地図に出る位置の反映済みの次の変更なら、変わったのは通知された
+        # 書き込みだけ（それ以外の変更が挟まっていれば記録を進めず、次回に全件読み直す）
+        with self._reload_lock:
+            if (self.revision is not None
+                    and revisions['locations_previous'] == self.revision
+                    and revisions['locations_revision'] == revisions['revision']):
+                self.revision = revisions['locations_revision']
+
+
+_indexes: Dict[str, FortunetellerClusterIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_cluster_index(db) -> FortunetellerClusterIndex:
+    """DBごとに共通のクラスターインデックスを取得（初回呼び出し時に構築）
+
+    通知のない書き込みで地図に出る位置が変わっていれば全件読み直してから返す。
+    """
+    index = _indexes.get(db.db_path)
+    if index is None or index.db is not db:
+        with _indexes_lock:
+            index = _indexes.get(db.db_path)
+            if index is None or index.db is not db:
+                index = FortunetellerClusterIndex(db)
+                _indexes[db.db_path] = index
+                return index
+
+    if index.is_stale():
+        with _indexes_lock:
+            # 待っている間に他のセッションが読み直していれば何もしない
+            if index.is_stale():
+                index.reload()
+    return index
@@ -136,8 +136,8 @@ class UIManager:
         st.markdown("### 📊 サイト情報")
 
         try:
-            from database import DatabaseManager
-            db = DatabaseManager()
+            from database import get_database_manager
+            db = get_database_manager()
             stats = db.get_statistics()
 
             # シンプルな文字表示のみ
@@ -217,20 +217,19 @@ class UIManager:
         st.caption("クリックで詳細パネル表示")
 
         try:
-            from database import DatabaseManager
-            db = DatabaseManager()
-            recent_df = db.get_fortunetellers("approved")
+            from database import get_database_manager
+            db = get_database_manager()
+            recent_rows = db.get_fortuneteller_records("approved", limit=5)  # デスクトップ版は5件表示
 
-            if not recent_df.empty:
-                recent_df = recent_df.head(5)  # デスクトップ版は5件表示
+            if recent_rows:
 
-                for idx, row in recent_df.iterrows():
+                for idx, row in enumerate(recent_rows):
                     current_selected = st.session_state.get(
                         'selected_fortuneteller')
-                    is_selected = (current_selected == row['id'])
+                    is_selected = (current_selected == row.id)
 
-                    button_key = f"info_{row['id']}_{idx}_desktop"
-                    button_text = f"{'✅' if is_selected else '🔮'} {row['name']} - {row.get('category', '未設定')}"
+                    button_key = f"info_{row.id}_{idx}_desktop"
+                    button_text = f"{'✅' if is_selected else '🔮'} {row.name} - {row.category or '未設定'}"
 
                     if st.button(
                         button_text,
@@ -238,7 +237,7 @@ class UIManager:
                         use_container_width=True,
                         type="primary" if is_selected else "secondary"
                     ):
-                        UIManager._handle_fortuneteller_selection(row['id'])
+                        UIManager._handle_fortuneteller_selection(row.id)
             else:
                 st.info("新着情報がありません")
         except Exception as e:
@@ -250,8 +249,8 @@ class UIManager:
         st.markdown("### 📰 お知らせ")
 
         try:
-            from database import DatabaseManager
-            db = DatabaseManager()
+            from database import get_database_manager
+            db = get_database_manager()
             announcements_json = db.get_setting('announcements')
 
             if announcements_json:
@@ -292,13 +291,13 @@ class UIManager:
         st.markdown("### 🎴 占術カテゴリ")
 
         try:
-            from database import DatabaseManager
-            db = DatabaseManager()
+            from database import get_database_manager
+            db = get_database_manager()
             stats = db.get_statistics()
 
             if not stats['categories'].empty:
-                for idx, row in stats['categories'].iterrows():
-                    st.markdown(f"• {row['category']}: {row['count']}件")
+                for category, count in zip(stats['categories']['category'], stats['categories']['count']):
+                    st.markdown(f"• {category}: {count}件")
             else:
                 st.info("カテゴリ統計を準備中...")
         except Exception as e:
@@ -2,11 +2,35 @@
 地図管理クラス - カテゴリ別アイコン付きクラスタリング機能（紫色統一版）
 各占術カテゴリごとに最適なアイコンを表示、色は紫色で統一
 """
+import json
+import math
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 import folium
-from folium.plugins import MarkerCluster
+from folium.plugins import FastMarkerCluster, LocateControl, MarkerCluster
 import pandas as pd
-from typing import Optional
+from typing import Hashable, Optional, Tuple
 import config
+from cache import RevisionCache
+
+# 古いstreamlit-foliumには無い（その場合は初回の描画結果だけが2回目以降と少し異なる）
+try:
+    from streamlit_folium import generate_leaflet_string
+except ImportError:
+    generate_leaflet_string = None
+
+# (south, west, north, east) の矩形
+Bounds = Tuple[float, float, float, float]
+
+
+class BaseMap:
+    """全セッションで共有するベース地図（選択・ハイライトのマーカーを含まない）"""
+
+    def __init__(self, map_obj: folium.Map):
+        self.map = map_obj
+        # st_foliumは描画のたびに地図へ要素を書き足すため、同じ地図の描画は1つずつ行う
+        self.lock = threading.Lock()
 
 
 class MapManager:
@@ -28,23 +52,128 @@ class MapManager:
         "その他": "question-circle"     # ❓ 未分類
     }
 
+    # 占術カテゴリ別の絵文字（ツールチップ・ポップアップ用）
+    CATEGORY_EMOJIS = {
+        "タロット": "🎴",
+        "手相": "✋",
+        "占星術": "⭐",
+        "四柱推命": "☯️",
+        "姓名判断": "📝",
+        "風水": "🧭",
+        "水晶玉": "🔮",
+        "霊視": "👁️",
+        "数秘術": "🔢",
+        "易経": "📖",
+        "ルーン": "🗿",
+        "その他": "❓"
+    }
+
+    # ブラウザ側クラスターのアイコン（紫色統一）
+    CLUSTER_ICON_FUNCTION = """
+    function(cluster) {
+        var childCount = cluster.getChildCount();
+        var c = ' marker-cluster-';
+        if (childCount < 10) {
+            c += 'small';
+        } else if (childCount < 100) {
+            c += 'medium';
+        } else {
+            c += 'large';
+        }
+
+        return new L.DivIcon({
+            html: '<div><span>🔮<br>' + childCount + '</span></div>',
+            className: 'marker-cluster' + c,
+            iconSize: new L.Point(50, 50),
+            iconAnchor: [25, 25]
+        });
+    }
+    """
+
+    # ツールチップ・ポップアップHTMLのキャッシュ（キーは (ID, 更新日時)、古いものから破棄）
+    _marker_content_cache: "OrderedDict[tuple, Tuple[str, str]]" = OrderedDict()
+    _marker_content_lock = threading.Lock()
+
+    CLUSTER_OPTIONS = {
+        'showCoverageOnHover': True,
+        'zoomToBoundsOnClick': True,
+        'spiderfyOnMaxZoom': True,
+        'removeOutsideVisibleBounds': True,
+        'disableClusteringAtZoom': config.MAP_CLUSTER_MAX_ZOOM  # ズーム15以上では個別マーカー表示
+    }
+
+    # 軽量表示モードのマーカー生成（全マーカー共通のテンプレート）
+    # 1件は [緯度, 経度, ID, カテゴリ番号] の配列で、カテゴリ番号は config.FORTUNE_CATEGORIES の並び
+    COMPACT_MARKER_CALLBACK = """
+    (function () {
+        var categories = %s;
+        var icons = categories.map(function (category) {
+            return L.AwesomeMarkers.icon({icon: category[0], markerColor: 'purple', prefix: 'fa'});
+        });
+        var tooltips = categories.map(function (category) {
+            return '<div style="background-color: rgba(139, 79, 159, 0.95); color: white; '
+                + 'padding: 8px 12px; border-radius: 10px; font-family: sans-serif;">'
+                + '<b>' + category[1] + ' ' + category[2] + '</b><br>'
+                + '<span style="font-size: 11px; color: #e0e0e0;">クリックで詳細パネル表示</span></div>';
+        });
+        return function (row) {
+            var category = row[3];
+            var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icons[category]});
+            marker.bindTooltip(tooltips[category], {sticky: true});
+            return marker;
+        };
+    })()
+    """
+
+    # 作成済みのベース地図（データのリビジョンと表示範囲ごと、全セッション共通）
+    _base_map_cache = RevisionCache(max_entries=config.MAP_BASE_CACHE_SIZE,
+                                    serve_stale=config.MAP_BASE_SERVE_STALE)
+
     @staticmethod
     def create_map(fortunetellers_df: pd.DataFrame,
                    highlight_id: Optional[int] = None,
-                   selected_id: Optional[int] = None) -> folium.Map:
-        """地図を作成（カテゴリ別アイコン・紫色統一版）"""
-        center_lat = config.DEFAULT_CENTER_LAT
-        center_lon = config.DEFAULT_CENTER_LON
-        zoom_level = config.DEFAULT_ZOOM_LEVEL
+                   selected_id: Optional[int] = None,
+                   center: Optional[Tuple[float, float]] = None,
+                   zoom: Optional[int] = None,
+                   clusters: Optional[list] = None,
+                   compact: Optional[bool] = None) -> folium.Map:
+        """地図を作成（カテゴリ別アイコン・紫色統一版）
+
+        center/zoom を渡すと、選択中の占い師がいない場合にその位置で地図を開く
+        （表示範囲連動モードで利用者の表示位置を保つため）。
+        clusters を渡すと、サーバー側で集計済みのクラスター（重心と件数）を描画し、
+        fortunetellers_df は個別表示する占い師（件数1のセル・選択中）だけとみなす。
+        compact=True（None なら件数で自動判定）では通常マーカーを軽量表示にし、
+        ツールチップ・ポップアップのHTMLを1件ずつ埋め込まない。
+        """
+        # 特別なマーカー（選択・ハイライト）は通常マーカーから除いて個別に追加
+        special_ids = {i for i in (selected_id, highlight_id) if i}
+        is_special = fortunetellers_df['id'].isin(special_ids) \
+            if not fortunetellers_df.empty else pd.Series(dtype=bool)
+        normal_df = fortunetellers_df[~is_special] if special_ids else fortunetellers_df
 
         # ハイライトまたは選択された占い師がある場合、その位置を中心にする
-        if (highlight_id or selected_id) and not fortunetellers_df.empty:
-            target_id = selected_id if selected_id else highlight_id
-            target_row = fortunetellers_df[fortunetellers_df['id'] == target_id]
-            if not target_row.empty:
-                center_lat = target_row.iloc[0]['latitude']
-                center_lon = target_row.iloc[0]['longitude']
-                zoom_level = config.DETAIL_ZOOM_LEVEL
+        view = MapManager.get_selection_view(fortunetellers_df, selected_id, highlight_id)
+        if view:
+            center, zoom = view
+
+        m = MapManager.create_base_map(normal_df, center, zoom, clusters, compact)
+        selection_layer = MapManager.create_selection_layer(
+            fortunetellers_df, selected_id, highlight_id)
+        if selection_layer is not None:
+            selection_layer.add_to(m)
+        return m
+
+    @staticmethod
+    def create_base_map(fortunetellers_df: pd.DataFrame,
+                        center: Optional[Tuple[float, float]] = None,
+                        zoom: Optional[int] = None,
+                        clusters: Optional[list] = None,
+                        compact: Optional[bool] = None) -> folium.Map:
+        """選択・ハイライトを含まない地図を作成（引数は create_map と同じ）"""
+        center_lat, center_lon = center if center else (
+            config.DEFAULT_CENTER_LAT, config.DEFAULT_CENTER_LON)
+        zoom_level = zoom if zoom is not None else config.DEFAULT_ZOOM_LEVEL
 
         # 地図を作成
         m = folium.Map(
@@ -53,104 +182,285 @@ class MapManager:
             tiles='OpenStreetMap'
         )
 
-        if not fortunetellers_df.empty:
-            # 占いテーマのクラスター設定（紫色統一）
-            marker_cluster = MarkerCluster(
-                name='占い師クラスター',
-                overlay=True,
-                control=True,
-                icon_create_function="""
-                function(cluster) {
-                    var childCount = cluster.getChildCount();
-                    var c = ' marker-cluster-';
-                    if (childCount < 10) {
-                        c += 'small';
-                    } else if (childCount < 100) {
-                        c += 'medium';
-                    } else {
-                        c += 'large';
-                    }
-                    
-                    return new L.DivIcon({ 
-                        html: '<div><span>🔮<br>' + childCount + '</span></div>', 
-                        className: 'marker-cluster' + c, 
-                        iconSize: new L.Point(50, 50),
-                        iconAnchor: [25, 25]
-                    });
-                }
-                """,
-                options={
-                    'showCoverageOnHover': True,
-                    'zoomToBoundsOnClick': True,
-                    'spiderfyOnMaxZoom': True,
-                    'removeOutsideVisibleBounds': True,
-                    'disableClusteringAtZoom': 15  # ズーム15以上では個別マーカー表示
-                }
-            )
-
-            # 特別なマーカー（選択・ハイライト）は個別に追加
-            special_ids = set()
-            if selected_id:
-                special_ids.add(selected_id)
-            if highlight_id:
-                special_ids.add(highlight_id)
-
-            # 通常マーカーをクラスターに追加
-            for idx, row in fortunetellers_df.iterrows():
-                if row['id'] in special_ids:
-                    continue  # 特別なマーカーは後で個別に追加
-
-                # 通常マーカーの作成（紫色統一）
-                marker = MapManager._create_normal_marker(row)
-                marker_cluster.add_child(marker)
+        # 現在地ボタン（ブラウザの位置情報で地図を移動）
+        LocateControl(
+            position='topleft',
+            strings={'title': '現在地を表示'},
+            locateOptions={'maxZoom': config.DETAIL_ZOOM_LEVEL}
+        ).add_to(m)
+
+        if compact is None:
+            threshold = config.MAP_COMPACT_MARKER_THRESHOLD
+            compact = threshold is not None and len(fortunetellers_df) > threshold
+
+        if clusters is not None:
+            # サーバー側クラスター：重心マーカーと個別マーカーだけを載せる
+            for cluster in clusters:
+                if cluster['count'] > 1:
+                    MapManager._create_cluster_marker(cluster).add_to(m)
+
+            if compact:
+                # 件数1のセルなので、ブラウザ側ではまとめない
+                MapManager._create_compact_cluster(
+                    fortunetellers_df, disableClusteringAtZoom=1).add_to(m)
+            else:
+                for values in MapManager._iter_marker_values(fortunetellers_df):
+                    MapManager._create_normal_marker(*values).add_to(m)
+
+        elif not fortunetellers_df.empty:
+            if compact:
+                marker_cluster = MapManager._create_compact_cluster(fortunetellers_df)
+            else:
+                # 占いテーマのクラスター設定（紫色統一）
+                marker_cluster = MarkerCluster(
+                    name='占い師クラスター',
+                    overlay=True,
+                    control=True,
+                    icon_create_function=MapManager.CLUSTER_ICON_FUNCTION,
+                    options=MapManager.CLUSTER_OPTIONS
+                )
+
+                # 通常マーカーをクラスターに追加（紫色統一）
+                for values in MapManager._iter_marker_values(fortunetellers_df):
+                    marker_cluster.add_child(MapManager._create_normal_marker(*values))
 
             # クラスターを地図に追加
             marker_cluster.add_to(m)
 
-            # 特別なマーカー（選択・ハイライト）を個別に追加
-            for idx, row in fortunetellers_df.iterrows():
-                if row['id'] in special_ids:
-                    special_marker = MapManager._create_special_marker(
-                        row, selected_id, highlight_id
-                    )
-                    special_marker.add_to(m)
-
         # 占いテーマのクラスタースタイルを追加
         MapManager._add_fortune_cluster_style(m)
 
         return m
 
+    @staticmethod
+    def get_selection_view(fortunetellers_df: pd.DataFrame,
+                           selected_id: Optional[int] = None,
+                           highlight_id: Optional[int] = None) -> Optional[Tuple[Tuple[float, float], int]]:
+        """選択（なければハイライト）中の占い師を中心に表示する (中心, ズーム)、対象がなければNone"""
+        target_id = selected_id if selected_id else highlight_id
+        if not target_id or fortunetellers_df.empty:
+            return None
+        target_row = fortunetellers_df[fortunetellers_df['id'] == target_id]
+        if target_row.empty:
+            return None
+        return ((float(target_row.iloc[0]['latitude']), float(target_row.iloc[0]['longitude'])),
+                config.DETAIL_ZOOM_LEVEL)
+
+    @staticmethod
+    def create_selection_layer(fortunetellers_df: pd.DataFrame,
+                               selected_id: Optional[int] = None,
+                               highlight_id: Optional[int] = None) -> Optional[folium.FeatureGroup]:
+        """選択・ハイライト中の占い師だけのレイヤー（ベース地図に重ねる、対象がなければNone）"""
+        special_ids = {i for i in (selected_id, highlight_id) if i}
+        if not special_ids or fortunetellers_df.empty:
+            return None
+        special_df = fortunetellers_df[fortunetellers_df['id'].isin(special_ids)]
+        if special_df.empty:
+            return None
+
+        layer = folium.FeatureGroup(name='選択中の占い師', control=False)
+        for row in special_df.to_dict('records'):
+            MapManager._create_special_marker(row, selected_id, highlight_id).add_to(layer)
+        return layer
+
+    @staticmethod
+    def get_base_map(revision: int, cache_key: Hashable, fortunetellers_df: pd.DataFrame,
+                     center: Optional[Tuple[float, float]] = None,
+                     zoom: Optional[int] = None,
+                     clusters: Optional[list] = None,
+                     compact: Optional[bool] = None) -> BaseMap:
+        """ベース地図を取得（データのリビジョンと cache_key が同じなら全セッションで使い回す）
+
+        cache_key には fortunetellers_df・clusters の取得条件（表示範囲など）を渡す。
+        初回の描画（Figure全体）は作成時に済ませておき、st_folium では render=False で使う。
+        同じ地図を複数のセッションが同時に求めた場合、作成は1回だけ行い結果を共有する。
+        """
+        def build() -> BaseMap:
+            base_map = BaseMap(MapManager.create_base_map(
+                fortunetellers_df, center, zoom, clusters, compact))
+            base_map.map.get_root().render()
+            # 初回の文字列化は地図の構造を書き換えるため作成時に済ませ、毎回同じHTMLを返す
+            # （HTMLが変わると地図が再マウントされる）
+            if generate_leaflet_string is not None:
+                generate_leaflet_string(base_map.map)
+            return base_map
+
+        return MapManager._base_map_cache.get_or_compute(
+            (cache_key, center, zoom, compact), revision, build)
+
+    @staticmethod
+    @contextmanager
+    def rendering(base_map: BaseMap):
+        """共有のベース地図を st_folium で描画する間、他のセッションを待たせる
+
+        st_folium は重ねるレイヤーを地図に追加し、描画結果をFigureに書き足すため、
+        描画が終わったら追加された要素を取り除いてベース地図を元に戻す。
+        """
+        m = base_map.map
+        root = m.get_root()
+        containers = [m, root.header, root.html, root.script]
+        with base_map.lock:
+            before = [set(container._children) for container in containers]
+            try:
+                yield m
+            finally:
+                for container, names in zip(containers, before):
+                    for name in [name for name in container._children if name not in names]:
+                        del container._children[name]
+
+    @staticmethod
+    def get_base_map_cache_stats() -> dict:
+        """ベース地図キャッシュの統計情報を取得"""
+        return MapManager._base_map_cache.stats()
+
     @staticmethod
     def _get_icon_for_category(category: str):
         """カテゴリに応じたアイコンを取得"""
         return MapManager.CATEGORY_ICONS.get(category, "question-circle")
 
     @staticmethod
-    def _create_normal_marker(row):
-        """通常マーカーを作成（紫色統一・カテゴリ別アイコン）"""
-        # カテゴリに応じたアイコンを取得
-        icon_symbol = MapManager._get_icon_for_category(
-            row.get('category', 'その他'))
+    def bounds_from_map_data(map_data: Optional[dict]) -> Optional[Bounds]:
+        """st_foliumの戻り値から表示範囲 (south, west, north, east) を取り出す"""
+        if not map_data or not isinstance(map_data.get('bounds'), dict):
+            return None
+        south_west = map_data['bounds'].get('_southWest') or {}
+        north_east = map_data['bounds'].get('_northEast') or {}
+        try:
+            return (float(south_west['lat']), float(south_west['lng']),
+                    float(north_east['lat']), float(north_east['lng']))
+        except (KeyError, TypeError, ValueError):
+            return None
 
-        # ツールチップ（ホバー時）
-        tooltip_html = MapManager._create_tooltip_html(row)
+    @staticmethod
+    def estimate_bounds(center_lat: float, center_lon: float, zoom: int,
+                        width_px: int = config.MAP_ESTIMATED_WIDTH_PX,
+                        height_px: int = config.MAP_HEIGHT_PX) -> Bounds:
+        """中心・ズーム・地図サイズから表示範囲を見積もる（初回表示用）"""
+        # Webメルカトル: ズームzでは世界全体が 256 * 2^z px
+        degrees_per_px = 360.0 / (256 * 2 ** zoom)
+        half_width = width_px / 2 * degrees_per_px
+        # 緯度方向は cos(緯度) 分だけ縮む
+        half_height = height_px / 2 * degrees_per_px * math.cos(math.radians(center_lat))
+        return (center_lat - half_height, center_lon - half_width,
+                center_lat + half_height, center_lon + half_width)
 
-        # ポップアップ（クリック時）
-        popup_html = MapManager._create_popup_html(row)
+    @staticmethod
+    def expand_bounds(bounds: Bounds, margin: float = config.MAP_VIEWPORT_MARGIN) -> Bounds:
+        """表示範囲の上下左右に、幅・高さ×margin の余白を付ける"""
+        south, west, north, east = bounds
+        lat_pad = (north - south) * margin
+        lng_pad = (east - west) * margin
+        return (max(south - lat_pad, -90.0), west - lng_pad,
+                min(north + lat_pad, 90.0), east + lng_pad)
 
-        marker = folium.Marker(
-            [row['latitude'], row['longitude']],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=folium.Tooltip(tooltip_html, permanent=False, sticky=True),
+    @staticmethod
+    def bounds_contains(outer: Bounds, inner: Bounds) -> bool:
+        """inner が outer に完全に収まっているか"""
+        return (outer[0] <= inner[0] and outer[1] <= inner[1]
+                and outer[2] >= inner[2] and outer[3] >= inner[3])
+
+    @staticmethod
+    def _pack_markers(fortunetellers_df: pd.DataFrame) -> list:
+        """軽量表示用に [緯度, 経度, ID, カテゴリ番号] の配列へ詰める"""
+        category_index = {category: i for i, category in enumerate(config.FORTUNE_CATEGORIES)}
+        other_index = category_index.get("その他", len(config.FORTUNE_CATEGORIES) - 1)
+        categories = fortunetellers_df['category'].map(category_index).fillna(other_index)
+        return [list(row) for row in zip(
+            fortunetellers_df['latitude'].round(6).tolist(),
+            fortunetellers_df['longitude'].round(6).tolist(),
+            fortunetellers_df['id'].astype(int).tolist(),
+            categories.astype(int).tolist()
+        )]
+
+    @staticmethod
+    def _create_compact_cluster(fortunetellers_df: pd.DataFrame, **options) -> FastMarkerCluster:
+        """軽量表示のマーカー群を作成（マーカーはブラウザ側で共通テンプレートから生成）"""
+        categories = [
+            [MapManager._get_icon_for_category(category),
+             MapManager.CATEGORY_EMOJIS.get(category, "🔮"), category]
+            for category in config.FORTUNE_CATEGORIES
+        ]
+        callback = MapManager.COMPACT_MARKER_CALLBACK % json.dumps(categories, ensure_ascii=False)
+        return FastMarkerCluster(
+            MapManager._pack_markers(fortunetellers_df),
+            callback=callback,
+            name='占い師クラスター',
+            icon_create_function=MapManager.CLUSTER_ICON_FUNCTION,
+            options={**MapManager.CLUSTER_OPTIONS, **options}
+        )
+
+    @staticmethod
+    def _create_cluster_marker(cluster: dict):
+        """サーバー側で集計したクラスターのマーカーを作成（ブラウザ側クラスターと同じ見た目）"""
+        count = cluster['count']
+        if count < 10:
+            size = 'small'
+        elif count < 100:
+            size = 'medium'
+        else:
+            size = 'large'
+
+        return folium.Marker(
+            [cluster['latitude'], cluster['longitude']],
+            tooltip=f"🔮 {count}件（クリックで拡大）",
+            icon=folium.DivIcon(
+                html=f'<div><span>🔮<br>{count}</span></div>',
+                class_name=f'marker-cluster marker-cluster-{size}',
+                icon_size=(50, 50),
+                icon_anchor=(25, 25)
+            )
+        )
+
+    @staticmethod
+    def get_marker_content(row) -> Tuple[str, str]:
+        """ツールチップ・ポップアップのHTMLを取得（IDと更新日時ごとにキャッシュ）"""
+        key = (int(row['id']), row.get('updated_at'))
+        cache = MapManager._marker_content_cache
+        with MapManager._marker_content_lock:
+            content = cache.get(key)
+            if content is not None:
+                cache.move_to_end(key)
+                return content
+
+        content = (MapManager._create_tooltip_html(row), MapManager._create_popup_html(row))
+        with MapManager._marker_content_lock:
+            cache[key] = content
+            while len(cache) > config.MAP_POPUP_CACHE_SIZE:
+                cache.popitem(last=False)
+        return content
+
+    @staticmethod
+    def _iter_marker_values(fortunetellers_df: pd.DataFrame):
+        """通常マーカー1件分の (ID, 緯度, 経度, 名前, アイコン, 絵文字) を順に返す
+
+        アイコン・絵文字はカテゴリの列ごとに辞書で変換し、行ごとのSeriesは作らない。
+        """
+        categories = fortunetellers_df['category']
+        return zip(
+            fortunetellers_df['id'].astype(int).tolist(),
+            fortunetellers_df['latitude'].tolist(),
+            fortunetellers_df['longitude'].tolist(),
+            fortunetellers_df['name'].tolist(),
+            categories.map(MapManager.CATEGORY_ICONS).fillna("question-circle").tolist(),
+            categories.map(MapManager.CATEGORY_EMOJIS).fillna("🔮").tolist()
+        )
+
+    @staticmethod
+    def _create_normal_marker(fortuneteller_id: int, latitude: float, longitude: float,
+                              name: str, icon_symbol: str, category_emoji: str):
+        """通常マーカーを作成（紫色統一・カテゴリ別アイコン・IDのみ保持）"""
+        # ツールチップは名前だけ（詳細はクリック後に生成する）
+        return folium.Marker(
+            [latitude, longitude],
+            tooltip=folium.Tooltip(f"{category_emoji} {name}", permanent=False, sticky=True),
             icon=folium.Icon(
                 color='purple',  # 紫色で統一
                 icon=icon_symbol,
                 prefix='fa'
-            )
+            ),
+            fortuneteller_id=fortuneteller_id
         )
 
-        return marker
-
     @staticmethod
     def _create_special_marker(row, selected_id, highlight_id):
         """特別なマーカー（選択・ハイライト）を作成"""
@@ -166,11 +476,8 @@ class MapManager:
         else:
             icon_color = 'purple'       # 通常は紫色
 
-        # ツールチップ（ホバー時）
-        tooltip_html = MapManager._create_tooltip_html(row)
-
-        # ポップアップ（クリック時）
-        popup_html = MapManager._create_popup_html(row)
+        # ツールチップ（ホバー時）・ポップアップ（クリック時）はキャッシュから取得
+        tooltip_html, popup_html = MapManager.get_marker_content(row)
 
         marker = folium.Marker(
             [row['latitude'], row['longitude']],
@@ -180,7 +487,9 @@ class MapManager:
                 color=icon_color,
                 icon=icon_symbol,
                 prefix='fa'
-            )
+            ),
+            z_index_offset=1000,  # ベース地図の同じ位置のマーカーより手前に表示
+            fortuneteller_id=int(row['id'])
         )
 
         return marker
@@ -250,26 +559,13 @@ class MapManager:
     @staticmethod
     def _create_tooltip_html(row) -> str:
         """ツールチップHTML作成（占いテーマ・紫色統一・住所対応）"""
-        description = row.get('description', '説明なし')
-        contact = row.get('contact', '連絡先なし')
-        category = row.get('category', '未設定')
-        address = row.get('address', '')
+        description = row.get('description') or '説明なし'
+        contact = row.get('contact') or '連絡先なし'
+        category = row.get('category') or '未設定'
+        address = row.get('address') or ''
 
         # カテゴリに応じた絵文字
-        category_emoji = {
-            "タロット": "🎴",
-            "手相": "✋",
-            "占星術": "⭐",
-            "四柱推命": "☯️",
-            "姓名判断": "📝",
-            "風水": "🧭",
-            "水晶玉": "🔮",
-            "霊視": "👁️",
-            "数秘術": "🔢",
-            "易経": "📖",
-            "ルーン": "🗿",
-            "その他": "❓"
-        }.get(category, "🔮")
+        category_emoji = MapManager.CATEGORY_EMOJIS.get(category, "🔮")
 
         # 住所情報がある場合は表示
         address_html = ""
@@ -315,32 +611,19 @@ class MapManager:
     @staticmethod
     def _create_popup_html(row) -> str:
         """ポップアップHTML作成（占いテーマ・紫色統一・住所対応・ナビ機能付き）"""
-        description = row.get('description', '説明なし')
-        contact = row.get('contact', '連絡先なし')
-        submitted_by = row.get('submitted_by', '不明')
-        category = row.get('category', '未設定')
-        zipcode = row.get('zipcode', '')
-        address = row.get('address', '')
+        description = row.get('description') or '説明なし'
+        contact = row.get('contact') or '連絡先なし'
+        submitted_by = row.get('submitted_by') or '不明'
+        category = row.get('category') or '未設定'
+        zipcode = row.get('zipcode') or ''
+        address = row.get('address') or ''
 
         # 座標取得
         lat = row['latitude']
         lng = row['longitude']
 
         # カテゴリに応じた絵文字
-        category_emoji = {
-            "タロット": "🎴",
-            "手相": "✋",
-            "占星術": "⭐",
-            "四柱推命": "☯️",
-            "姓名判断": "📝",
-            "風水": "🧭",
-            "水晶玉": "🔮",
-            "霊視": "👁️",
-            "数秘術": "🔢",
-            "易経": "📖",
-            "ルーン": "🗿",
-            "その他": "❓"
-        }.get(category, "🔮")
+        category_emoji = MapManager.CATEGORY_EMOJIS.get(category, "🔮")
 
         # 住所情報がある場合は表示
         address_html = ""